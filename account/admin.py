@@ -1,52 +1,127 @@
-from django import forms
 from django.contrib import admin
-
-from profiles.admin import DisableAddAdminMixin, DisableDeleteAdminMixin
-
-from .models import MailingList, Profile, User
-
-
-class UserAdmin(admin.ModelAdmin):
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from profiles.admin import (
+    CSV_EXPORT_CHUNK_SIZE,
+    DisableAddAdminMixin,
+    DisableChangeAdminMixin,
+    DisableDeleteAdminMixin,
+    EstimatedCountAdminMixin,
+    ReplicaChangeListAdminMixin,
+    streaming_csv_response,
+)
+from profiles.answer_export import AnswerCatalog, iter_wide_rows
+from profiles.models import Answer
+
+from .models import MailingList, MailingListEmail, Profile, User
+
+
+class UserAdmin(
+    ReplicaChangeListAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin
+):
     list_display = ("username", "date_joined")
     ordering = ["-date_joined"]
 
 
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(
+    ReplicaChangeListAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin
+):
     list_display = ("user", "result", "date_joined")
+    list_select_related = ("user__result",)
 
     ordering = ["-user__date_joined"]
+    actions = ["export_answers_as_csv"]
 
+    @admin.display(ordering="user__result__value")
     def result(self, obj):
         if obj.user.result:
             return obj.user.result.value
         else:
             return None
 
+    @admin.display(ordering="user__date_joined")
     def date_joined(self, obj):
         return obj.user.date_joined
 
+    def export_answers_as_csv(self, request, queryset):
+        catalog = AnswerCatalog()
+        answer_qs = Answer.objects.filter(user__profile__in=queryset)
+
+        def rows():
+            yield catalog.header
+            yield from iter_wide_rows(answer_qs, catalog)
 
-class MailingListAdminForm(forms.ModelForm):
-    csv_emails = forms.CharField(widget=forms.Textarea(attrs={"rows": 20, "cols": 120}))
+        return streaming_csv_response("answers", rows())
 
-    class Meta:
-        model = MailingList
-        fields = ["result"]
+    export_answers_as_csv.short_description = "Export answers of selected as CSV"
 
 
 class MailingListAdmin(DisableDeleteAdminMixin, DisableAddAdminMixin, admin.ModelAdmin):
     list_display = ("result", "number_of_emails")
+    list_select_related = ("result",)
+    actions = ["export_emails_as_csv"]
+
+    fields = ("result", "emails")
+    readonly_fields = ("result", "emails")
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.annotate(num_emails=Count("emails"))
+
+    def get_urls(self):
+        urls = [
+            path(
+                "<path:object_id>/emails/csv/",
+                self.admin_site.admin_view(self.emails_csv_view),
+                name="account_mailinglist_emails_csv",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(ordering="num_emails")
+    def number_of_emails(self, obj):
+        return obj.num_emails
+
+    @admin.display(description="emails")
+    def emails(self, obj):
+        # The emails are not embedded in the form, as a mailing list can have tens of thousands of emails.
+        # Instead the form links to the paginated list of the emails and to the CSV download.
+        emails_url = reverse("admin:account_mailinglistemail_changelist")
+        csv_url = reverse("admin:account_mailinglist_emails_csv", args=[obj.pk])
+        return format_html(
+            '{} emails. <a href="{}?mailing_list__id__exact={}">Show emails</a>'
+            ' | <a href="{}">Download as CSV</a>',
+            obj.num_emails,
+            emails_url,
+            obj.pk,
+            csv_url,
+        )
 
-    readonly_fields = ("result",)
-    form = MailingListAdminForm
+    def stream_emails(self, queryset):
+        emails_qs = (
+            MailingListEmail.objects.filter(mailing_list__in=queryset)
+            .order_by("mailing_list", "id")
+            .values_list("mailing_list__result__topic", "email")
+        )
+
+        def rows():
+            yield ["result", "email"]
+            yield from emails_qs.iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+
+        return streaming_csv_response("emails", rows())
 
-    def csv_emails(self, obj):
-        return obj.csv_emails
+    def export_emails_as_csv(self, request, queryset):
+        return self.stream_emails(queryset)
 
-    def get_form(self, request, obj=None, **kwargs):
-        form = super().get_form(request, obj, **kwargs)
-        form.base_fields["csv_emails"].initial = self.csv_emails(obj)
-        return form
+    export_emails_as_csv.short_description = "Export emails of selected as CSV"
+
+    def emails_csv_view(self, request, object_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        return self.stream_emails(MailingList.objects.filter(pk=object_id))
 
     def change_view(self, request, object_id, form_url="", extra_context=None):
         extra_context = extra_context or {}
@@ -60,6 +135,22 @@ class MailingListAdmin(DisableDeleteAdminMixin, DisableAddAdminMixin, admin.Mode
         return False
 
 
+class MailingListEmailAdmin(
+    ReplicaChangeListAdminMixin,
+    EstimatedCountAdminMixin,
+    DisableDeleteAdminMixin,
+    DisableAddAdminMixin,
+    DisableChangeAdminMixin,
+    admin.ModelAdmin,
+):
+    list_display = ("email", "mailing_list")
+    list_select_related = ("mailing_list__result",)
+    list_filter = ("mailing_list__result",)
+    search_fields = ("email",)
+    ordering = ["id"]
+
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(MailingList, MailingListAdmin)
+admin.site.register(MailingListEmail, MailingListEmailAdmin)
@@ -11,7 +11,7 @@ from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle
 
 from account.models import MailingList, MailingListEmail, Profile, User
-from profiles.api.views import update_postal_code_result
+from profiles.poll import complete_poll
 
 from .serializers import ProfileSerializer, SubscribeSerializer, UnSubscribeSerializer
 
@@ -56,7 +56,7 @@ class ProfileViewSet(UpdateModelMixin, viewsets.GenericViewSet):
                 request.method == "PUT"
                 and serializer.data.get("postal_code", None) is not None
             ):
-                update_postal_code_result(user)
+                complete_poll(user)
             return Response(data=serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,53 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from account.pool import get_pool_metrics, POOL_FILL_BATCH_SIZE, top_up_pool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the pool of anonymous users claimed by start_poll to "
+        "ANONYMOUS_USER_POOL_HIGH_WATERMARK, when the size of the pool is below "
+        "ANONYMOUS_USER_POOL_LOW_WATERMARK."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep the pool filled, checks the size of the pool every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=5)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=POOL_FILL_BATCH_SIZE,
+            help="Number of users created within a transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if (
+            settings.ANONYMOUS_USER_POOL_LOW_WATERMARK
+            > settings.ANONYMOUS_USER_POOL_HIGH_WATERMARK
+        ):
+            raise CommandError(
+                "ANONYMOUS_USER_POOL_LOW_WATERMARK must not be greater than "
+                "ANONYMOUS_USER_POOL_HIGH_WATERMARK"
+            )
+        while True:
+            created = top_up_pool(batch_size=options["batch_size"])
+            if created:
+                logger.info(f"Created {created} anonymous users to the pool.")
+            if options["verbosity"] > 1 or (created and not options["loop"]):
+                metrics = get_pool_metrics()
+                self.stdout.write(
+                    " ".join(f"{name}={value}" for name, value in metrics.items())
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
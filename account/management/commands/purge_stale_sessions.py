@@ -0,0 +1,81 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from account.purge import (
+    delete_in_batches,
+    get_expired_revoked_tokens,
+    get_expired_tokens,
+    get_stale_anonymous_users,
+    get_table_sizes,
+    PURGE_BATCH_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the expired tokens, the revocations of the expired signed tokens "
+        "and the anonymous users, with their profiles and "
+        "answers, who have not completed the poll within --min-age-hours. "
+        "Note, PostgreSQL reuses the space of the deleted rows after they are vacuumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age-hours",
+            type=int,
+            default=settings.STALE_ANONYMOUS_USER_AFTER_HOURS,
+            help="Age of the anonymous users that have not completed the poll to delete.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help="Number of rows deleted within a transaction.",
+        )
+        parser.add_argument(
+            "--max-rows-per-second",
+            type=int,
+            default=1000,
+            help="Limits the rate of deletion, 0 for no limit.",
+        )
+
+    def handle(self, *args, **options):
+        min_age_hours = options["min_age_hours"]
+        if min_age_hours < settings.TOKEN_EXPIRED_AFTER_HOURS:
+            # The users could still be answering with a valid token
+            raise CommandError(
+                "'min-age-hours' must be at least TOKEN_EXPIRED_AFTER_HOURS "
+                f"({settings.TOKEN_EXPIRED_AFTER_HOURS})"
+            )
+        batch_options = {
+            "batch_size": options["batch_size"],
+            "max_rows_per_second": options["max_rows_per_second"],
+        }
+        sizes_before = get_table_sizes()
+        deleted = delete_in_batches(get_expired_tokens(), **batch_options)
+        deleted += delete_in_batches(get_expired_revoked_tokens(), **batch_options)
+        deleted += delete_in_batches(
+            get_stale_anonymous_users(timedelta(hours=min_age_hours)),
+            **batch_options,
+        )
+        sizes_after = get_table_sizes()
+
+        for label, count in sorted(deleted.items()):
+            self.stdout.write(f"Deleted {count} {label} rows.")
+        logger.info(f"Purged stale sessions: {dict(deleted)}")
+        for table, (table_size, indexes_size) in sizes_before.items():
+            table_size_after, indexes_size_after = sizes_after[table]
+            self.stdout.write(
+                f"{table}: table {format_size(table_size)} -> "
+                f"{format_size(table_size_after)}, indexes "
+                f"{format_size(indexes_size)} -> {format_size(indexes_size_after)}"
+            )
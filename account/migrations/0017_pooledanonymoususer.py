@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-19 14:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0016_order_users_by_date_joined"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PooledAnonymousUser",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="pool_entry",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0017_pooledanonymoususer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevokedToken",
+            fields=[
+                (
+                    "signature",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("expires", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -71,7 +71,7 @@ class MailingList(models.Model):
 
     @property
     def csv_emails(self):
-        return ",".join([e.email for e in self.emails.all()])
+        return ",".join(self.emails.values_list("email", flat=True))
 
     def number_of_emails(self):
         return self.emails.count()
@@ -93,3 +93,35 @@ class MailingListEmail(models.Model):
                 name="email_and_mailing_list_must_be_jointly:unique",
             )
         ]
+
+
+class PooledAnonymousUser(models.Model):
+    """
+    A pre-created anonymous user, with a profile and a token, waiting to be
+    claimed by start_poll. See account.pool.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="pool_entry",
+    )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.user_id}"
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked signed token, see mpbackend.authentication.SignedToken. The row is
+    needed only until the token expires, after which it is deleted by
+    purge_stale_sessions.
+    """
+
+    signature = models.CharField(max_length=64, primary_key=True)
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.signature
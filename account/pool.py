@@ -0,0 +1,175 @@
+"""
+Pool of pre-created anonymous users, with a profile and a token, claimed by
+start_poll. The pool is kept filled by the fill_anonymous_user_pool management
+command. The metrics of the pool are stored in the cache.
+"""
+
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from account.models import PooledAnonymousUser, Profile, User
+
+logger = logging.getLogger(__name__)
+
+POOL_FILL_BATCH_SIZE = 500
+POOL_METRICS_CACHE_KEY_PREFIX = "anonymous_user_pool"
+# The number of users in the pool, the number of claimed users, the number of claims
+# from an empty pool and the total time spent claiming.
+POOL_DEPTH = "depth"
+POOL_CLAIMS = "claims"
+POOL_MISSES = "misses"
+POOL_CLAIM_LATENCY_US = "claim_latency_us"
+POOL_METRICS = (POOL_DEPTH, POOL_CLAIMS, POOL_MISSES, POOL_CLAIM_LATENCY_US)
+
+
+def get_metric_cache_key(name):
+    return f"{POOL_METRICS_CACHE_KEY_PREFIX}:{name}"
+
+
+def incr_metric(name, delta=1):
+    key = get_metric_cache_key(name)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # The key was evicted between add and incr
+        pass
+
+
+def get_pool_metrics():
+    metrics = {name: cache.get(get_metric_cache_key(name), 0) for name in POOL_METRICS}
+    claims = metrics[POOL_CLAIMS]
+    metrics["mean_claim_latency_us"] = (
+        metrics[POOL_CLAIM_LATENCY_US] / claims if claims else 0
+    )
+    return metrics
+
+
+def fill_pool(size, create_token=True, batch_size=POOL_FILL_BATCH_SIZE):
+    """
+    Creates size anonymous users to the pool, batch_size users at a time.
+    The users have an unusable password, as the users created by start_poll.
+    """
+    created = 0
+    while created < size:
+        num_users = min(batch_size, size - created)
+        users = []
+        for _ in range(num_users):
+            user_id = uuid.uuid4()
+            users.append(
+                User(
+                    id=user_id,
+                    username=f"anonymous_{user_id}",
+                    is_generated=True,
+                    password=make_password(None),
+                )
+            )
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            Profile.objects.bulk_create([Profile(user=user) for user in users])
+            if create_token:
+                Token.objects.bulk_create(
+                    [Token(user=user, key=Token.generate_key()) for user in users]
+                )
+            PooledAnonymousUser.objects.bulk_create(
+                [PooledAnonymousUser(user=user) for user in users]
+            )
+        created += num_users
+    return created
+
+
+def top_up_pool(batch_size=POOL_FILL_BATCH_SIZE):
+    """
+    Fills the pool to the high watermark, if the size of the pool is below the low
+    watermark. Returns the number of created users.
+    """
+    depth = PooledAnonymousUser.objects.count()
+    created = 0
+    if depth < settings.ANONYMOUS_USER_POOL_LOW_WATERMARK:
+        created = fill_pool(
+            settings.ANONYMOUS_USER_POOL_HIGH_WATERMARK - depth,
+            create_token=not settings.SIGNED_SESSION_TOKENS,
+            batch_size=batch_size,
+        )
+    cache.set(get_metric_cache_key(POOL_DEPTH), depth + created, None)
+    return created
+
+
+def get_claim_sql():
+    qn = connection.ops.quote_name
+    pool = qn(PooledAnonymousUser._meta.db_table)
+    users = qn(User._meta.db_table)
+    tokens = qn(Token._meta.db_table)
+    # The users are claimed in the order they were created. Concurrent claims skip
+    # the locked rows instead of waiting for each other. The join date of the user
+    # and the creation time of the token are set to the time of the claim.
+    return f"""
+        WITH claimed AS (
+            DELETE FROM {pool}
+            WHERE "user_id" = (
+                SELECT "user_id" FROM {pool}
+                ORDER BY "created"
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING "user_id"
+        ), claimed_user AS (
+            UPDATE {users} SET "date_joined" = %s
+            FROM claimed WHERE {users}."id" = claimed."user_id"
+        ), claimed_token AS (
+            UPDATE {tokens} SET "created" = %s
+            FROM claimed WHERE {tokens}."user_id" = claimed."user_id"
+            RETURNING {tokens}."user_id", {tokens}."key"
+        )
+        SELECT claimed."user_id", claimed_token."key"
+        FROM claimed
+        LEFT JOIN claimed_token ON claimed_token."user_id" = claimed."user_id"
+    """
+
+
+def claim_anonymous_user():
+    """
+    Claims the oldest user of the pool. Returns the id of the user and the key of
+    its token, the key is None if the user was created without a token. Returns None
+    if the pool is empty. On PostgreSQL the user is claimed with a single statement.
+    """
+    start = time.perf_counter()
+    now = timezone.now()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(get_claim_sql(), [now, now])
+            claimed = cursor.fetchone()
+    else:
+        with transaction.atomic():
+            entry = (
+                PooledAnonymousUser.objects.select_for_update(skip_locked=True)
+                .order_by("created")
+                .first()
+            )
+            claimed = None
+            if entry:
+                PooledAnonymousUser.objects.filter(pk=entry.pk).delete()
+                User.objects.filter(id=entry.user_id).update(date_joined=now)
+                tokens = Token.objects.filter(user_id=entry.user_id)
+                tokens.update(created=now)
+                claimed = (entry.user_id, tokens.values_list("key", flat=True).first())
+
+    if not claimed:
+        logger.warning("The pool of anonymous users is empty.")
+        incr_metric(POOL_MISSES)
+        return None
+    incr_metric(POOL_CLAIMS)
+    incr_metric(POOL_CLAIM_LATENCY_US, int((time.perf_counter() - start) * 1e6))
+    try:
+        cache.decr(get_metric_cache_key(POOL_DEPTH))
+    except ValueError:
+        pass
+    return claimed
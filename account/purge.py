@@ -0,0 +1,91 @@
+"""
+Deletion of expired tokens, expired revocations of signed tokens and abandoned
+anonymous users in bounded batches.
+The rows are paginated by the primary key and every batch is deleted in its
+own short transaction, optionally limiting the number of rows deleted per second.
+"""
+
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from account.models import Profile, RevokedToken, User
+from profiles.models import Answer
+
+PURGE_BATCH_SIZE = 500
+PURGE_MODELS = (Token, RevokedToken, User, Profile, Answer)
+
+
+def delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE, max_rows_per_second=None):
+    """
+    Deletes the rows of the queryset, batch_size rows at a time. Returns the number
+    of deleted rows per model, including the rows deleted by cascade.
+    """
+    deleted = Counter()
+    last_pk = None
+    while True:
+        batch_qs = queryset.order_by("pk")
+        if last_pk is not None:
+            batch_qs = batch_qs.filter(pk__gt=last_pk)
+        pks = list(batch_qs.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        start = time.monotonic()
+        with transaction.atomic():
+            _, num_deleted = queryset.model.objects.filter(pk__in=pks).delete()
+        deleted.update(num_deleted)
+        last_pk = pks[-1]
+        if max_rows_per_second:
+            elapsed = time.monotonic() - start
+            time.sleep(max(0, len(pks) / max_rows_per_second - elapsed))
+    return deleted
+
+
+def get_expired_tokens():
+    # The tokens of the pooled users are renewed when the users are claimed
+    min_created = timezone.now() - timedelta(hours=settings.TOKEN_EXPIRED_AFTER_HOURS)
+    return Token.objects.filter(created__lt=min_created, user__pool_entry__isnull=True)
+
+
+def get_expired_revoked_tokens():
+    # The expired signed tokens are rejected without checking the revocation
+    return RevokedToken.objects.filter(expires__lt=timezone.now())
+
+
+def get_stale_anonymous_users(min_age):
+    """
+    Returns the anonymous users that joined before min_age and did not complete
+    the poll, i.e. their result is not saved to the postal code results, and that
+    have not subscribed. The users of the pool and the users who have opted out
+    of the use of their result are kept.
+    """
+    return User.objects.filter(
+        is_generated=True,
+        date_joined__lt=timezone.now() - min_age,
+        postal_code_result_saved=False,
+        has_subscribed=False,
+        pool_entry__isnull=True,
+    ).exclude(profile__result_can_be_used=False)
+
+
+def get_table_sizes(models=PURGE_MODELS):
+    """
+    Returns the sizes of the tables and their indexes in bytes, by table name.
+    Only supported on PostgreSQL, returns an empty dict otherwise.
+    """
+    if connection.vendor != "postgresql":
+        return {}
+    sizes = {}
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            cursor.execute(
+                "SELECT pg_relation_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+            sizes[table] = cursor.fetchone()
+    return sizes
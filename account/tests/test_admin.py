@@ -0,0 +1,120 @@
+import pytest
+from django.urls import reverse
+
+from account.models import MailingList, MailingListEmail, Profile, User
+from profiles.models import Result
+from profiles.tests.test_admin import assert_changelist_num_queries_constant
+
+
+def create_users(start, num_rows):
+    User.objects.bulk_create(
+        [User(username=f"user{i}") for i in range(start, start + num_rows)]
+    )
+
+
+def create_profiles(start, num_rows):
+    result = Result.objects.create(topic=f"result{start}", value=f"value{start}")
+    create_users(start, num_rows)
+    users = User.objects.filter(profile__isnull=True)
+    users.update(result=result)
+    Profile.objects.bulk_create([Profile(user=user) for user in users])
+
+
+def create_mailing_lists(start, num_rows):
+    MailingList.objects.bulk_create(
+        [
+            MailingList(result=Result.objects.create(topic=f"result{i}"))
+            for i in range(start, start + min(num_rows, 100))
+        ]
+    )
+    MailingListEmail.objects.bulk_create(
+        [
+            MailingListEmail(
+                mailing_list=MailingList.objects.last(), email=f"test{i}@test.com"
+            )
+            for i in range(start, start + num_rows)
+        ]
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "model_name,create_rows",
+    [
+        ("user", create_users),
+        ("profile", create_profiles),
+        ("mailinglist", create_mailing_lists),
+        ("mailinglistemail", create_mailing_lists),
+    ],
+)
+def test_changelist_num_queries(admin_client, model_name, create_rows):
+    url = reverse(f"admin:account_{model_name}_changelist")
+    assert_changelist_num_queries_constant(admin_client, url, create_rows)
+
+
+@pytest.mark.django_db
+def test_mailing_list_changelist_number_of_emails(admin_client, mailing_list_emails):
+    url = reverse("admin:account_mailinglist_changelist")
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    mailing_list = response.context["cl"].result_list[0]
+    assert mailing_list.num_emails == 52
+
+
+@pytest.mark.django_db
+def test_mailing_list_export_emails_as_csv(admin_client, mailing_list_emails):
+    url = reverse("admin:account_mailinglist_changelist")
+    response = admin_client.post(
+        url,
+        {
+            "action": "export_emails_as_csv",
+            "_selected_action": list(MailingList.objects.values_list("id", flat=True)),
+        },
+    )
+    assert response.status_code == 200
+    assert response.streaming
+    rows = b"".join(response.streaming_content).decode().splitlines()
+    assert rows[0] == "result,email"
+    assert len(rows) == 53
+    assert "Car traveller,test_0@test.com" in rows
+
+
+@pytest.mark.django_db
+def test_mailing_list_change_view_does_not_embed_emails(
+    admin_client, mailing_list_emails
+):
+    mailing_list = MailingList.objects.first()
+    url = reverse("admin:account_mailinglist_change", args=[mailing_list.id])
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert "test_0@test.com" not in content
+    emails_url = reverse("admin:account_mailinglistemail_changelist")
+    assert f"{emails_url}?mailing_list__id__exact={mailing_list.id}" in content
+
+    response = admin_client.get(
+        emails_url, {"mailing_list__id__exact": mailing_list.id}
+    )
+    assert response.status_code == 200
+    assert response.context["cl"].result_count == 52
+    assert len(response.context["cl"].result_list) == 52
+
+    csv_url = reverse("admin:account_mailinglist_emails_csv", args=[mailing_list.id])
+    assert csv_url in content
+    response = admin_client.get(csv_url)
+    assert response.status_code == 200
+    rows = b"".join(response.streaming_content).decode().splitlines()
+    assert len(rows) == 53
+
+
+@pytest.mark.django_db
+def test_mailing_list_emails_can_not_be_deleted(admin_client, mailing_list_emails):
+    email = MailingListEmail.objects.first()
+    response = admin_client.get(
+        reverse("admin:account_mailinglistemail_delete", args=[email.id])
+    )
+    assert response.status_code == 403
+    response = admin_client.get(reverse("admin:account_mailinglistemail_changelist"))
+    assert "delete_selected" not in response.context["cl"].model_admin.get_actions(
+        response.wsgi_request
+    )
@@ -77,6 +77,18 @@ def test_profile_created(api_client):
     user = User.objects.first()
     assert user.is_generated is True
     assert user.profile.postal_code is None
+    assert user.has_usable_password() is False
+    assert user.auth_token.key
+    assert response.json()["id"] == str(user.id)
+
+
+@pytest.mark.django_db
+def test_start_poll_num_queries(api_client, django_assert_max_num_queries):
+    url = reverse("profiles:question-start-poll")
+    # Inserts of the user, the profile and the token within a transaction
+    with django_assert_max_num_queries(5):
+        response = api_client.post(url)
+    assert response.status_code == 200
 
 
 @pytest.mark.django_db
@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from freezegun import freeze_time
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.reverse import reverse
+
+from account.models import RevokedToken, User
+from mpbackend.authentication import (
+    ExpiringTokenAuthentication,
+    issue_signed_token,
+    SignedTokenAuthentication,
+)
+from profiles.utils import decrypt_text
+
+
+@pytest.fixture
+def token(profiles):
+    return Token.objects.create(user=profiles.first().user)
+
+
+@pytest.mark.django_db
+def test_authenticate_credentials_num_queries(token, django_assert_num_queries):
+    authentication = ExpiringTokenAuthentication()
+    # The token is fetched with the user, profile and result
+    with django_assert_num_queries(1):
+        user, auth = authentication.authenticate_credentials(token.key)
+        assert user.profile.id
+        assert user.result.id
+        assert auth.key == token.key
+
+
+@pytest.mark.django_db
+def test_token_expiration(token):
+    authentication = ExpiringTokenAuthentication()
+    authentication.authenticate_credentials(token.key)
+    with freeze_time(
+        timezone.now() + timedelta(hours=settings.TOKEN_EXPIRED_AFTER_HOURS + 1)
+    ):
+        with pytest.raises(AuthenticationFailed):
+            authentication.authenticate_credentials(token.key)
+    assert not Token.objects.filter(key=token.key).exists()
+
+
+@pytest.mark.django_db
+def test_end_poll_deletes_token(api_client, token):
+    api_client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+    response = api_client.post(reverse("profiles:question-end-poll"))
+    assert response.status_code == 200
+    assert not Token.objects.filter(key=token.key).exists()
+    response = api_client.post(reverse("profiles:question-end-poll"))
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_signed_token_authentication_num_queries(profiles, django_assert_num_queries):
+    profile = profiles.first()
+    user = profile.user
+    key = issue_signed_token(user.id)
+    authentication = SignedTokenAuthentication()
+    # The revocation status is checked from the database and then cached
+    with django_assert_num_queries(1):
+        authentication.authenticate_credentials(key)
+    with django_assert_num_queries(0):
+        auth_user, auth = authentication.authenticate_credentials(key)
+        assert auth_user
+        assert auth_user.is_authenticated
+        assert auth_user.pk == user.pk
+        assert auth.key == key
+    # The user is fetched on demand with the profile and the result
+    with django_assert_num_queries(1):
+        assert auth_user.profile.id == profile.id
+        assert auth_user.result.id == user.result_id
+
+
+@pytest.mark.django_db
+def test_signed_token_authentication_rejects_invalid_tokens(profiles):
+    user = profiles.first().user
+    key = issue_signed_token(user.id)
+    authentication = SignedTokenAuthentication()
+    # Tokens stored in the database are left to ExpiringTokenAuthentication
+    assert authentication.authenticate_credentials("0" * 40) is None
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(key[:-1] + "x")
+    with freeze_time(
+        timezone.now() + timedelta(hours=settings.TOKEN_EXPIRED_AFTER_HOURS + 1)
+    ):
+        with pytest.raises(AuthenticationFailed):
+            authentication.authenticate_credentials(key)
+    _, auth = authentication.authenticate_credentials(key)
+    auth.revoke()
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(key)
+
+
+@pytest.mark.django_db
+def test_signed_token_revocation_is_durable(
+    profiles, django_capture_on_commit_callbacks
+):
+    key = issue_signed_token(profiles.first().user.id)
+    authentication = SignedTokenAuthentication()
+    _, auth = authentication.authenticate_credentials(key)
+    with django_capture_on_commit_callbacks(execute=True):
+        auth.revoke()
+    assert RevokedToken.objects.filter(signature=auth.signature).exists()
+    # E.g. evicted or memcached restarted
+    cache.clear()
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(key)
+    with pytest.raises(AuthenticationFailed):
+        async_to_sync(authentication.aauthenticate_credentials)(key)
+
+
+@pytest.mark.django_db
+@override_settings(SIGNED_SESSION_TOKENS=True)
+def test_start_poll_with_signed_session_tokens(api_client):
+    num_tokens = Token.objects.count()
+    response = api_client.post(reverse("profiles:question-start-poll"))
+    assert response.status_code == 200
+    assert Token.objects.count() == num_tokens
+    enc, iv = response.json()["data"]
+    key = decrypt_text(enc, settings.TOKEN_SECRET, iv)
+    api_client.credentials(HTTP_AUTHORIZATION="Token " + key)
+    response = api_client.post(reverse("profiles:question-end-poll"))
+    assert response.status_code == 200
+    assert User.objects.get(id=response.wsgi_request.user.pk)
+    # The token is revoked
+    response = api_client.post(reverse("profiles:question-end-poll"))
+    assert response.status_code == 401
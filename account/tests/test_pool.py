@@ -0,0 +1,70 @@
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+
+from account.models import PooledAnonymousUser, User
+from account.pool import claim_anonymous_user, fill_pool, get_pool_metrics
+from profiles.utils import decrypt_text
+
+
+def delete_pooled_users(num_users):
+    pks = PooledAnonymousUser.objects.values_list("pk", flat=True)[:num_users]
+    PooledAnonymousUser.objects.filter(pk__in=list(pks)).delete()
+
+
+@pytest.mark.django_db
+@override_settings(
+    ANONYMOUS_USER_POOL_LOW_WATERMARK=5, ANONYMOUS_USER_POOL_HIGH_WATERMARK=10
+)
+def test_fill_anonymous_user_pool():
+    call_command("fill_anonymous_user_pool", batch_size=3)
+    assert PooledAnonymousUser.objects.count() == 10
+    assert Token.objects.count() == 10
+    user = User.objects.first()
+    assert user.is_generated is True
+    assert user.has_usable_password() is False
+    assert user.profile
+    # Not filled above the low watermark
+    delete_pooled_users(5)
+    call_command("fill_anonymous_user_pool")
+    assert PooledAnonymousUser.objects.count() == 5
+    delete_pooled_users(1)
+    call_command("fill_anonymous_user_pool")
+    assert PooledAnonymousUser.objects.count() == 10
+    assert get_pool_metrics()["depth"] == 10
+
+
+@pytest.mark.django_db
+def test_claim_anonymous_user():
+    fill_pool(2)
+    first = PooledAnonymousUser.objects.order_by("created").first()
+    user_id, key = claim_anonymous_user()
+    assert user_id == first.user_id
+    assert key == Token.objects.get(user_id=user_id).key
+    assert claim_anonymous_user()[0] != user_id
+    assert claim_anonymous_user() is None
+    assert not PooledAnonymousUser.objects.exists()
+    metrics = get_pool_metrics()
+    assert metrics["claims"] == 2
+    assert metrics["misses"] == 1
+
+
+@pytest.mark.django_db
+@override_settings(ANONYMOUS_USER_POOL=True)
+def test_start_poll_claims_pooled_user(api_client):
+    fill_pool(1)
+    pooled_user_id = PooledAnonymousUser.objects.get().user_id
+    url = reverse("profiles:question-start-poll")
+    response = api_client.post(url)
+    assert response.status_code == 200
+    assert response.json()["id"] == str(pooled_user_id)
+    enc, iv = response.json()["data"]
+    key = decrypt_text(enc, settings.TOKEN_SECRET, iv)
+    assert Token.objects.get(key=key).user_id == pooled_user_id
+    # The pool is empty, the user is created on the request
+    response = api_client.post(url)
+    assert response.status_code == 200
+    assert User.objects.count() == 2
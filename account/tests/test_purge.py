@@ -0,0 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from freezegun import freeze_time
+from rest_framework.authtoken.models import Token
+
+from account.models import PooledAnonymousUser, Profile, RevokedToken, User
+from account.pool import fill_pool
+from profiles.models import Answer
+from profiles.utils import create_anonymous_user
+
+
+def create_anonymous_users(num_users, **kwargs):
+    users = [create_anonymous_user()[0] for _ in range(num_users)]
+    User.objects.filter(id__in=[user.id for user in users]).update(**kwargs)
+    return users
+
+
+@pytest.mark.django_db
+def test_purge_stale_sessions():
+    with freeze_time(
+        timezone.now() - timedelta(hours=settings.STALE_ANONYMOUS_USER_AFTER_HOURS + 1)
+    ):
+        stale_users = create_anonymous_users(5)
+        Answer.objects.bulk_create([Answer(user=user) for user in stale_users])
+        completed_user = create_anonymous_users(1, postal_code_result_saved=True)[0]
+        subscribed_user = create_anonymous_users(1, has_subscribed=True)[0]
+        opted_out_user = create_anonymous_users(1)[0]
+        Profile.objects.filter(user=opted_out_user).update(result_can_be_used=False)
+        fill_pool(1)
+        User.objects.create(username="registered")
+    recent_user = create_anonymous_users(1)[0]
+
+    out = StringIO()
+    call_command("purge_stale_sessions", batch_size=2, stdout=out)
+    assert not User.objects.filter(id__in=[user.id for user in stale_users]).exists()
+    assert not Answer.objects.exists()
+    remaining_users = set(User.objects.values_list("id", flat=True))
+    assert remaining_users.issuperset(
+        {completed_user.id, subscribed_user.id, opted_out_user.id, recent_user.id}
+    )
+    assert User.objects.filter(username="registered").exists()
+    assert PooledAnonymousUser.objects.count() == 1
+    # The expired tokens are deleted, the tokens of the pooled users are renewed on claim
+    assert set(Token.objects.values_list("user_id", flat=True)) == {
+        recent_user.id,
+        PooledAnonymousUser.objects.get().user_id,
+    }
+    assert "Deleted 5 profiles.Answer rows." in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_purge_expired_revoked_tokens():
+    now = timezone.now()
+    RevokedToken.objects.create(signature="expired", expires=now - timedelta(hours=1))
+    RevokedToken.objects.create(signature="valid", expires=now + timedelta(hours=1))
+    out = StringIO()
+    call_command("purge_stale_sessions", stdout=out)
+    assert list(RevokedToken.objects.values_list("signature", flat=True)) == ["valid"]
+    assert "Deleted 1 account.RevokedToken rows." in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_purge_stale_sessions_min_age():
+    with pytest.raises(CommandError):
+        call_command(
+            "purge_stale_sessions", min_age_hours=settings.TOKEN_EXPIRED_AFTER_HOURS - 1
+        )
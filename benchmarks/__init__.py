@@ -0,0 +1,8 @@
+"""
+Benchmarks of the backend. Every module is runnable, e.g.:
+
+    python -m benchmarks.auth
+
+The benchmarks run against a test database created from the configured
+DATABASE_URL, the configured database itself is not modified.
+"""
@@ -0,0 +1,391 @@
+"""
+Compares the concurrency and the memory per in-flight request of the two
+deployment modes: the synchronous DRF views served by uwsgi processes, each
+serving one request at a time, and the async views (ASYNC_POLL_VIEWS) served by
+an ASGI worker.
+
+    python -m benchmarks.asgi [--concurrency 1,10,50] [--rounds 5]
+        [--wsgi-workers 10] [--db-latency-ms 5] [--output asgi.json]
+
+Concurrent clients answer the poll through the WSGI and the ASGI application of
+this process: the states of the conditions, an answer and the result, --rounds
+times. Every query waits --db-latency-ms, as the round trip to PostgreSQL. In
+the WSGI mode at most --wsgi-workers requests are served at a time, as by the
+uwsgi processes, and an in-flight request holds a whole worker process, thus
+the memory per in-flight request is the resident memory of the process. In the
+ASGI mode every request is in flight at once, and the memory per in-flight
+request is the growth of the resident memory of the process divided by the
+number of requests in flight. The memory is sampled from /proc, i.e. on Linux.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from benchmarks.utils import benchmark_environment, setup_django
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+MEMORY_SAMPLE_SECONDS = 0.005
+SEED = 0
+MIB = 1024 * 1024
+
+
+def get_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+@contextmanager
+def sample_memory():
+    """Yields the samples of the resident memory, taken until the exit."""
+    samples = [get_rss()]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(MEMORY_SAMPLE_SECONDS):
+            samples.append(get_rss())
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        yield samples
+    finally:
+        stop.set()
+        sampler.join()
+        samples.append(get_rss())
+
+
+class InFlight:
+    """Counts the requests in flight and the maximum."""
+
+    def __init__(self):
+        self.count = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.count += 1
+            self.max = max(self.max, self.count)
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.count -= 1
+
+
+class DatabaseLatency:
+    """Database execute wrapper that waits before every query and counts the queries."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+
+def get_wsgi_environ(method, path, key, body):
+    return {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": "",
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "HTTP_AUTHORIZATION": f"Token {key}",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+
+def wsgi_request(application, method, path, key, body):
+    """Returns the status code of the request to the WSGI application."""
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    response = application(get_wsgi_environ(method, path, key, body), start_response)
+    try:
+        b"".join(response)
+    finally:
+        # Sends request_finished, which closes the connection to the database
+        response.close()
+    return statuses[0]
+
+
+async def asgi_request(application, method, path, key, body):
+    """Returns the status code of the request to the ASGI application."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"testserver"),
+            (b"authorization", f"Token {key}".encode()),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    statuses = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # The client does not disconnect
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+def get_result(mode, concurrency, timings, errors, seconds, in_flight, samples):
+    timings.sort()
+    growth = max(samples) - samples[0]
+    if mode == "wsgi":
+        # An in-flight request holds a whole worker process
+        memory_per_request = samples[0]
+    else:
+        memory_per_request = growth / in_flight.max
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(timings),
+        "errors": errors,
+        "requests_per_second": len(timings) / seconds,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+        "max_in_flight": in_flight.max,
+        "rss_mib": samples[0] / MIB,
+        "rss_growth_mib": growth / MIB,
+        "memory_per_in_flight_request_mib": memory_per_request / MIB,
+    }
+
+
+def print_results(results):
+    print(
+        f"  {'mode':<5} {'clients':>7} {'requests/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'queries/req':>11} {'in flight':>9} {'errors':>6} {'RSS growth MiB':>14} "
+        f"{'MiB/in-flight':>13}"
+    )
+    for result in results:
+        print(
+            f"  {result['mode']:<5} {result['concurrency']:>7} "
+            f"{result['requests_per_second']:>10.1f} {result['p50_ms']:>8.1f} "
+            f"{result['p95_ms']:>8.1f} {result['queries_per_request']:>11.1f} "
+            f"{result['max_in_flight']:>9} "
+            f"{result['errors']:>6} {result['rss_growth_mib']:>14.1f} "
+            f"{result['memory_per_in_flight_request_mib']:>13.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.asgi",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--wsgi-workers", type=int, default=10)
+    parser.add_argument("--db-latency-ms", type=float, default=5)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--output", help="Path of the JSON results")
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    concurrencies = [int(concurrency) for concurrency in args.concurrency.split(",")]
+    setup_django()
+
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection, connections
+    from django.db.backends.signals import connection_created
+    from django.test.utils import override_settings
+    from rest_framework.authtoken.models import Token
+    from rest_framework.reverse import reverse
+
+    from account.models import Profile, User
+    from benchmarks.load_test.questionnaire import (
+        get_questionnaire_data,
+        import_questionnaire,
+    )
+    from profiles.models import Option
+
+    latency = DatabaseLatency(args.db_latency_ms / 1000)
+
+    def add_latency(sender, connection, **kwargs):
+        # The connection of a thread is created again after every request
+        if latency not in connection.execute_wrappers:
+            connection.execute_wrappers.append(latency)
+
+    def create_clients(num_clients, rng, options):
+        """Returns the token key and the requests of every client."""
+        urls = [
+            reverse("profiles:question-get-questions-conditions-states"),
+            reverse("profiles:question-get-sub-questions-conditions-states"),
+            reverse("profiles:answer-list"),
+            reverse("profiles:answer-get-result"),
+        ]
+        clients = []
+        for _ in range(num_clients):
+            user = User.objects.create(username=f"benchmark_{rng.getrandbits(64)}")
+            Profile.objects.create(user=user)
+            key = Token.objects.create(user=user).key
+            requests = []
+            for _ in range(args.rounds):
+                option = rng.choice(options)
+                answer = {"question": option.question_id, "option": option.id}
+                requests += [
+                    ("GET", urls[0], b""),
+                    ("GET", urls[1], b""),
+                    ("POST", urls[2], json.dumps(answer).encode()),
+                    ("GET", urls[3], b""),
+                ]
+            clients.append((key, requests))
+        return clients
+
+    def run_wsgi(clients):
+        application = get_wsgi_application()
+        worker_slots = threading.Semaphore(args.wsgi_workers)
+        in_flight = InFlight()
+        timings, errors = [], []
+
+        def run_client(key, requests):
+            for method, path, body in requests:
+                start = time.perf_counter()
+                with worker_slots, in_flight:
+                    status = wsgi_request(application, method, path, key, body)
+                timings.append(time.perf_counter() - start)
+                if status >= 400:
+                    errors.append(status)
+
+        threads = [
+            threading.Thread(target=run_client, args=client) for client in clients
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings, len(errors), time.perf_counter() - start, in_flight
+
+    def run_asgi(clients):
+        application = get_asgi_application()
+        in_flight = InFlight()
+        timings, errors = [], []
+
+        async def run_client(key, requests):
+            for method, path, body in requests:
+                start = time.perf_counter()
+                with in_flight:
+                    status = await asgi_request(application, method, path, key, body)
+                timings.append(time.perf_counter() - start)
+                if status >= 400:
+                    errors.append(status)
+
+        async def run_clients():
+            await asyncio.gather(*(run_client(*client) for client in clients))
+
+        start = time.perf_counter()
+        asyncio.run(run_clients())
+        return timings, len(errors), time.perf_counter() - start, in_flight
+
+    modes = {
+        "wsgi": ("mpbackend.urls", run_wsgi),
+        "asgi": ("mpbackend.async_urls", run_asgi),
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if connection.vendor == "sqlite":
+            # The in-memory test database can not be written by many threads
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                tmp_dir, "asgi.sqlite3"
+            )
+        with benchmark_environment(args.use_configured_cache), override_settings(
+            ALLOWED_HOSTS=["testserver"]
+        ):
+            rng = random.Random(SEED)
+            import_questionnaire(get_questionnaire_data(rng, args.questions, 4, 3, 0))
+            # The questions without sub questions and conditions can always be answered
+            options = list(
+                Option.objects.filter(
+                    question__isnull=False,
+                    is_other=False,
+                    question__question_conditions__isnull=True,
+                )
+            )
+            connection_created.connect(add_latency)
+            connections.close_all()
+            try:
+                for concurrency in concurrencies:
+                    for mode, (urlconf, run) in modes.items():
+                        clients = create_clients(concurrency, rng, options)
+                        connection.close()
+                        num_queries = latency.count
+                        with override_settings(
+                            ROOT_URLCONF=urlconf
+                        ), sample_memory() as samples:
+                            timings, errors, seconds, in_flight = run(clients)
+                        result = get_result(
+                            mode,
+                            concurrency,
+                            timings,
+                            errors,
+                            seconds,
+                            in_flight,
+                            samples,
+                        )
+                        result["queries_per_request"] = (
+                            latency.count - num_queries
+                        ) / len(timings)
+                        results.append(result)
+            finally:
+                connection_created.disconnect(add_latency)
+                connections.close_all()
+
+    print(
+        f"WSGI with {args.wsgi_workers} workers and ASGI, "
+        f"{args.db_latency_ms} ms per query, {connection.vendor}"
+    )
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures the overhead of the token authentication per request, including
+the access of the profile and the result of the user as done by the views.
+
+    python -m benchmarks.auth [--rounds 5000] [--users 100]
+"""
+
+import argparse
+
+from benchmarks.utils import benchmark_environment, measure, print_results, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    setup_django()
+
+    from rest_framework.authtoken.models import Token
+
+    from account.models import Profile, User
+    from mpbackend.authentication import (
+        ExpiringTokenAuthentication,
+        issue_signed_token,
+        SignedTokenAuthentication,
+    )
+    from profiles.models import Result
+
+    with benchmark_environment(args.use_configured_cache):
+        result = Result.objects.create(topic="benchmark")
+        keys = []
+        signed_keys = []
+        for i in range(args.users):
+            user = User.objects.create(username=f"benchmark_{i}", result=result)
+            Profile.objects.create(user=user)
+            keys.append(Token.objects.create(user=user).key)
+            signed_keys.append(issue_signed_token(user.id))
+
+        def lazy(i):
+            # The authentication of DRF, i.e. a query for the token and lazy
+            # queries for the user, the profile and the result.
+            token = Token.objects.get(key=keys[i % len(keys)])
+            user = token.user
+            return user.is_active, user.profile.id, user.result.id
+
+        authentication = ExpiringTokenAuthentication()
+
+        def joined(i):
+            user, _ = authentication.authenticate_credentials(keys[i % len(keys)])
+            return user.is_active, user.profile.id, user.result.id
+
+        signed_authentication = SignedTokenAuthentication()
+
+        def signed(i):
+            user, _ = signed_authentication.authenticate_credentials(
+                signed_keys[i % len(signed_keys)]
+            )
+            return user.is_authenticated, user.pk
+
+        def signed_with_user(i):
+            user, _ = signed_authentication.authenticate_credentials(
+                signed_keys[i % len(signed_keys)]
+            )
+            return user.is_active, user.profile.id, user.result.id
+
+        results = {
+            "lazy": measure(lazy, args.rounds),
+            "select_related": measure(joined, args.rounds),
+            "signed": measure(signed, args.rounds),
+            "signed, user accessed": measure(signed_with_user, args.rounds),
+        }
+    print_results("Authentication overhead per request", results)
+
+
+if __name__ == "__main__":
+    main()
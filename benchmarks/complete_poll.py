@@ -0,0 +1,93 @@
+"""
+Measures the completions of the poll per second, i.e. saving the result of the
+user to the postal code results and revoking the token, as done by end_poll.
+
+    python -m benchmarks.complete_poll [--rounds 500] [--postal-codes 50]
+"""
+
+import argparse
+import random
+
+from benchmarks.utils import benchmark_environment, measure, print_results, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--postal-codes", type=int, default=50)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    setup_django()
+
+    from django.db import IntegrityError, transaction
+    from rest_framework.authtoken.models import Token
+
+    from account.models import Profile, User
+    from profiles.models import PostalCode, PostalCodeResult, PostalCodeType, Result
+    from profiles.poll import complete_poll
+
+    @transaction.atomic
+    def former_update_postal_code_result(user):
+        # update_postal_code_result before complete_poll
+        if user.postal_code_result_saved or not user.profile.result_can_be_used:
+            return
+        result = user.result
+        for postal_code, type_name in (
+            (user.profile.postal_code, PostalCodeType.HOME_POSTAL_CODE),
+            (user.profile.optional_postal_code, PostalCodeType.OPTIONAL_POSTAL_CODE),
+        ):
+            postal_code, _ = PostalCode.objects.get_or_create(postal_code=postal_code)
+            postal_code_type, _ = PostalCodeType.objects.get_or_create(
+                type_name=type_name
+            )
+            try:
+                postal_code_result, _ = PostalCodeResult.objects.get_or_create(
+                    postal_code=postal_code,
+                    postal_code_type=postal_code_type,
+                    result=result,
+                )
+            except IntegrityError:
+                return
+            postal_code_result.count += 1
+            postal_code_result.save()
+        user.postal_code_result_saved = True
+        user.save()
+
+    with benchmark_environment(args.use_configured_cache):
+        rng = random.Random(0)
+        results = [Result.objects.create(topic=f"result{i}") for i in range(6)]
+        postal_codes = [f"20{i:03}" for i in range(args.postal_codes)]
+        users = []
+
+        def create_user(i):
+            user = User.objects.create(
+                username=f"benchmark_{len(users)}", result=rng.choice(results)
+            )
+            Profile.objects.create(
+                user=user,
+                postal_code=rng.choice(postal_codes),
+                optional_postal_code=rng.choice(postal_codes + [None]),
+            )
+            token = Token.objects.create(user=user)
+            users.append((User.objects.get(pk=user.pk), token))
+
+        def former(i):
+            user, token = users[-1]
+            former_update_postal_code_result(user)
+            token.delete()
+
+        def current(i):
+            user, token = users[-1]
+            complete_poll(user, token=token)
+
+        measurements = {
+            "former": measure(former, args.rounds, setup=create_user),
+            "complete_poll": measure(current, args.rounds, setup=create_user),
+        }
+    print_results("Completion of the poll", measurements)
+    for name, result in measurements.items():
+        print(f"  {name:<32} {1e6 / result['mean_us']:9.1f} completions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares the size and the decode time of the full questionnaire payload, i.e. all
+the questions with their options and sub questions, as JSON, gzipped JSON and
+MessagePack.
+
+    python -m benchmarks.formats [--questions 20] [--rounds 50] [--gzip-level 6]
+
+The decode time of JSON is measured with the json module and with orjson, that of
+gzipped JSON includes the decompression. The times are of the Python decoders, the
+decoders of the clients differ but the relative sizes do not.
+"""
+
+import argparse
+import gzip
+import json
+import random
+
+from benchmarks.utils import benchmark_environment, measure, setup_django
+
+SEED = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    setup_django()
+
+    import msgpack
+    import orjson
+    from django.test.utils import override_settings
+    from rest_framework.test import APIRequestFactory
+
+    from benchmarks.load_test.questionnaire import (
+        get_questionnaire_data,
+        import_questionnaire,
+    )
+    from profiles.api.renderers import MessagePackRenderer, ORJSONRenderer
+    from profiles.api.views import QuestionViewSet
+
+    with benchmark_environment(args.use_configured_cache), override_settings(
+        ALLOWED_HOSTS=["testserver"]
+    ):
+        import_questionnaire(
+            get_questionnaire_data(random.Random(SEED), args.questions, 4, 3, 0.3)
+        )
+        request = APIRequestFactory().get("/", {"page_size": 1000})
+        data = QuestionViewSet.as_view({"get": "list"})(request).data
+
+    json_payload = ORJSONRenderer().render(data)
+    msgpack_payload = MessagePackRenderer().render(data)
+    formats = {
+        "json": (json_payload, json.loads),
+        "json (orjson)": (json_payload, orjson.loads),
+        "gzip json": (
+            gzip.compress(json_payload, args.gzip_level),
+            lambda payload: json.loads(gzip.decompress(payload)),
+        ),
+        "msgpack": (msgpack_payload, msgpack.unpackb),
+        "gzip msgpack": (
+            gzip.compress(msgpack_payload, args.gzip_level),
+            lambda payload: msgpack.unpackb(gzip.decompress(payload)),
+        ),
+    }
+    print(f"{args.questions} questions, gzip level {args.gzip_level}, medians")
+    print(f"  {'format':<16} {'bytes':>9} {'% of json':>9} {'decode us':>10}")
+    for name, (payload, decode) in formats.items():
+        assert decode(payload) == json.loads(json_payload)
+        timing = measure(lambda i: decode(payload), args.rounds)
+        print(
+            f"  {name:<16} {len(payload):>9} "
+            f"{100 * len(payload) / len(json_payload):>9.1f} "
+            f"{timing['median_us']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""
+End-to-end load test of the poll, see __main__.py.
+
+A synthetic questionnaire is imported with the functions of the import_questions
+command and virtual users answer it through the API concurrently, as the
+front-end does.
+"""
@@ -0,0 +1,179 @@
+"""
+Load test of the whole poll. A synthetic questionnaire is imported and virtual
+users answer it concurrently through the API, from start_poll to end_poll.
+Reports the p50/p95/p99 latencies and the queries per endpoint and the
+throughput, and saves them as JSON to be compared between commits.
+
+    python -m benchmarks.load_test [--users 200] [--workers 8] [--questions 20]
+        [--options 4] [--sub-questions 3] [--condition-ratio 0.3]
+        [--conn-max-age 60] [--connect-latency-ms 0] [--output load_test.json]
+        [--compare baseline.json]
+
+The requests are handled in the process with the test client, by one thread
+per worker, each with an own database connection. The database is a test
+database created from DATABASE_URL, e.g. a local PostgreSQL or SQLite. SQLite
+allows a single writer, thus the requests are serialized on SQLite and the
+latencies include the wait. The connections to the database are closed at the
+end of the requests as by the server, i.e. kept open for --conn-max-age seconds,
+by default DATABASE_CONN_MAX_AGE. Compare e.g. --conn-max-age 0 with the default
+to measure the time of opening the connections. Opening a connection waits
+--connect-latency-ms in addition, as the TCP and the authentication handshakes and
+the start of the backend process of PostgreSQL, which a local SQLite does not have.
+"""
+
+import argparse
+import logging
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+from benchmarks.utils import benchmark_environment, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.load_test",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--sub-questions", type=int, default=3)
+    parser.add_argument("--condition-ratio", type=float, default=0.3)
+    parser.add_argument("--postal-codes", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--conn-max-age", type=int)
+    parser.add_argument("--connect-latency-ms", type=float, default=0)
+    parser.add_argument("--output", help="Path of the JSON report")
+    parser.add_argument("--compare", help="Path of a JSON report to compare with")
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    if args.options < 2:
+        parser.error("--options must be at least 2")
+    setup_django()
+
+    from django.db import connection, connections
+    from django.db.backends.signals import connection_created
+    from django.test.utils import override_settings
+
+    from benchmarks.load_test.questionnaire import (
+        get_questionnaire_data,
+        import_questionnaire,
+    )
+    from benchmarks.load_test.report import (
+        get_report,
+        load_report,
+        print_comparison,
+        print_report,
+        save_report,
+    )
+    from benchmarks.load_test.virtual_user import VirtualUser
+    from profiles.management.commands.import_questions import RESULT_COLUMNS
+
+    if args.questions * args.options < len(RESULT_COLUMNS):
+        parser.error(
+            f"the questionnaire must have at least {len(RESULT_COLUMNS)} options"
+        )
+
+    baseline = load_report(args.compare) if args.compare else None
+    if args.conn_max_age is not None:
+        # The connections of the threads share the settings
+        connection.settings_dict["CONN_MAX_AGE"] = args.conn_max_age
+    conn_max_age = connection.settings_dict["CONN_MAX_AGE"]
+    num_connections = []
+
+    def count_connection(sender, **kwargs):
+        num_connections.append(1)
+        time.sleep(args.connect_latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if connection.vendor == "sqlite":
+            # The in-memory test database can not be written by many threads
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                tmp_dir, "load_test.sqlite3"
+            )
+        with benchmark_environment(args.use_configured_cache), override_settings(
+            ALLOWED_HOSTS=["testserver"]
+        ):
+            rng = random.Random(args.seed)
+            import_questionnaire(
+                get_questionnaire_data(
+                    rng,
+                    args.questions,
+                    args.options,
+                    args.sub_questions,
+                    args.condition_ratio,
+                )
+            )
+            postal_codes = [f"20{i:03}" for i in range(args.postal_codes)]
+            database = connection.vendor
+            connection.close()
+            request_lock = threading.Lock() if database == "sqlite" else nullcontext()
+            # The failed requests are reported, not logged
+            logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+            user_indexes = queue.Queue()
+            for i in range(args.users):
+                user_indexes.put(i)
+            records = []
+            errors = []
+
+            def work():
+                try:
+                    while True:
+                        try:
+                            i = user_indexes.get_nowait()
+                        except queue.Empty:
+                            return
+                        user = VirtualUser(
+                            i,
+                            random.Random(args.seed + i),
+                            postal_codes,
+                            records,
+                            request_lock,
+                        )
+                        error = user.run()
+                        if error:
+                            errors.append(error)
+                finally:
+                    connections.close_all()
+
+            workers = [threading.Thread(target=work) for _ in range(args.workers)]
+            connection_created.connect(count_connection)
+            start = time.perf_counter()
+            try:
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+            finally:
+                connection_created.disconnect(count_connection)
+            seconds = time.perf_counter() - start
+
+    options = {**vars(args), "conn_max_age": conn_max_age}
+    report = get_report(
+        records,
+        seconds,
+        args.users,
+        len(errors),
+        options,
+        database,
+        len(num_connections),
+    )
+    print_report(report)
+    for error in sorted(set(errors))[:5]:
+        print(f"  failed: {error}")
+    if baseline:
+        print_comparison(baseline, report)
+    if args.output:
+        save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
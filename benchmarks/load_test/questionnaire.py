@@ -0,0 +1,115 @@
+"""
+Generates a synthetic questionnaire in the format of the sheet read by the
+import_questions command, i.e. the same rows and columns as media/questions.xlsx.
+"""
+
+import pandas as pd
+
+from profiles.management.commands.import_questions import (
+    CONDITION_COLUMN,
+    get_and_create_results,
+    IS_ANIMAL,
+    MANDATORY_NUMBER_OF_SUB_QUESTIONS_TO_ANSWER_COLUMN,
+    NUMBER_OF_OPTIONS_TO_CHOOSE,
+    OPTION_COLUMN,
+    QUESTION_COLUMN,
+    QUESTION_DESCRIPTION_COLUMN,
+    QUESTION_NUMBER_COLUMN,
+    RESULT_COLUMNS,
+    save_questions,
+    SUB_QUESTION_COLUMN,
+    SUB_QUESTION_CONDITION_COLUMN,
+    update_results_num_options,
+)
+
+NUM_COLUMNS = RESULT_COLUMNS[-1] + 1
+# The numbers are not in SKIP_QUESTIONS and fit into Question.number
+FIRST_QUESTION_NUMBER = 100
+
+
+def translated(text):
+    return f"{text} fi//{text} sv//{text} en"
+
+
+def get_option_row(rng, index, value):
+    """Returns the row of the option, index is the index in the whole questionnaire."""
+    row = [None] * NUM_COLUMNS
+    row[OPTION_COLUMN] = translated(value)
+    # Every result must have options, as the scoring is relative to their number
+    results = {index % len(RESULT_COLUMNS), rng.randrange(len(RESULT_COLUMNS))}
+    for result in results:
+        row[RESULT_COLUMNS[result]] = IS_ANIMAL
+    return row
+
+
+def get_questionnaire_data(
+    rng, num_questions, num_options, num_sub_questions, condition_ratio
+):
+    """
+    Returns the sheet of the questionnaire as a DataFrame. Every other question has
+    sub questions. The given ratio of the questions, and of the second sub questions,
+    are conditioned on the options of an earlier question without sub questions.
+    There must be at least as many options in total as there are results.
+    """
+    columns = [f"column {i}" for i in range(RESULT_COLUMNS[0])] + [
+        translated(f"Result {i}") for i in range(len(RESULT_COLUMNS))
+    ]
+    # The first two rows contain the descriptions and the values of the results
+    rows = [[None] * NUM_COLUMNS, [None] * NUM_COLUMNS]
+    for i, column in enumerate(RESULT_COLUMNS):
+        rows[0][column] = translated(f"Description {i}")
+        rows[1][column] = translated(f"Value {i}")
+
+    questions_with_options = []
+    option_index = 0
+    for i in range(num_questions):
+        number = str(FIRST_QUESTION_NUMBER + i)
+        has_sub_questions = i % 2 == 1
+        condition = None
+        if questions_with_options and rng.random() < condition_ratio:
+            # The users who chose the last option do not answer the question
+            condition_number = rng.choice(questions_with_options)
+            condition = (
+                f"{condition_number},{'-'.join(map(str, range(num_options - 1)))}"
+            )
+
+        question_rows = []
+        if has_sub_questions:
+            for sub_question in range(num_sub_questions):
+                for option in range(num_options):
+                    row = get_option_row(rng, option_index, f"Option {option}")
+                    option_index += 1
+                    if option == 0:
+                        row[SUB_QUESTION_COLUMN] = translated(
+                            f"Sub question {number}.{sub_question}"
+                        )
+                        if sub_question == 1 and rng.random() < condition_ratio:
+                            row[SUB_QUESTION_CONDITION_COLUMN] = (
+                                f"{rng.choice(questions_with_options)}.0"
+                            )
+                    question_rows.append(row)
+        else:
+            for option in range(num_options):
+                is_last = option == num_options - 1
+                question_rows.append(
+                    get_option_row(rng, option_index, "Other" if is_last else "Option")
+                )
+                option_index += 1
+            questions_with_options.append(number)
+
+        question_row = question_rows[0]
+        question_row[QUESTION_NUMBER_COLUMN] = number
+        question_row[QUESTION_COLUMN] = translated(f"Question {number}")
+        question_row[QUESTION_DESCRIPTION_COLUMN] = translated(f"Description {number}")
+        question_row[NUMBER_OF_OPTIONS_TO_CHOOSE] = "1"
+        question_row[MANDATORY_NUMBER_OF_SUB_QUESTIONS_TO_ANSWER_COLUMN] = "*"
+        question_row[CONDITION_COLUMN] = condition
+        rows += question_rows
+    return pd.DataFrame(rows, columns=columns)
+
+
+def import_questionnaire(data):
+    """Imports the questionnaire as the import_questions command does."""
+    results = get_and_create_results(data)
+    save_questions(data, results)
+    update_results_num_options()
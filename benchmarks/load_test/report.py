@@ -0,0 +1,125 @@
+import json
+import math
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+
+PERCENTILES = (50, 95, 99)
+
+
+def get_percentile(sorted_values, percentile):
+    """Returns the percentile with the nearest-rank method."""
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_report(
+    records, seconds, num_users, num_failed, options, database, num_connections
+):
+    endpoints = defaultdict(list)
+    for record in records:
+        endpoints[record.endpoint].append(record)
+    report = {
+        "commit": get_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "database": database,
+        "options": options,
+        "seconds": seconds,
+        "users": num_users,
+        "failed_users": num_failed,
+        "requests": len(records),
+        "requests_per_second": len(records) / seconds,
+        "polls_per_second": (num_users - num_failed) / seconds,
+        "queries": sum(record.num_queries for record in records),
+        "mean_ms": sum(record.seconds for record in records) * 1000 / len(records),
+        "connections": num_connections,
+        "connections_per_request": num_connections / len(records),
+        "endpoints": {},
+    }
+    for endpoint, endpoint_records in sorted(endpoints.items()):
+        timings = sorted(record.seconds * 1000 for record in endpoint_records)
+        num_queries = sum(record.num_queries for record in endpoint_records)
+        report["endpoints"][endpoint] = {
+            "requests": len(endpoint_records),
+            "errors": sum(
+                record.status is None or record.status >= 400
+                for record in endpoint_records
+            ),
+            "mean_ms": sum(timings) / len(timings),
+            **{
+                f"p{percentile}_ms": get_percentile(timings, percentile)
+                for percentile in PERCENTILES
+            },
+            "queries": num_queries,
+            "queries_per_request": num_queries / len(endpoint_records),
+        }
+    return report
+
+
+def print_report(report):
+    print(
+        f"{report['users']} users ({report['failed_users']} failed), "
+        f"{report['requests']} requests in {report['seconds']:.1f} s on "
+        f"{report['database']}: {report['requests_per_second']:.1f} requests/s, "
+        f"{report['polls_per_second']:.2f} polls/s, {report['queries']} queries, "
+        f"{report['connections']} connections "
+        f"(CONN_MAX_AGE {report['options'].get('conn_max_age')}), "
+        f"{report['mean_ms']:.2f} ms per request"
+    )
+    print(
+        f"  {'endpoint':<36} {'requests':>8} {'errors':>6} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'queries/req':>11}"
+    )
+    for endpoint, result in report["endpoints"].items():
+        print(
+            f"  {endpoint:<36} {result['requests']:>8} {result['errors']:>6} "
+            f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['p99_ms']:>8.2f} {result['queries_per_request']:>11.2f}"
+        )
+
+
+def print_comparison(baseline, report):
+    """Prints the change of the latencies and the queries from the baseline."""
+    print(f"Compared with {baseline.get('commit')} ({baseline.get('created')})")
+    print(f"  {'endpoint':<36} {'p50':>8} {'p95':>8} {'p99':>8} {'queries/req':>11}")
+    for endpoint, result in report["endpoints"].items():
+        old = baseline["endpoints"].get(endpoint)
+        if not old:
+            print(f"  {endpoint:<36} new")
+            continue
+        changes = [
+            f"{(result[key] / old[key] - 1) * 100:+7.1f}%" if old[key] else "       -"
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        queries = result["queries_per_request"] - old["queries_per_request"]
+        print(f"  {endpoint:<36} {' '.join(changes)} {queries:>+11.2f}")
+    change = report["polls_per_second"] / baseline["polls_per_second"] - 1
+    print(f"  polls/s {change * 100:+.1f}%")
+    if "connections_per_request" in baseline:
+        change = report["connections_per_request"] - baseline["connections_per_request"]
+        print(f"  connections/request {change:+.2f}")
+    if "mean_ms" in baseline:
+        change = report["mean_ms"] / baseline["mean_ms"] - 1
+        print(f"  ms/request {change * 100:+.1f}%")
+
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
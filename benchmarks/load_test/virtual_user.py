@@ -0,0 +1,149 @@
+"""
+A virtual user answers the questionnaire through the API in the same order as
+the front-end: start_poll, the questions and their conditions, the answers,
+the result, the profile and end_poll.
+"""
+
+import time
+from collections import namedtuple
+
+from django.db import close_old_connections, connection
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import QueryCounter
+from mpbackend import token_envelope
+
+# status is None if the request raised an exception
+Record = namedtuple("Record", ["endpoint", "seconds", "num_queries", "status"])
+PAGE_SIZE = 1000
+
+
+class RequestFailed(Exception):
+    pass
+
+
+class VirtualUser:
+    def __init__(self, index, rng, postal_codes, records, request_lock):
+        self.rng = rng
+        self.postal_codes = postal_codes
+        self.records = records
+        self.request_lock = request_lock
+        # Every user has an own address, the throttles are per address
+        self.client = APIClient(
+            REMOTE_ADDR=f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+        )
+
+    def request(self, endpoint, method, url, data=None):
+        """Records the request and returns the JSON of the response."""
+        query_counter = QueryCounter()
+        status = None
+        start = time.perf_counter()
+        try:
+            with self.request_lock:
+                try:
+                    with connection.execute_wrapper(query_counter):
+                        response = getattr(self.client, method)(
+                            url, data, format="json"
+                        )
+                    status = response.status_code
+                finally:
+                    seconds = time.perf_counter() - start
+                    # The test client does not close the obsolete connections at the
+                    # end of the request, as the server does
+                    close_old_connections()
+        finally:
+            self.records.append(Record(endpoint, seconds, query_counter.count, status))
+        if status >= 400:
+            raise RequestFailed(f"{method.upper()} {url}: {status}")
+        return response.json() if response.content else None
+
+    def start_poll(self):
+        data = self.request(
+            "start_poll", "post", reverse("profiles:question-start-poll")
+        )
+        envelope = data["data"]
+        if isinstance(envelope, str):
+            key = token_envelope.decrypt(envelope)
+        else:
+            key = token_envelope.decrypt(*envelope)
+        self.user_id = data["id"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+
+    def answer(self, question, sub_question, options):
+        option = self.rng.choice(options)
+        data = {"question": question["id"], "option": option["id"]}
+        if sub_question:
+            data["sub_question"] = sub_question["id"]
+        if option["is_other"]:
+            data["other"] = "Something else"
+        self.request("answer", "post", reverse("profiles:answer-list"), data)
+
+    def answer_questions(self):
+        questions = self.request(
+            "get_question_numbers",
+            "get",
+            reverse("profiles:question-get-question-numbers")
+            + f"?page_size={PAGE_SIZE}",
+        )["results"]
+        questions_with_conditions = {
+            question["id"]
+            for question in self.request(
+                "get_questions_with_conditions",
+                "get",
+                reverse("profiles:question-get-questions-with-conditions")
+                + f"?page_size={PAGE_SIZE}",
+            )["results"]
+        }
+        for question in questions:
+            if question["id"] in questions_with_conditions:
+                condition = self.request(
+                    "check_if_question_condition_met",
+                    "post",
+                    reverse("profiles:question-check-if-question-condition-met"),
+                    {"question": question["id"]},
+                )
+                if not condition["condition_met"]:
+                    continue
+            question = self.request(
+                "get_question",
+                "get",
+                reverse("profiles:question-get-question")
+                + f"?number={question['number']}",
+            )
+            if "options" in question:
+                self.answer(question, None, question["options"])
+            for sub_question in question.get("sub_questions", []):
+                condition = self.request(
+                    "check_if_sub_question_condition_met",
+                    "post",
+                    reverse("profiles:question-check-if-sub-question-condition-met"),
+                    {"sub_question": sub_question["id"]},
+                )
+                if condition["condition_met"]:
+                    self.answer(question, sub_question, sub_question["options"])
+
+    def end_poll(self):
+        self.request("get_result", "get", reverse("profiles:answer-get-result"))
+        self.request(
+            "profile",
+            "put",
+            reverse("account:profiles-detail", args=[self.user_id]),
+            {
+                "year_of_birth": self.rng.randint(1930, 2010),
+                "postal_code": self.rng.choice(self.postal_codes),
+                "optional_postal_code": self.rng.choice(self.postal_codes),
+                "result_can_be_used": True,
+            },
+        )
+        self.request("end_poll", "post", reverse("profiles:question-end-poll"))
+
+    def run(self):
+        """Answers the poll, returns the error if a request failed or None."""
+        try:
+            self.start_poll()
+            self.answer_questions()
+            self.end_poll()
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return None
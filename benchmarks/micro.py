@@ -0,0 +1,254 @@
+"""
+Microbenchmarks of the hot functions of the poll: the scoring, the conditions,
+the serializers and the encryption of the token. Every benchmark records the
+time, the peak of the allocated memory and the queries per call, for every
+data size. The data is generated with fixed seeds.
+
+    python -m benchmarks.micro [--sizes 10,100] [--rounds 1000]
+    python -m benchmarks.micro --save-baseline
+    python -m benchmarks.micro --compare [--threshold 0.25]
+
+The size is the number of questions of the synthetic questionnaire and the
+number of postal code results on a page. --compare compares with
+benchmarks/baseline.json and exits with 1 if a benchmark is slower, allocates
+more or makes more queries than the baseline by more than the threshold. The
+timings depend on the machine, thus the baseline should be saved on the machine
+that compares, e.g. on the main branch before a change.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from benchmarks.utils import (
+    benchmark_environment,
+    measure,
+    measure_allocations,
+    print_results,
+    setup_django,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = "10,100"
+SEED = 0
+# The rounds of a benchmark are limited to about ROUNDS_SECONDS
+ROUNDS_SECONDS = 2
+MIN_ROUNDS = 5
+ALLOCATION_ROUNDS = 20
+COMPARED_METRICS = ("median_us", "peak_alloc_bytes", "queries_per_call")
+# Smaller differences of the timings are noise
+MIN_REGRESSION_US = 5
+
+
+def get_regressions(baseline, results, threshold):
+    """Returns the benchmarks and metrics that exceed the baseline by the threshold."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = baseline[name][metric], result[metric]
+            if metric == "queries_per_call":
+                regressed = new > old
+            elif metric == "median_us" and new - old < MIN_REGRESSION_US:
+                regressed = False
+            else:
+                regressed = new > old * (1 + threshold)
+            if regressed:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.micro",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    setup_django()
+
+    from django.conf import settings
+
+    from account.models import User
+    from benchmarks.load_test.questionnaire import (
+        get_questionnaire_data,
+        import_questionnaire,
+    )
+    from profiles.answer_context import get_user_answer_context, user_answer_scope
+    from profiles.api.serializers import PostalCodeResultSerializer, QuestionSerializer
+    from profiles.api.utils import blur_count
+    from profiles.api.views import (
+        PostalCodeResultViewSet,
+        question_condition_met,
+        QuestionViewSet,
+        sub_question_condition_met,
+    )
+    from profiles.models import (
+        Answer,
+        PostalCode,
+        PostalCodeResult,
+        PostalCodeType,
+        Question,
+        QuestionCondition,
+        Result,
+        SubQuestionCondition,
+    )
+    from profiles.utils import encrypt_text, get_user_result
+
+    def create_data(size):
+        """Returns a user who has answered every question."""
+        rng = random.Random(SEED)
+        for model in (User, Question, Result, PostalCode, PostalCodeType):
+            model.objects.all().delete()
+        import_questionnaire(get_questionnaire_data(rng, size, 4, 3, 0.3))
+        user = User.objects.create(username="benchmark")
+        answers = []
+        for question in Question.objects.prefetch_related(
+            "options", "sub_questions__options"
+        ):
+            for sub_question in question.sub_questions.all():
+                answers.append(
+                    Answer(
+                        user=user,
+                        question=question,
+                        sub_question=sub_question,
+                        option=rng.choice(sub_question.options.all()),
+                    )
+                )
+            if question.options.all():
+                answers.append(
+                    Answer(
+                        user=user,
+                        question=question,
+                        option=rng.choice(question.options.all()),
+                    )
+                )
+        Answer.objects.bulk_create(answers)
+
+        results = list(Result.objects.all())
+        postal_code_types = [
+            PostalCodeType.objects.create(type_name=type_name)
+            for type_name in (
+                PostalCodeType.HOME_POSTAL_CODE,
+                PostalCodeType.OPTIONAL_POSTAL_CODE,
+            )
+        ]
+        postal_codes = PostalCode.objects.bulk_create(
+            PostalCode(postal_code=f"{20000 + i}")
+            for i in range(size // (len(results) * len(postal_code_types)) + 1)
+        )
+        PostalCodeResult.objects.bulk_create(
+            PostalCodeResult(
+                postal_code=postal_code,
+                postal_code_type=postal_code_type,
+                result=result,
+                count=rng.randrange(20),
+            )
+            for postal_code in postal_codes
+            for postal_code_type in postal_code_types
+            for result in results
+        )
+        return user
+
+    def get_benchmarks(size):
+        user = create_data(size)
+        question_conditions = {}
+        for question_condition in QuestionCondition.objects.prefetch_related(
+            "option_conditions"
+        ):
+            question_conditions.setdefault(question_condition.question_id, []).append(
+                question_condition
+            )
+        sub_question_conditions = list(SubQuestionCondition.objects.all())
+        counts = [random.Random(SEED).randrange(20) for _ in range(size)]
+        token_keys = [f"{i:040x}" for i in range(size)]
+
+        def user_result(i):
+            return get_user_result(user)
+
+        def question_conditions_met(i):
+            # The answers of the user are loaded once per request
+            with user_answer_scope():
+                get_user_answer_context(user).answers
+                return [
+                    question_condition_met(conditions, user)
+                    for conditions in question_conditions.values()
+                ]
+
+        def sub_question_conditions_met(i):
+            with user_answer_scope():
+                get_user_answer_context(user).answers
+                return [
+                    sub_question_condition_met(sub_question_condition, user)
+                    for sub_question_condition in sub_question_conditions
+                ]
+
+        def blur_counts(i):
+            return [blur_count(count) for count in counts]
+
+        def question_tree(i):
+            return QuestionSerializer(QuestionViewSet.queryset.all(), many=True).data
+
+        def postal_code_result_page(i):
+            page = PostalCodeResultViewSet.queryset.all()[:size]
+            return PostalCodeResultSerializer(page, many=True).data
+
+        def encrypt_token_keys(i):
+            return [encrypt_text(key, settings.TOKEN_SECRET) for key in token_keys]
+
+        return {
+            "get_user_result": user_result,
+            "question_condition_met": question_conditions_met,
+            "sub_question_condition_met": sub_question_conditions_met,
+            "blur_count": blur_counts,
+            "QuestionSerializer": question_tree,
+            "PostalCodeResultSerializer": postal_code_result_page,
+            "encrypt_text": encrypt_token_keys,
+        }
+
+    results = {}
+    with benchmark_environment(args.use_configured_cache):
+        for size in sizes:
+            for name, func in get_benchmarks(size).items():
+                # The warm-up call limits the rounds of the slow benchmarks
+                start = time.perf_counter()
+                func(0)
+                rounds = int(ROUNDS_SECONDS / (time.perf_counter() - start))
+                rounds = max(MIN_ROUNDS, min(args.rounds, rounds))
+                result = measure(func, rounds)
+                result["peak_alloc_bytes"] = measure_allocations(
+                    func, min(rounds, ALLOCATION_ROUNDS)
+                )
+                results[f"{name}[{size}]"] = result
+    print_results("Microbenchmarks", results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved the baseline to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = get_regressions(baseline, results, args.threshold)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.1f} -> {new:.1f}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} compared with the baseline")
+
+
+if __name__ == "__main__":
+    main()
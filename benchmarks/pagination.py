@@ -0,0 +1,93 @@
+"""
+Measures the latency of the pages of the postal code results by the depth of the
+page, with the page number pagination and with the cursor pagination.
+
+    python -m benchmarks.pagination [--rows 100000] [--page-size 100] [--rounds 20]
+
+The page number pagination counts the rows and skips the rows of the previous
+pages with OFFSET, thus the deep pages are slower. The cursor of a page is taken
+from the next link of the page before it and the page is queried by the key.
+"""
+
+import argparse
+
+from benchmarks.utils import benchmark_environment, measure, print_results, setup_django
+
+DEPTHS = (0.0, 0.5, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    setup_django()
+
+    from django.test.utils import override_settings
+    from rest_framework.pagination import Cursor
+    from rest_framework.reverse import reverse
+    from rest_framework.test import APIClient
+
+    from profiles.api_pagination import CursorPagination
+    from profiles.models import PostalCode, PostalCodeResult, PostalCodeType, Result
+
+    with benchmark_environment(args.use_configured_cache), override_settings(
+        ALLOWED_HOSTS=["testserver"]
+    ):
+        results = Result.objects.bulk_create(
+            [Result(topic=f"topic {i}", value=f"value {i}") for i in range(10)]
+        )
+        postal_code_type = PostalCodeType.objects.create(
+            type_name=PostalCodeType.HOME_POSTAL_CODE
+        )
+        postal_codes = PostalCode.objects.bulk_create(
+            [
+                PostalCode(postal_code=str(i))
+                for i in range(args.rows // len(results) + 1)
+            ]
+        )
+        PostalCodeResult.objects.bulk_create(
+            (
+                PostalCodeResult(
+                    postal_code=postal_codes[i // len(results)],
+                    postal_code_type=postal_code_type,
+                    result=results[i % len(results)],
+                    count=i,
+                )
+                for i in range(args.rows)
+            ),
+            batch_size=5000,
+        )
+        client = APIClient()
+        url = reverse("profiles:postalcoderesult-list")
+        num_pages = args.rows // args.page_size
+        timings = {}
+        for depth in DEPTHS:
+            page = int(num_pages * depth)
+            page_url = f"{url}?page_size={args.page_size}&page={page + 1}"
+            timings[f"page number, page {page + 1}"] = measure(
+                lambda i: client.get(page_url), args.rounds
+            )
+            # The cursor of the next link of the previous page, i.e. its last id
+            paginator = CursorPagination()
+            paginator.base_url = f"{url}?pagination=cursor&page_size={args.page_size}"
+            position = (
+                PostalCodeResult.objects.order_by("id").values_list("id", flat=True)[
+                    page * args.page_size - 1
+                ]
+                if page
+                else None
+            )
+            cursor_url = paginator.encode_cursor(Cursor(0, False, position))
+            timings[f"cursor, page {page + 1}"] = measure(
+                lambda i: client.get(cursor_url), args.rounds
+            )
+    print_results(
+        f"{args.rows} postal code results, {args.page_size} per page", timings
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Load tests the nginx micro-cache of a deployment, see deploy/docker_nginx.conf.
+Concurrent clients request the URL through nginx for --duration seconds.
+
+    python -m benchmarks.proxy_cache --url http://localhost/api/v1/question/
+        [--concurrency 50] [--duration 10] [--accept application/json]
+
+The requests per second are reported with the X-Cache-Status of the responses:
+the HITs, and the STALE and UPDATING responses, are served by nginx without
+touching Python, the MISSes, EXPIREDs and REVALIDATEDs reach uwsgi. Compare with
+the same URL through the refresh server of nginx, e.g. --url
+http://localhost:8080/api/v1/question/, that bypasses the cache.
+"""
+
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+SERVED_BY_NGINX = ("HIT", "STALE", "UPDATING")
+
+
+def client(url, accept, deadline, statuses, latencies, lock):
+    request = urllib.request.Request(url, headers={"Accept": accept})
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+                status = response.headers.get("X-Cache-Status", "-")
+        except urllib.error.HTTPError as exc:
+            status = f"HTTP {exc.code}"
+        except OSError:
+            status = "error"
+        latency = time.perf_counter() - start
+        with lock:
+            statuses[status] += 1
+            latencies.append(latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--accept", default="application/json")
+    args = parser.parse_args()
+
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(args.url, args.accept, deadline, statuses, latencies, lock),
+        )
+        for i in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(statuses.values())
+    served_by_nginx = sum(statuses[status] for status in SERVED_BY_NGINX)
+    latencies.sort()
+    print(f"{args.url}, {args.concurrency} clients, {elapsed:.1f} s")
+    print(f"  requests/s           {total / elapsed:>10.1f}")
+    print(f"  served by nginx/s    {served_by_nginx / elapsed:>10.1f}")
+    if latencies:
+        print(f"  median latency ms    {1000 * latencies[len(latencies) // 2]:>10.2f}")
+        print(
+            f"  p99 latency ms       "
+            f"{1000 * latencies[int(len(latencies) * 0.99)]:>10.2f}"
+        )
+    for status, count in statuses.most_common():
+        print(f"  {status:<20} {count:>10} {100 * count / total:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
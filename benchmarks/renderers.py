@@ -0,0 +1,141 @@
+"""
+Measures the serialization and the rendering of the questionnaire and of the
+statistics endpoints, with all the fields and with a sparse fieldset, and the
+size of the payloads.
+
+    python -m benchmarks.renderers [--questions 20] [--rows 1000] [--rounds 20]
+
+The view time is the time of the view without rendering, i.e. the queries and
+the serializers. The render time is measured with the JSONRenderer of DRF and
+with the ORJSONRenderer.
+"""
+
+import argparse
+import random
+
+from benchmarks.utils import benchmark_environment, measure, setup_django
+
+SEED = 0
+# The fields of the questionnaire that the poll shows, in Finnish
+QUESTIONNAIRE_FIELDS = (
+    "id,number,question_fi,number_of_options_to_choose,"
+    "mandatory_number_of_sub_questions_to_answer,options.id,options.value_fi,"
+    "options.is_other,sub_questions.id,sub_questions.description_fi,"
+    "sub_questions.options.id,sub_questions.options.value_fi"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    setup_django()
+
+    from django.core.cache import cache
+    from django.test.utils import override_settings
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+
+    from benchmarks.load_test.questionnaire import (
+        get_questionnaire_data,
+        import_questionnaire,
+    )
+    from profiles.api.renderers import ORJSONRenderer
+    from profiles.api.views import (
+        CumulativeResultsViewSet,
+        PostalCodeResultViewSet,
+        QuestionViewSet,
+    )
+    from profiles.models import PostalCode, PostalCodeResult, PostalCodeType, Result
+
+    endpoints = [
+        (
+            "questionnaire",
+            QuestionViewSet.as_view({"get": "list"}),
+            {"page_size": 1000},
+            QUESTIONNAIRE_FIELDS,
+        ),
+        (
+            "postal code results",
+            PostalCodeResultViewSet.as_view({"get": "list"}),
+            {"page_size": args.rows},
+            "id,postal_code_string,postal_code_type_string,result,count",
+        ),
+        (
+            "cumulative results",
+            CumulativeResultsViewSet.as_view({"get": "list"}),
+            {},
+            "id,topic_fi,sum_of_count",
+        ),
+    ]
+    factory = APIRequestFactory()
+    renderers = {"json": JSONRenderer(), "orjson": ORJSONRenderer()}
+    rows = []
+    with benchmark_environment(args.use_configured_cache), override_settings(
+        ALLOWED_HOSTS=["testserver"]
+    ):
+        import_questionnaire(
+            get_questionnaire_data(random.Random(SEED), args.questions, 4, 3, 0.3)
+        )
+        results = list(Result.objects.all())
+        postal_code_type = PostalCodeType.objects.create(
+            type_name=PostalCodeType.HOME_POSTAL_CODE
+        )
+        postal_codes = PostalCode.objects.bulk_create(
+            [
+                PostalCode(postal_code=str(20000 + i))
+                for i in range(args.rows // len(results) + 1)
+            ]
+        )
+        PostalCodeResult.objects.bulk_create(
+            PostalCodeResult(
+                postal_code=postal_codes[i // len(results)],
+                postal_code_type=postal_code_type,
+                result=results[i % len(results)],
+                count=i,
+            )
+            for i in range(args.rows)
+        )
+        for name, view, params, fields in endpoints:
+            for fieldset in (None, fields):
+                query = {**params, **({"fields": fieldset} if fieldset else {})}
+
+                def get_data(i):
+                    return view(factory.get("/", query)).data
+
+                def clear_cache(i):
+                    # The questionnaire is cached by cache_page
+                    cache.clear()
+
+                clear_cache(0)
+                data = get_data(0)
+                row = {
+                    "endpoint": name,
+                    "fields": "sparse" if fieldset else "all",
+                    "view_us": measure(get_data, args.rounds, clear_cache)["median_us"],
+                    "bytes": len(renderers["orjson"].render(data)),
+                }
+                for renderer_name, renderer in renderers.items():
+                    row[f"{renderer_name}_us"] = measure(
+                        lambda i: renderer.render(data), args.rounds
+                    )["median_us"]
+                rows.append(row)
+
+    print(f"{args.questions} questions, {args.rows} postal code results, medians")
+    print(
+        f"  {'endpoint':<20} {'fields':<6} {'view ms':>9} {'json ms':>9} "
+        f"{'orjson ms':>9} {'KiB':>9}"
+    )
+    for row in rows:
+        print(
+            f"  {row['endpoint']:<20} {row['fields']:<6} {row['view_us'] / 1000:>9.2f} "
+            f"{row['json_us'] / 1000:>9.2f} {row['orjson_us'] / 1000:>9.2f} "
+            f"{row['bytes'] / 1024:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
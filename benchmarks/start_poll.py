@@ -0,0 +1,62 @@
+"""
+Measures the throughput of start_poll of a single worker, i.e. the creation of
+an anonymous user with a profile and a token, and the encryption of the token.
+
+    python -m benchmarks.start_poll [--rounds 200]
+"""
+
+import argparse
+import uuid
+
+from benchmarks.utils import benchmark_environment, measure, print_results, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--use-configured-cache", action="store_true")
+    args = parser.parse_args()
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+
+    from account.models import Profile, User
+    from mpbackend.authentication import issue_signed_token
+    from profiles.utils import create_anonymous_user, encrypt_text, generate_password
+
+    with benchmark_environment(args.use_configured_cache):
+
+        def hashed_password(i):
+            # start_poll before create_anonymous_user
+            uuid4 = uuid.uuid4()
+            user = User.objects.create(
+                pk=uuid4, username=f"anonymous_{uuid4}", is_generated=True
+            )
+            user.password = make_password(generate_password())
+            user.profile = Profile.objects.create(user=user)
+            user.save()
+            token, _ = Token.objects.get_or_create(user=user)
+            return encrypt_text(token.key, settings.TOKEN_SECRET)
+
+        def unusable_password(i):
+            _, token = create_anonymous_user()
+            return encrypt_text(token.key, settings.TOKEN_SECRET)
+
+        def signed_token(i):
+            user, _ = create_anonymous_user(create_token=False)
+            return encrypt_text(issue_signed_token(user.id), settings.TOKEN_SECRET)
+
+        results = {
+            "hashed password": measure(hashed_password, args.rounds),
+            "unusable password": measure(unusable_password, args.rounds),
+            "unusable password, signed token": measure(signed_token, args.rounds),
+        }
+    print_results("start_poll per worker", results)
+    for name, result in results.items():
+        print(f"  {name:<32} {1e6 / result['mean_us']:9.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
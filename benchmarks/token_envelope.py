@@ -0,0 +1,60 @@
+"""
+Measures the encryption of the token returned by start_poll, per call on a
+single core, for the former encrypt_text and both envelope versions.
+
+    python -m benchmarks.token_envelope [--rounds 20000]
+"""
+
+import argparse
+import base64
+import os
+
+from benchmarks.utils import measure, print_results, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    setup_django()
+
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+    from django.conf import settings
+    from rest_framework.authtoken.models import Token
+
+    from mpbackend.token_envelope import decrypt_cbc, encrypt_cbc, seal, unseal
+
+    keys = [Token.generate_key() for _ in range(100)]
+    secret = settings.TOKEN_SECRET
+
+    def former_encrypt_text(i):
+        text = pad(keys[i % len(keys)].encode(), 16)
+        iv = os.urandom(16)
+        cipher = AES.new(secret.encode("utf-8"), AES.MODE_CBC, iv)
+        return base64.b64encode(cipher.encrypt(text)), base64.b64encode(
+            cipher.iv
+        ).decode("utf-8")
+
+    cbc_payloads = [encrypt_cbc(key) for key in keys]
+    envelopes = [seal(key) for key in keys]
+    results = {
+        "former encrypt_text": measure(former_encrypt_text, args.rounds),
+        "v1 (CBC) encrypt": measure(
+            lambda i: encrypt_cbc(keys[i % len(keys)]), args.rounds
+        ),
+        "v1 (CBC) decrypt": measure(
+            lambda i: decrypt_cbc(*cbc_payloads[i % len(keys)]), args.rounds
+        ),
+        "v2 (GCM) seal": measure(lambda i: seal(keys[i % len(keys)]), args.rounds),
+        "v2 (GCM) unseal": measure(
+            lambda i: unseal(envelopes[i % len(keys)]), args.rounds
+        ),
+    }
+    print_results("Token envelope per call", results)
+    for name, result in results.items():
+        print(f"  {name:<32} {1e6 / result['mean_us']:9.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import django
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mpbackend.settings")
+    django.setup()
+
+
+@contextmanager
+def benchmark_environment(use_configured_cache=False):
+    """
+    Creates the test database and, unless use_configured_cache is set, replaces
+    the cache (memcached) with the local memory cache.
+    """
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    cache_override = override_settings(
+        **({} if use_configured_cache else {"CACHES": LOCMEM_CACHES})
+    )
+    cache_override.enable()
+    try:
+        yield
+    finally:
+        cache_override.disable()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class QueryCounter:
+    """Database execute wrapper that counts the executed queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, rounds, setup=None):
+    """
+    Calls func rounds times and returns the timings in microseconds and the
+    number of queries per call. setup is called before every call, outside the timing.
+    """
+    from django.db import connection
+
+    timings = []
+    num_queries = 0
+    for i in range(rounds):
+        if setup:
+            setup(i)
+        query_counter = QueryCounter()
+        with connection.execute_wrapper(query_counter):
+            start = time.perf_counter()
+            func(i)
+            timings.append((time.perf_counter() - start) * 1e6)
+        num_queries += query_counter.count
+    timings.sort()
+    return {
+        "rounds": rounds,
+        "mean_us": statistics.mean(timings),
+        "median_us": statistics.median(timings),
+        "p95_us": timings[int(len(timings) * 0.95) - 1],
+        "queries_per_call": num_queries / rounds,
+    }
+
+
+def measure_allocations(func, rounds, setup=None):
+    """
+    Returns the mean peak of the memory allocated by a call in bytes. The calls are
+    separate from the timed calls of measure, as tracemalloc slows them down.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(rounds):
+            if setup:
+                setup(i)
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            func(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks)
+
+
+def print_results(title, results):
+    print(title)
+    for name, result in results.items():
+        allocations = ""
+        if "peak_alloc_bytes" in result:
+            allocations = f"  alloc {result['peak_alloc_bytes'] / 1024:9.1f} KiB"
+        print(
+            f"  {name:<32} mean {result['mean_us']:9.1f} us  "
+            f"median {result['median_us']:9.1f} us  p95 {result['p95_us']:9.1f} us  "
+            f"queries/call {result['queries_per_call']:.2f}{allocations}"
+        )
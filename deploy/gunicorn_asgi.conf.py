@@ -0,0 +1,29 @@
+# Gunicorn configuration of the ASGI deployment, the alternative to docker_uwsgi.ini.
+# Started by the start_production_asgi_server command of docker-entrypoint.sh:
+#   gunicorn -c deploy/gunicorn_asgi.conf.py
+# The poll endpoints should be served by the async views, i.e. ASYNC_POLL_VIEWS=True.
+# A worker serves many requests concurrently, the queries of the in-flight requests
+# are made in threads of the worker, thus less workers are needed than uwsgi processes.
+# The connections to the database are closed at the end of every request, as the
+# threads of the requests can not share them, see docker-entrypoint.sh, and the
+# connections to PostgreSQL are pooled by pgbouncer, see docker-compose.prod.yml.
+
+# full path to Django project's root directory
+chdir = "/mpbackend"
+# Django's asgi application
+wsgi_app = "mpbackend.asgi:application"
+worker_class = "uvicorn_worker.UvicornWorker"
+# number of worker processes
+workers = 2
+# the socket, shared with nginx, which proxies HTTP to it
+bind = "unix:/mpbackend/mpbackend.sock"
+# socket permissions 666
+umask = 0o111
+user = "appuser"
+group = "root"
+# restart a worker that does not respond within the timeout
+timeout = 60
+graceful_timeout = 30
+# log to stdout
+accesslog = "-"
+errorlog = "-"
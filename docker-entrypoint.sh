@@ -26,5 +26,13 @@ elif [ "$1" = 'import_questions' ]; then
 elif [ "$1" = 'start_production_server' ]; then
     echo "Starting production server..."
     exec uwsgi --ini deploy/docker_uwsgi.ini
+elif [ "$1" = 'start_production_asgi_server' ]; then
+    echo "Starting production ASGI server..."
+    export ASYNC_POLL_VIEWS=${ASYNC_POLL_VIEWS:-true}
+    # The queries of a request are made in a thread of its own, thus the connection
+    # can not be reused by the next request. The connections to PostgreSQL are reused
+    # by pgbouncer, see DATABASE_POOLER_HOST in docker-compose.prod.yml.
+    export DATABASE_CONN_MAX_AGE=0
+    exec gunicorn -c deploy/gunicorn_asgi.conf.py
 fi
 
@@ -0,0 +1,24 @@
+"""
+The URLs when ASYNC_POLL_VIEWS is enabled. The high-frequency poll endpoints are
+served by the async views of profiles.api.async_views, the rest as in mpbackend.urls.
+"""
+
+from django.urls import include, path
+
+import mpbackend.urls
+from profiles.api import async_views
+
+urlpatterns = [
+    path("api/v1/question/start_poll/", async_views.start_poll),
+    path(
+        "api/v1/question/get_questions_conditions_states/",
+        async_views.get_questions_conditions_states_view,
+    ),
+    path(
+        "api/v1/question/get_sub_questions_conditions_states/",
+        async_views.get_sub_questions_conditions_states_view,
+    ),
+    path("api/v1/answer/", async_views.create_answer),
+    path("api/v1/answer/get_result/", async_views.get_result),
+    path("", include(mpbackend.urls)),
+]
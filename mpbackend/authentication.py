@@ -1,11 +1,25 @@
+import uuid
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
 
+from account.models import RevokedToken
+
+SIGNED_TOKEN_SALT = "mpbackend.authentication.SignedTokenAuthentication"
+REVOKED_TOKEN_CACHE_KEY_PREFIX = "revoked_token"
+# Seconds the revocation status of a signed token is cached
+REVOKED_TOKEN_CACHE_TIMEOUT = 300
+SIGNED_TOKEN_SEP = ":"
+
 
 def is_token_expired(token):
     min_age = timezone.now() - timedelta(hours=settings.TOKEN_EXPIRED_AFTER_HOURS)
@@ -19,11 +33,17 @@ class ExpiringTokenAuthentication(TokenAuthentication):
     Raise AuthenticationFailed as needed, which translates
     to a 401 status code automatically.
     https://stackoverflow.com/questions/14567586
+
+    The token is fetched with the user, the profile and the result in a single
+    query, as the views access them.
     """
 
+    def get_queryset(self):
+        return Token.objects.select_related("user__profile", "user__result")
+
     def authenticate_credentials(self, key):
         try:
-            token = Token.objects.get(key=key)
+            token = self.get_queryset().get(key=key)
         except Token.DoesNotExist:
             raise AuthenticationFailed("Invalid token")
 
@@ -35,3 +55,194 @@ class ExpiringTokenAuthentication(TokenAuthentication):
             raise AuthenticationFailed("Token has expired and has been deleted")
 
         return (token.user, token)
+
+    async def aauthenticate_credentials(self, key):
+        """authenticate_credentials with the async ORM, for the async views."""
+        try:
+            token = await self.get_queryset().aget(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed("Invalid token")
+
+        if not token.user.is_active:
+            raise AuthenticationFailed("User inactive or deleted")
+
+        if is_token_expired(token):
+            await token.adelete()
+            raise AuthenticationFailed("Token has expired and has been deleted")
+
+        return (token.user, token)
+
+
+def get_token_lifetime():
+    return timedelta(hours=settings.TOKEN_EXPIRED_AFTER_HOURS)
+
+
+def get_signer():
+    return signing.TimestampSigner(key=settings.TOKEN_SECRET, salt=SIGNED_TOKEN_SALT)
+
+
+def issue_signed_token(user_id):
+    """
+    Returns a self-contained token carrying the id of the user and the issue time,
+    signed (HMAC) with the TOKEN_SECRET. No Token row is written.
+    """
+    return get_signer().sign(user_id.hex)
+
+
+def revoke_token(token):
+    """Revokes the token returned by the authentication, i.e. request.auth."""
+    if isinstance(token, SignedToken):
+        token.revoke()
+    else:
+        token.delete()
+
+
+class SignedToken:
+    """
+    The verified signed token, set as request.auth. The revoked tokens are stored
+    in the database, as RevokedTokens, and the revocation status of a token is
+    cached for REVOKED_TOKEN_CACHE_TIMEOUT seconds, thus a token is checked from
+    the database once in a while and the check survives the eviction of the cache.
+    """
+
+    def __init__(self, key, user_id):
+        self.key = key
+        self.user_id = user_id
+        self.signature = key.rsplit(SIGNED_TOKEN_SEP, 1)[1]
+
+    @staticmethod
+    def get_revoked_cache_key(signature):
+        return f"{REVOKED_TOKEN_CACHE_KEY_PREFIX}:{signature}"
+
+    @property
+    def is_revoked(self):
+        cache_key = self.get_revoked_cache_key(self.signature)
+        revoked = cache.get(cache_key)
+        if revoked is None:
+            revoked = RevokedToken.objects.filter(signature=self.signature).exists()
+            # Added, thus not overwriting a revocation cached meanwhile
+            cache.add(cache_key, revoked, REVOKED_TOKEN_CACHE_TIMEOUT)
+        return revoked
+
+    async def ais_revoked(self):
+        cache_key = self.get_revoked_cache_key(self.signature)
+        revoked = await cache.aget(cache_key)
+        if revoked is None:
+            revoked = await RevokedToken.objects.filter(
+                signature=self.signature
+            ).aexists()
+            await cache.aadd(cache_key, revoked, REVOKED_TOKEN_CACHE_TIMEOUT)
+        return revoked
+
+    def revoke(self):
+        # The revocation needs to be held only until the token expires.
+        lifetime = get_token_lifetime()
+        RevokedToken.objects.update_or_create(
+            signature=self.signature, defaults={"expires": timezone.now() + lifetime}
+        )
+        cache_key = self.get_revoked_cache_key(self.signature)
+        cache.delete(cache_key)
+        # Overwrites the status cached by the requests read before the commit
+        transaction.on_commit(
+            lambda: cache.set(cache_key, True, int(lifetime.total_seconds()))
+        )
+
+
+class LazyUser(SimpleLazyObject):
+    """
+    The user of a signed token. The user is fetched from the database only when
+    other attributes than the id or the authentication status are accessed.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id):
+        def get_user():
+            user = (
+                get_user_model()
+                .objects.select_related("profile", "result")
+                .filter(pk=user_id)
+                .first()
+            )
+            if not user or not user.is_active:
+                raise AuthenticationFailed("User inactive or deleted")
+            return user
+
+        super().__init__(get_user)
+        self.__dict__["_user_id"] = user_id
+
+    def __bool__(self):
+        return True
+
+    @property
+    def pk(self):
+        return self.__dict__["_user_id"]
+
+    id = pk
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Authenticates the signed tokens issued by issue_signed_token, mostly without
+    database queries. The tokens expire after TOKEN_EXPIRED_AFTER_HOURS and the
+    revoked tokens are rejected, see SignedToken. Other tokens are left to the
+    next authentication class.
+    """
+
+    def authenticate_credentials(self, key):
+        token = self.get_signed_token(key)
+        if not token:
+            return None
+        if token.is_revoked:
+            raise AuthenticationFailed("Token has been revoked")
+        return (LazyUser(token.user_id), token)
+
+    async def aauthenticate_credentials(self, key):
+        """authenticate_credentials with the async ORM and cache, for the async views."""
+        token = self.get_signed_token(key)
+        if not token:
+            return None
+        if await token.ais_revoked():
+            raise AuthenticationFailed("Token has been revoked")
+        return (LazyUser(token.user_id), token)
+
+    @staticmethod
+    def get_signed_token(key):
+        """Returns the verified SignedToken or None if the key is not a signed token."""
+        if SIGNED_TOKEN_SEP not in key:
+            return None
+        try:
+            user_id = get_signer().unsign(key, max_age=get_token_lifetime())
+        except signing.SignatureExpired:
+            raise AuthenticationFailed("Token has expired")
+        except signing.BadSignature:
+            raise AuthenticationFailed("Invalid token")
+        try:
+            user_id = uuid.UUID(user_id)
+        except ValueError:
+            raise AuthenticationFailed("Invalid token")
+        return SignedToken(key, user_id)
+
+
+class TokenHeader(TokenAuthentication):
+    """Parses the key of the token from the Authorization header, as DRF does."""
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+async def aauthenticate(request):
+    """
+    Authenticates the request of an async view as the DEFAULT_AUTHENTICATION_CLASSES,
+    with the async ORM and cache. Returns (user, token) or None, if the request has
+    no token. Raises AuthenticationFailed for an invalid token.
+    """
+    key = TokenHeader().authenticate(request)
+    if key is None:
+        return None
+    for authentication in (SignedTokenAuthentication(), ExpiringTokenAuthentication()):
+        user_auth = await authentication.aauthenticate_credentials(key)
+        if user_auth is not None:
+            return user_auth
+    return None
@@ -0,0 +1,161 @@
+"""
+Routes the reads of the read-only endpoints to the read replicas of the database.
+
+The replicas are configured with DATABASE_REPLICA_URLS as the aliases replica_1,
+replica_2 and so on. The reads are routed to a replica only within replica_reads,
+which is opened by the read-only viewsets, see profiles.api.utils.ReplicaReadMixin,
+and by the admin changelists, see profiles.admin.ReplicaChangeListAdminMixin. All
+the writes and the other reads use the primary, thus the users read their own
+answers and results. Within replica_reads the models of the users, the sessions and
+the tokens are read from the primary, as are all the models after a write.
+
+A replica is used only if it lags at most DATABASE_REPLICA_MAX_LAG seconds behind
+the primary. The lag is checked every DATABASE_REPLICA_CHECK_INTERVAL seconds per
+process, and the reads fall back to the primary when no replica can be used.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# The models always read from the primary
+PRIMARY_MODELS = frozenset(["sessions.session", "authtoken.token"])
+# The models of the users, read from the primary also by the read-only viewsets
+USER_MODELS = frozenset(
+    [
+        "account.user",
+        "account.profile",
+        "account.pooledanonymoususer",
+        "profiles.answer",
+        "profiles.answerother",
+    ]
+)
+# Session key of the time until which the admin reads its writes from the primary
+PRIMARY_READS_UNTIL_SESSION_KEY = "primary_reads_until"
+# The replay of a replica that has received all the WAL is not behind the primary,
+# even if the replay timestamp is old, and a primary has no replay timestamp
+REPLICATION_LAG_SQL = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+_replica_scope = ContextVar("replica_scope", default=None)
+
+
+class ReplicaScope:
+    def __init__(self, primary_models):
+        self.primary_models = PRIMARY_MODELS | set(primary_models)
+        self.alias = None
+        self.written = False
+
+
+@contextmanager
+def replica_reads(primary_models=USER_MODELS):
+    """Routes the reads of the models, except of the primary_models, to a replica."""
+    token = _replica_scope.set(ReplicaScope(primary_models))
+    try:
+        yield
+    finally:
+        _replica_scope.reset(token)
+
+
+def get_replication_lag(alias):
+    """Returns the seconds the replica lags behind the primary, None if not available."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICATION_LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.exception(f"Checking the replication lag of {alias} failed")
+        return None
+    return float(lag or 0)
+
+
+class ReplicaStates:
+    """Caches per process whether the replicas can be used, i.e. do not lag."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def is_usable(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(alias)
+        if state and now - state[0] < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+            return state[1]
+        lag = get_replication_lag(alias)
+        usable = lag is not None and lag <= settings.DATABASE_REPLICA_MAX_LAG
+        if not usable:
+            logger.warning(f"Not reading from {alias}, replication lag {lag}")
+        with self._lock:
+            self._states[alias] = (now, usable)
+        return usable
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+replica_states = ReplicaStates()
+
+
+def get_replica():
+    """Returns a usable replica, chosen at random, or None."""
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS if replica_states.is_usable(alias)
+    ]
+    return random.choice(replicas) if replicas else None
+
+
+def pin_primary_reads(request):
+    """The admin reads from the primary until its writes have been replicated."""
+    request.session[PRIMARY_READS_UNTIL_SESSION_KEY] = (
+        time.time() + settings.DATABASE_REPLICA_MAX_LAG
+    )
+
+
+def is_pinned_to_primary(request):
+    return request.session.get(PRIMARY_READS_UNTIL_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        scope = _replica_scope.get()
+        if (
+            scope is None
+            or scope.written
+            or model._meta.label_lower in scope.primary_models
+        ):
+            return DEFAULT_DB_ALIAS
+        if scope.alias is None:
+            # The reads of a scope use the same replica
+            scope.alias = get_replica() or DEFAULT_DB_ALIAS
+        return scope.alias
+
+    def db_for_write(self, model, **hints):
+        scope = _replica_scope.get()
+        if scope is not None:
+            scope.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas have the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
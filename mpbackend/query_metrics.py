@@ -0,0 +1,422 @@
+"""
+Opt-in instrumentation of the requests, enabled with QUERY_METRICS.
+
+QueryMetricsMiddleware records the number of SQL queries, the time spent in the
+database, in the serializers and in total, and the size of the response of every
+request, keyed by the DRF view and action. The metrics are aggregated in the
+process and served as Prometheus text by metrics_view, labelled with the pid as
+every uwsgi worker has its own metrics. Requests that exceed QUERY_METRICS_QUERY_BUDGET
+are logged with the fingerprints of their queries. The metrics of the pool of
+anonymous users are served as well.
+
+The connections to the database opened by the requests and the time spent
+opening them, i.e. waiting for a connection, are recorded as well, with the
+connections open in the process and in use by the requests in flight. When the
+connections are pooled by PgBouncer, i.e. DATABASE_POOLER_HOST is set, the
+clients waiting for a server connection, the longest wait and the sizes of its
+pools are read from the admin console of PgBouncer on every scrape.
+
+The time spent in the serializers is measured by replacing BaseSerializer.data
+of DRF with a timed property, for the whole process, when the middleware is
+loaded. The property only times the serializers of the requests measured by the
+middleware. BaseDatabaseWrapper.connect and _close are timed and counted in the
+same way. The middleware supports both the sync and the async requests, thus
+the ASGI deployment serves the async views asynchronously with QUERY_METRICS.
+
+When QUERY_METRICS is disabled, the middleware removes itself from the
+middleware chain, thus there is no overhead.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+import psycopg2
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.http import Http404, HttpResponse
+from rest_framework.serializers import BaseSerializer
+
+from account.pool import get_pool_metrics
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = "mpbackend"
+NUM_LOGGED_FINGERPRINTS = 5
+# (name, help, attribute of RequestMetrics)
+REQUEST_METRICS = [
+    ("requests_total", "Number of requests.", None),
+    ("db_queries_total", "Number of SQL queries.", "num_queries"),
+    ("db_seconds_total", "Time spent executing SQL queries.", "db_seconds"),
+    (
+        "serializer_seconds_total",
+        "Time spent in the serializers, including their queries.",
+        "serializer_seconds",
+    ),
+    ("duration_seconds_total", "Total time spent on the requests.", "duration"),
+    ("response_bytes_total", "Size of the response bodies.", "response_bytes"),
+    (
+        "db_connections_total",
+        "Number of connections to the database opened.",
+        "num_connections",
+    ),
+    (
+        "db_connect_seconds_total",
+        "Time spent opening connections to the database.",
+        "connect_seconds",
+    ),
+    (
+        "over_query_budget_total",
+        "Number of requests that exceeded the query budget.",
+        "over_budget",
+    ),
+]
+
+# (name, type, help) of the connections of the process
+CONNECTION_METRICS = [
+    ("db_connections_opened_total", "counter", "Number of connections opened."),
+    ("db_connect_seconds_total", "counter", "Time spent opening connections."),
+    ("db_connections_open", "gauge", "Number of connections open."),
+    (
+        "db_connections_in_use",
+        "gauge",
+        "Number of connections used by the requests in flight.",
+    ),
+]
+# (name, help, column of SHOW POOLS or SHOW DATABASES) of the pools of PgBouncer
+POOLER_METRICS = [
+    ("cl_active", "Clients linked to a server connection or idle.", "cl_active"),
+    ("cl_waiting", "Clients waiting for a server connection.", "cl_waiting"),
+    ("sv_active", "Server connections linked to a client.", "sv_active"),
+    ("sv_idle", "Server connections unused and available.", "sv_idle"),
+    ("maxwait_seconds", "Wait of the oldest waiting client.", None),
+    ("pool_size", "Maximum number of server connections.", "pool_size"),
+    ("reserve_pool_size", "Additional server connections.", "reserve_pool_size"),
+]
+POOLER_CONNECT_TIMEOUT = 2
+
+_current_request_metrics = ContextVar("current_request_metrics", default=None)
+
+
+def get_sql_fingerprint(sql):
+    """Returns the SQL with the literals and the lists of values replaced."""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"\((\s*\?\s*,)+\s*\?\s*\)", "(...)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.num_queries = 0
+        self.db_seconds = 0
+        self.serializer_seconds = 0
+        self.duration = 0
+        self.response_bytes = 0
+        self.over_budget = 0
+        self.num_connections = 0
+        self.connect_seconds = 0
+        self.fingerprints = Counter()
+        self.aliases = set()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        alias = context["connection"].alias
+        if alias not in self.aliases:
+            self.aliases.add(alias)
+            registry.add_connection_metric("db_connections_in_use", 1)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.num_queries += 1
+            self.fingerprints[get_sql_fingerprint(sql)] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(Counter)
+        self._connection_metrics = Counter()
+
+    def record(self, key, request_metrics):
+        with self._lock:
+            metrics = self._metrics[key]
+            for name, _, attribute in REQUEST_METRICS:
+                metrics[name] += getattr(request_metrics, attribute) if attribute else 1
+
+    def get(self, key):
+        with self._lock:
+            return Counter(self._metrics.get(key, {}))
+
+    def add_connection_metric(self, name, value):
+        with self._lock:
+            self._connection_metrics[name] += value
+
+    def get_connection_metrics(self):
+        with self._lock:
+            return Counter(self._connection_metrics)
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+            self._connection_metrics.clear()
+
+    def to_prometheus(self):
+        pid = os.getpid()
+        lines = []
+        with self._lock:
+            items = sorted(self._metrics.items())
+            connection_metrics = Counter(self._connection_metrics)
+        for name, description, _ in REQUEST_METRICS:
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} counter")
+            for (view, action), metrics in items:
+                lines.append(
+                    f'{metric}{{view="{view}",action="{action}",pid="{pid}"}} '
+                    f"{metrics[name]}"
+                )
+        for name, metric_type, description in CONNECTION_METRICS:
+            metric = f"{METRICS_PREFIX}_process_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            lines.append(f'{metric}{{pid="{pid}"}} {connection_metrics[name]}')
+        pools = get_pooler_metrics()
+        for name, description, _ in POOLER_METRICS:
+            metric = f"{METRICS_PREFIX}_db_pooler_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            for (database, user), metrics in sorted(pools.items()):
+                lines.append(
+                    f'{metric}{{database="{database}",user="{user}"}} {metrics[name]}'
+                )
+        for name, value in get_pool_metrics().items():
+            metric = f"{METRICS_PREFIX}_anonymous_user_pool_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def get_pooler_metrics():
+    """
+    Returns the metrics of the pools of PgBouncer by (database, user), read from its
+    admin console with the credentials of the default database, thus the user must
+    be in the stats_users of PgBouncer. Empty if the connections are not pooled.
+    """
+    if not settings.DATABASE_POOLER_HOST:
+        return {}
+    database = settings.DATABASES["default"]
+    pools = defaultdict(Counter)
+    try:
+        connection = psycopg2.connect(
+            host=database["HOST"],
+            port=database["PORT"],
+            user=database["USER"],
+            password=database["PASSWORD"],
+            dbname="pgbouncer",
+            connect_timeout=POOLER_CONNECT_TIMEOUT,
+        )
+    except psycopg2.Error as exc:
+        logger.warning(f"Could not connect to PgBouncer: {exc}")
+        return {}
+    try:
+        # The admin console does not support transactions
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW POOLS")
+            columns = [column.name for column in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                metrics = pools[(row["database"], row["user"])]
+                for name, _, column in POOLER_METRICS[:4]:
+                    metrics[name] = row[column]
+                metrics["maxwait_seconds"] = row["maxwait"] + row["maxwait_us"] / 1e6
+            cursor.execute("SHOW DATABASES")
+            columns = [column.name for column in cursor.description]
+            for row in cursor.fetchall():
+                row = dict(zip(columns, row))
+                for (database_name, _), metrics in pools.items():
+                    if database_name == row["name"]:
+                        metrics["pool_size"] = row["pool_size"]
+                        # Named reserve_pool by the older versions of PgBouncer
+                        metrics["reserve_pool_size"] = row.get(
+                            "reserve_pool_size", row.get("reserve_pool")
+                        )
+    except psycopg2.Error as exc:
+        logger.warning(f"Could not read the pools of PgBouncer: {exc}")
+        return {}
+    finally:
+        connection.close()
+    return pools
+
+
+def get_view_key(view_func, method):
+    """Returns the (view, action) of the DRF view or the name of other views."""
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return (f"{view_func.__module__}.{view_func.__name__}", "")
+    actions = getattr(view_func, "actions", None) or {}
+    return (view_class.__name__, actions.get(method.lower(), method.lower()))
+
+
+def time_serializer_data(data_property):
+    def data(serializer):
+        request_metrics = _current_request_metrics.get()
+        if request_metrics is None:
+            return data_property.fget(serializer)
+        # Nested serializers are timed by the outermost serializer
+        request_metrics._serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return data_property.fget(serializer)
+        finally:
+            request_metrics._serializer_depth -= 1
+            if not request_metrics._serializer_depth:
+                request_metrics.serializer_seconds += time.perf_counter() - start
+
+    data.is_timed = True
+    return property(data)
+
+
+def time_database_connect(connect):
+    def timed_connect(database_wrapper):
+        start = time.perf_counter()
+        try:
+            return connect(database_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            if database_wrapper.connection is not None:
+                registry.add_connection_metric("db_connections_opened_total", 1)
+                registry.add_connection_metric("db_connections_open", 1)
+            registry.add_connection_metric("db_connect_seconds_total", seconds)
+            request_metrics = _current_request_metrics.get()
+            if request_metrics is not None:
+                request_metrics.num_connections += 1
+                request_metrics.connect_seconds += seconds
+
+    timed_connect.is_timed = True
+    return timed_connect
+
+
+def count_database_close(close):
+    def counted_close(database_wrapper):
+        try:
+            return close(database_wrapper)
+        finally:
+            registry.add_connection_metric("db_connections_open", -1)
+
+    counted_close.is_timed = True
+    return counted_close
+
+
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_METRICS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        if not getattr(BaseSerializer.data.fget, "is_timed", False):
+            BaseSerializer.data = time_serializer_data(BaseSerializer.data)
+        if not getattr(BaseDatabaseWrapper.connect, "is_timed", False):
+            BaseDatabaseWrapper.connect = time_database_connect(
+                BaseDatabaseWrapper.connect
+            )
+            BaseDatabaseWrapper._close = count_database_close(
+                BaseDatabaseWrapper._close
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_metrics_key = get_view_key(view_func, request.method)
+
+    @staticmethod
+    def wrap_connections(request_metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(request_metrics))
+        return stack
+
+    @staticmethod
+    def release_connections(request_metrics):
+        registry.add_connection_metric(
+            "db_connections_in_use", -len(request_metrics.aliases)
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        context_token = _current_request_metrics.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            with self.wrap_connections(request_metrics):
+                response = self.get_response(request)
+        finally:
+            _current_request_metrics.reset(context_token)
+            self.release_connections(request_metrics)
+        return self.record(request, response, request_metrics, start)
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        context_token = _current_request_metrics.set(request_metrics)
+        start = time.perf_counter()
+        # The connections are per thread, the queries of the request are made in
+        # the thread of its sync_to_async calls, thus the connections are wrapped there
+        stack = await sync_to_async(self.wrap_connections)(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current_request_metrics.reset(context_token)
+            self.release_connections(request_metrics)
+        return self.record(request, response, request_metrics, start)
+
+    def record(self, request, response, request_metrics, start):
+        request_metrics.duration = time.perf_counter() - start
+        if not response.streaming:
+            request_metrics.response_bytes = len(response.content)
+
+        key = getattr(request, "query_metrics_key", ("unresolved", ""))
+        if request_metrics.num_queries > settings.QUERY_METRICS_QUERY_BUDGET:
+            request_metrics.over_budget = 1
+            fingerprints = "\n".join(
+                f"  {count} x {fingerprint}"
+                for fingerprint, count in request_metrics.fingerprints.most_common(
+                    NUM_LOGGED_FINGERPRINTS
+                )
+            )
+            logger.warning(
+                f"{request.method} {request.path} ({key[0]}.{key[1]}) made "
+                f"{request_metrics.num_queries} queries, the budget is "
+                f"{settings.QUERY_METRICS_QUERY_BUDGET}:\n{fingerprints}"
+            )
+        registry.record(key, request_metrics)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text of the metrics of this process, for the allowed IPs only."""
+    if not settings.QUERY_METRICS:
+        raise Http404()
+    if request.META.get("REMOTE_ADDR") not in settings.QUERY_METRICS_ALLOWED_IPS:
+        raise PermissionDenied()
+    return HttpResponse(
+        registry.to_prometheus(), content_type="text/plain; version=0.0.4"
+    )
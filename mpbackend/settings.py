@@ -24,6 +24,25 @@ env = environ.Env(
     CORS_ORIGIN_WHITELIST=(list, []),
     CACHE_LOCATION=(str, "127.0.0.1:11211"),
     TOKEN_SECRET=(str, None),
+    SIGNED_SESSION_TOKENS=(bool, False),
+    TOKEN_ENVELOPE_VERSION=(int, 1),
+    QUERY_METRICS=(bool, False),
+    QUERY_METRICS_QUERY_BUDGET=(int, 20),
+    QUERY_METRICS_ALLOWED_IPS=(list, ["127.0.0.1"]),
+    ANONYMOUS_USER_POOL=(bool, False),
+    ANONYMOUS_USER_POOL_LOW_WATERMARK=(int, 200),
+    ANONYMOUS_USER_POOL_HIGH_WATERMARK=(int, 1000),
+    ASYNC_POLL_VIEWS=(bool, False),
+    DATABASE_CONN_MAX_AGE=(int, 60),
+    DATABASE_CONN_HEALTH_CHECKS=(bool, True),
+    DATABASE_POOLER_HOST=(str, ""),
+    DATABASE_POOLER_PORT=(int, 6432),
+    DATABASE_REPLICA_URLS=(list, []),
+    DATABASE_REPLICA_MAX_LAG=(float, 5),
+    DATABASE_REPLICA_CHECK_INTERVAL=(float, 5),
+    QUESTIONNAIRE_CACHE_MAX_AGE=(int, 60),
+    STATISTICS_CACHE_MAX_AGE=(int, 10),
+    PROXY_CACHE_REFRESH_URL=(str, ""),
 )
 # WARN about env file not being preset. Here we pre-empt it.
 env_file_path = os.path.join(BASE_DIR, CONFIG_FILE_NAME)
@@ -58,6 +77,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mpbackend.query_metrics.QueryMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -66,9 +86,20 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "profiles.middleware.UserAnswerContextMiddleware",
 ]
 
-ROOT_URLCONF = "mpbackend.urls"
+# If True, the high-frequency poll endpoints are served by async views, see
+# profiles.api.async_views. Enable when served by the ASGI server.
+ASYNC_POLL_VIEWS = env("ASYNC_POLL_VIEWS")
+ROOT_URLCONF = "mpbackend.async_urls" if ASYNC_POLL_VIEWS else "mpbackend.urls"
+
+# If True, the number of queries, the time spent and the size of the responses are recorded
+# per endpoint and served as Prometheus text at /internal/metrics/ to the allowed IPs.
+# Requests making more queries than the budget are logged.
+QUERY_METRICS = env("QUERY_METRICS")
+QUERY_METRICS_QUERY_BUDGET = env("QUERY_METRICS_QUERY_BUDGET")
+QUERY_METRICS_ALLOWED_IPS = env("QUERY_METRICS_ALLOWED_IPS")
 
 TEMPLATES = [
     {
@@ -100,6 +131,18 @@ CSRF_TRUSTED_ORIGINS = ["http://localhost:8080"]
 
 SECURE_CROSS_ORIGIN_OPENER_POLICY = None
 TOKEN_SECRET = env("TOKEN_SECRET")
+# Encryption of the token returned by start_poll, 1 for AES-CBC and 2 for AES-GCM.
+# See mpbackend/token_envelope.py
+TOKEN_ENVELOPE_VERSION = env("TOKEN_ENVELOPE_VERSION")
+# If True, start_poll issues signed tokens that are authenticated without database queries,
+# instead of creating a Token row.
+SIGNED_SESSION_TOKENS = env("SIGNED_SESSION_TOKENS")
+# If True, start_poll claims a pre-created anonymous user from the pool, that is
+# kept filled by the fill_anonymous_user_pool management command. The pool is refilled
+# to the high watermark when its size drops below the low watermark.
+ANONYMOUS_USER_POOL = env("ANONYMOUS_USER_POOL")
+ANONYMOUS_USER_POOL_LOW_WATERMARK = env("ANONYMOUS_USER_POOL_LOW_WATERMARK")
+ANONYMOUS_USER_POOL_HIGH_WATERMARK = env("ANONYMOUS_USER_POOL_HIGH_WATERMARK")
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
@@ -107,11 +150,14 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "profiles.api_pagination.Pagination",
     "PAGE_SIZE": 20,
+    # The browsable API is rendered only in development
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-        "profiles.api.renderers.CustomBrowsableAPIRenderer",
-    ],
+        "profiles.api.renderers.ORJSONRenderer",
+        "profiles.api.renderers.MessagePackRenderer",
+    ]
+    + (["profiles.api.renderers.CustomBrowsableAPIRenderer"] if DEBUG else []),
     "DEFAULT_AUTHENTICATION_CLASSES": [
+        "mpbackend.authentication.SignedTokenAuthentication",
         "mpbackend.authentication.ExpiringTokenAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
@@ -128,6 +174,29 @@ WSGI_APPLICATION = "mpbackend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 DATABASES = {"default": env.db()}
+# The reads of the read-only endpoints and of the admin changelists are routed to the
+# read replicas, if any, that lag at most DATABASE_REPLICA_MAX_LAG seconds. The lag is
+# checked every DATABASE_REPLICA_CHECK_INTERVAL seconds, see mpbackend.db_router.
+DATABASE_REPLICAS = []
+for number, url in enumerate(env("DATABASE_REPLICA_URLS"), start=1):
+    DATABASES[f"replica_{number}"] = env.db_url_config(url)
+    DATABASE_REPLICAS.append(f"replica_{number}")
+DATABASE_REPLICA_MAX_LAG = env("DATABASE_REPLICA_MAX_LAG")
+DATABASE_REPLICA_CHECK_INTERVAL = env("DATABASE_REPLICA_CHECK_INTERVAL")
+DATABASE_ROUTERS = ["mpbackend.db_router.ReplicaRouter"]
+# The connections to the primary are made through PgBouncer, if DATABASE_POOLER_HOST
+# is set, which pools them in the transaction mode. A server connection is used by a
+# client for a transaction only, thus the cursors can not outlive the transactions.
+DATABASE_POOLER_HOST = env("DATABASE_POOLER_HOST")
+if DATABASE_POOLER_HOST:
+    DATABASES["default"]["HOST"] = DATABASE_POOLER_HOST
+    DATABASES["default"]["PORT"] = env("DATABASE_POOLER_PORT")
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+for database in DATABASES.values():
+    # The connections are kept open between the requests for DATABASE_CONN_MAX_AGE
+    # seconds and checked before reuse, if DATABASE_CONN_HEALTH_CHECKS.
+    database["CONN_MAX_AGE"] = env("DATABASE_CONN_MAX_AGE")
+    database["CONN_HEALTH_CHECKS"] = env("DATABASE_CONN_HEALTH_CHECKS")
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -236,6 +305,7 @@ LOGGING = {
     "loggers": {
         "django": {"handlers": ["console", "file_logger"], "level": "WARNING"},
         "profiles": {"handlers": ["console", "file_logger"], "level": "WARNING"},
+        "mpbackend": {"handlers": ["console", "file_logger"], "level": "WARNING"},
         "django.security.DisallowedHost": {
             "handlers": ["console"],
             "level": "DEBUG",
@@ -254,6 +324,17 @@ SPECTACULAR_SETTINGS = {
 }
 # After how many hours users authentication token is expired and deleted
 TOKEN_EXPIRED_AFTER_HOURS = 24
+# Age of the anonymous users that have not completed the poll deleted by purge_stale_sessions
+STALE_ANONYMOUS_USER_AFTER_HOURS = 24 * 7
+# Seconds the clients and the proxy may use the responses of the read-only endpoints
+# before revalidating them, by the generation groups, see profiles.generations
+CACHE_MAX_AGES = {
+    "questionnaire": env("QUESTIONNAIRE_CACHE_MAX_AGE"),
+    "statistics": env("STATISTICS_CACHE_MAX_AGE"),
+}
+# URL of the refresh server of nginx, through which the responses cached by nginx are
+# refreshed after the questionnaire is imported, see profiles.proxy_cache
+PROXY_CACHE_REFRESH_URL = env("PROXY_CACHE_REFRESH_URL")
 
 if "pytest" not in sys.modules:
     CACHES = {
@@ -0,0 +1,8 @@
+"""The settings of the tests, see pytest.ini."""
+
+from mpbackend.settings import *  # noqa: F401,F403
+from mpbackend.settings import DATABASE_REPLICAS, DATABASES
+
+if not DATABASE_REPLICAS:
+    # The routing is tested with a replica that mirrors the test database
+    DATABASES["replica_1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
@@ -0,0 +1,115 @@
+"""
+Encryption of the token returned by start_poll with the TOKEN_SECRET.
+
+Version 1 is AES-CBC, the ciphertext and the IV are returned separately as
+base64. Version 2 is authenticated AES-GCM, returned as a single URL-safe
+string "v2.<base64url(nonce + ciphertext + tag)>". Both versions are decrypted.
+"""
+
+import base64
+import os
+from functools import lru_cache
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+from django.conf import settings
+from django.core.checks import Error, register, Tags, Warning
+from django.core.exceptions import ImproperlyConfigured
+
+ENVELOPE_V1 = 1
+ENVELOPE_V2 = 2
+ENVELOPE_V2_PREFIX = "v2."
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+
+
+@lru_cache(maxsize=8)
+def get_key(secret):
+    """Validates the secret and returns it as an AES key."""
+    if not secret:
+        raise ImproperlyConfigured("TOKEN_SECRET is not set.")
+    key = secret.encode("utf-8")
+    if len(key) not in AES.key_size:
+        raise ImproperlyConfigured("TOKEN_SECRET must be 16, 24 or 32 bytes long.")
+    return key
+
+
+def urlsafe_b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def urlsafe_b64decode(data):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def encrypt_cbc(text, secret=None):
+    """Returns the base64 encoded ciphertext and IV."""
+    key = get_key(secret or settings.TOKEN_SECRET)
+    iv = os.urandom(AES.block_size)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    enc = cipher.encrypt(pad(text.encode("utf-8"), AES.block_size))
+    return base64.b64encode(enc).decode("ascii"), base64.b64encode(iv).decode("ascii")
+
+
+def decrypt_cbc(enc, iv, secret=None):
+    key = get_key(secret or settings.TOKEN_SECRET)
+    cipher = AES.new(key, AES.MODE_CBC, base64.b64decode(iv))
+    return unpad(cipher.decrypt(base64.b64decode(enc)), AES.block_size).decode()
+
+
+def seal(text, secret=None):
+    """Returns the text encrypted and authenticated with AES-GCM, as version 2."""
+    key = get_key(secret or settings.TOKEN_SECRET)
+    nonce = os.urandom(GCM_NONCE_SIZE)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=GCM_TAG_SIZE)
+    enc, tag = cipher.encrypt_and_digest(text.encode("utf-8"))
+    return ENVELOPE_V2_PREFIX + urlsafe_b64encode(nonce + enc + tag)
+
+
+def unseal(envelope, secret=None):
+    """Raises ValueError if the envelope is malformed or has been tampered with."""
+    key = get_key(secret or settings.TOKEN_SECRET)
+    if not envelope.startswith(ENVELOPE_V2_PREFIX):
+        raise ValueError("Unknown envelope version.")
+    try:
+        data = urlsafe_b64decode(envelope[len(ENVELOPE_V2_PREFIX) :])
+    except (ValueError, TypeError):
+        raise ValueError("Malformed envelope.")
+    if len(data) < GCM_NONCE_SIZE + GCM_TAG_SIZE:
+        raise ValueError("Malformed envelope.")
+    nonce, enc, tag = (
+        data[:GCM_NONCE_SIZE],
+        data[GCM_NONCE_SIZE:-GCM_TAG_SIZE],
+        data[-GCM_TAG_SIZE:],
+    )
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=GCM_TAG_SIZE)
+    return cipher.decrypt_and_verify(enc, tag).decode()
+
+
+def encrypt(text, version=None):
+    """
+    Encrypts the text with the TOKEN_SECRET as TOKEN_ENVELOPE_VERSION. Returns a
+    (ciphertext, IV) tuple with version 1 and a string with version 2.
+    """
+    version = version or settings.TOKEN_ENVELOPE_VERSION
+    if version == ENVELOPE_V2:
+        return seal(text)
+    return encrypt_cbc(text)
+
+
+def decrypt(data, iv=None):
+    """Decrypts both versions, the IV is given with version 1."""
+    if iv is not None:
+        return decrypt_cbc(data, iv)
+    return unseal(data)
+
+
+@register(Tags.security)
+def check_token_secret(app_configs, **kwargs):
+    try:
+        get_key(settings.TOKEN_SECRET)
+    except ImproperlyConfigured as e:
+        if not settings.TOKEN_SECRET:
+            return [Warning(str(e), id="mpbackend.W001")]
+        return [Error(str(e), id="mpbackend.E001")]
+    return []
@@ -9,11 +9,13 @@ from drf_spectacular.views import (
 
 import account.api.urls
 import profiles.api.urls
+from mpbackend.query_metrics import metrics_view
 
 urlpatterns = [
     re_path("^admin/", admin.site.urls),
     re_path(r"^api/account/", include(account.api.urls), name="account"),
     re_path(r"^api/v1/", include(profiles.api.urls), name="profiles"),
+    path("internal/metrics/", metrics_view, name="metrics"),
     # path("api-auth/", include("rest_framework.urls")),
 ]
 
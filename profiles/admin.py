@@ -1,8 +1,13 @@
 import csv
 
 from django.contrib import admin
-from django.http import HttpResponse
+from django.db.models import Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 
+from mpbackend.db_router import is_pinned_to_primary, pin_primary_reads, replica_reads
+from profiles.admin_pagination import EstimatedCountPaginator
+from profiles.api.utils import blur_count
 from profiles.models import (
     Answer,
     AnswerOther,
@@ -18,6 +23,66 @@ from profiles.models import (
     SubQuestionCondition,
 )
 
+CSV_EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    An object that implements just the write method of the file-like
+    interface, used by the csv.writer to stream the rows.
+    https://docs.djangoproject.com/en/4.2/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
+
+
+def streaming_csv_response(filename, rows):
+    """
+    Returns a StreamingHttpResponse that writes the given iterable of rows as CSV,
+    row by row, without building the whole file into memory.
+    """
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows), content_type="text/csv"
+    )
+    response["Content-Disposition"] = "attachment; filename={}.csv".format(filename)
+    return response
+
+
+class EstimatedCountAdminMixin:
+    # For the admins of large tables. The changelist is paginated with the row count estimated
+    # by the database and the count of all rows, i.e. without the filters, is not queried.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ReplicaChangeListAdminMixin:
+    # The changelist is read from a read replica, see mpbackend.db_router. After a write
+    # the admin reads from the primary until the write has been replicated.
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET" or is_pinned_to_primary(request):
+            return super().changelist_view(request, extra_context=extra_context)
+        with replica_reads(primary_models=()):
+            response = super().changelist_view(request, extra_context=extra_context)
+            # The rows are queried when the template is rendered
+            if hasattr(response, "render"):
+                response.render()
+            return response
+
+    def log_addition(self, request, obj, message):
+        pin_primary_reads(request)
+        return super().log_addition(request, obj, message)
+
+    def log_change(self, request, obj, message):
+        pin_primary_reads(request)
+        return super().log_change(request, obj, message)
+
+    def log_deletion(self, request, obj, object_repr):
+        pin_primary_reads(request)
+        return super().log_deletion(request, obj, object_repr)
+
 
 class DisableAddAdminMixin:
     def has_add_permission(self, request, obj=None):
@@ -86,11 +151,16 @@ class OptionAdmin(
 
 @admin.register(Answer)
 class AnswerAdmin(
+    ReplicaChangeListAdminMixin,
+    EstimatedCountAdminMixin,
     DisableDeleteAdminMixin,
     DisableChangeAdminMixin,
     DisableAddAdminMixin,
     admin.ModelAdmin,
 ):
+    list_display = ("user", "question", "sub_question", "option", "created")
+    list_select_related = ("user", "question", "sub_question", "option")
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         qs = qs.filter(option__is_other=False)
@@ -102,6 +172,8 @@ class AnswerAdmin(
 
 @admin.register(AnswerOther)
 class AnswerOtherAdmin(
+    ReplicaChangeListAdminMixin,
+    EstimatedCountAdminMixin,
     DisableDeleteAdminMixin,
     DisableChangeAdminMixin,
     DisableAddAdminMixin,
@@ -118,6 +190,13 @@ class AnswerOtherAdmin(
         "other",
     )
 
+    list_select_related = (
+        "question",
+        "sub_question",
+        "sub_question__question",
+        "option",
+    )
+
     def question_number(self, obj):
         if obj.sub_question:
             return obj.sub_question.question.number
@@ -125,33 +204,39 @@ class AnswerOtherAdmin(
 
     def export_as_csv(self, request, queryset):
         meta = self.model._meta
-        queryset = queryset.order_by("question", "sub_question")
+        queryset = queryset.select_related(*self.list_select_related).order_by(
+            "question", "sub_question"
+        )
         field_names = ["id", "created", "question", "sub_question", "option", "other"]
         str_fields = ["question", "sub_question", "other"]
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename={}.csv".format(meta)
-        writer = csv.writer(response)
-        writer.writerow(field_names)
-        for obj in queryset:
-            row = []
-            for field in field_names:
-                attr = getattr(obj, field)
-                if field == "question" and attr is None:
-                    attr = obj.sub_question.question
-                if field in str_fields:
-                    attr = (
-                        str(attr).replace('"', "'").replace("\n", " ").replace("\r", "")
-                    )
-                row.append(attr)
-            writer.writerow(row)
-
-        return response
+
+        def rows():
+            yield field_names
+            for obj in queryset.iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE):
+                row = []
+                for field in field_names:
+                    attr = getattr(obj, field)
+                    if field == "question" and attr is None:
+                        attr = obj.sub_question.question
+                    if field in str_fields:
+                        attr = (
+                            str(attr)
+                            .replace('"', "'")
+                            .replace("\n", " ")
+                            .replace("\r", "")
+                        )
+                    row.append(attr)
+                yield row
+
+        return streaming_csv_response(meta, rows())
 
     export_as_csv.short_description = "Export selected as CSV"
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.filter(option__is_other=True)
+        return qs.filter(option__is_other=True).select_related(
+            *self.list_select_related
+        )
 
     def other(self, obj):
         return obj.option.other
@@ -192,62 +277,135 @@ class PostalCodeTypeAdmin(
 
 
 class PostalCodeResultAdmin(
+    ReplicaChangeListAdminMixin,
+    EstimatedCountAdminMixin,
     DisableDeleteAdminMixin,
     DisableChangeAdminMixin,
     DisableAddAdminMixin,
     admin.ModelAdmin,
 ):
     list_display = ("postal_code", "postal_code_type", "result", "count")
+    list_select_related = ("postal_code", "postal_code_type", "result")
 
     class Meta:
         model = PostalCodeResult
 
 
+class PostalCodeTypeListFilter(admin.SimpleListFilter):
+    """
+    Selects the postal code type of which the counts are summed. The selected
+    type is read from the request, thus it is not shared between admin users.
+    The filter itself does not filter the results, see CumulativeResultCountAdmin.get_queryset.
+    """
+
+    title = "postal code type"
+    parameter_name = "postal_code_type"
+
+    def lookups(self, request, model_admin):
+        return PostalCodeType.POSTAL_CODE_TYPE_CHOICES
+
+    def queryset(self, request, queryset):
+        return queryset
+
+    def choices(self, changelist):
+        selected = get_selected_postal_code_type_name(self.value())
+        for lookup, title in self.lookup_choices:
+            yield {
+                "selected": selected == lookup,
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: lookup}
+                ),
+                "display": title,
+            }
+
+
+def get_selected_postal_code_type_name(value):
+    if value in dict(PostalCodeType.POSTAL_CODE_TYPE_CHOICES):
+        return value
+    return PostalCodeType.HOME_POSTAL_CODE
+
+
 @admin.register(CumulativeResultCount)
 class CumulativeResultCountAdmin(
+    ReplicaChangeListAdminMixin,
     DisableDeleteAdminMixin,
     DisableChangeAdminMixin,
     DisableAddAdminMixin,
     admin.ModelAdmin,
 ):
     # Admin view that displays the sum of the counts for Home or Optional postal code results for every result (animal).
+    # The sums are annotated to the queryset, thus the changelist is rendered with a single grouped query.
 
-    def changelist_view(self, request, extra_context=None):
-        # Choose all rows, when selecting action.
-        try:
-            action = self.get_actions(request)[request.POST["action"]][0]
-            action_acts_on_all = action.acts_on_all
-        except (KeyError, AttributeError):
-            action_acts_on_all = False
-        if action_acts_on_all:
-            post = request.POST.copy()
-            post.setlist(
-                admin.helpers.ACTION_CHECKBOX_NAME,
-                self.model.objects.values_list("id", flat=True),
-            )
-            request.POST = post
-
-        return admin.ModelAdmin.changelist_view(self, request, extra_context)
-
-    list_display = ("value", "topic", "sum_of_count", "selected_postal_code_type")
-    actions = ["home_postal_code_type", "optional_postal_code_type"]
-    postal_code_type_name = PostalCodeType.HOME_POSTAL_CODE
-
-    def home_postal_code_type(self, request, queryset):
-        self.postal_code_type_name = PostalCodeType.HOME_POSTAL_CODE
+    list_display = (
+        "value",
+        "topic",
+        "sum_of_count",
+        "blurred_sum_of_count",
+        "share_of_total",
+        "selected_postal_code_type",
+        "home_sum_of_count",
+        "optional_sum_of_count",
+    )
+    list_filter = (PostalCodeTypeListFilter,)
 
-    home_postal_code_type.acts_on_all = True
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        type_name = get_selected_postal_code_type_name(
+            request.GET.get(PostalCodeTypeListFilter.parameter_name)
+        )
+        total_count = (
+            PostalCodeResult.objects.filter(postal_code_type__type_name=type_name)
+            .order_by()
+            .values("postal_code_type__type_name")
+            .annotate(total_count=Sum("count"))
+            .values("total_count")
+        )
+        return qs.annotate(
+            home_sum_of_count=self.get_sum_of_count_expression(
+                PostalCodeType.HOME_POSTAL_CODE
+            ),
+            optional_sum_of_count=self.get_sum_of_count_expression(
+                PostalCodeType.OPTIONAL_POSTAL_CODE
+            ),
+            sum_of_count=self.get_sum_of_count_expression(type_name),
+            total_count=Subquery(total_count),
+            selected_postal_code_type=Value(type_name),
+        )
+
+    @staticmethod
+    def get_sum_of_count_expression(type_name):
+        return Coalesce(
+            Sum(
+                "postal_code_results__count",
+                filter=Q(postal_code_results__postal_code_type__type_name=type_name),
+            ),
+            0,
+        )
+
+    @admin.display(ordering="home_sum_of_count")
+    def home_sum_of_count(self, obj):
+        return obj.home_sum_of_count
+
+    @admin.display(ordering="optional_sum_of_count")
+    def optional_sum_of_count(self, obj):
+        return obj.optional_sum_of_count
+
+    @admin.display(ordering="sum_of_count")
+    def sum_of_count(self, obj):
+        return obj.sum_of_count
 
-    def optional_postal_code_type(self, request, queryset):
-        self.postal_code_type_name = PostalCodeType.OPTIONAL_POSTAL_CODE
+    @admin.display(description="blurred sum of count")
+    def blurred_sum_of_count(self, obj):
+        return blur_count(obj.sum_of_count)
 
-    optional_postal_code_type.acts_on_all = True
+    @admin.display(description="share of total (%)", ordering="sum_of_count")
+    def share_of_total(self, obj):
+        if not obj.total_count:
+            return None
+        return round(obj.sum_of_count / obj.total_count * 100, 1)
 
     def selected_postal_code_type(self, obj):
-        return self.postal_code_type_name
-
-    def sum_of_count(self, obj):
-        return obj.get_sum_of_count(self.postal_code_type_name)
+        return obj.selected_postal_code_type
 
     class Meta:
         model = CumulativeResultCount
@@ -0,0 +1,38 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+# When the estimated number of rows is below the threshold, the rows are counted exactly.
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def get_estimated_count(queryset: QuerySet):
+    """
+    Returns the number of rows of the queryset estimated by the PostgreSQL
+    query planner, i.e. without scanning the table. Returns None if the
+    estimate is not available for the database.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large tables, the COUNT(*) of a large table is replaced by
+    the estimate of the query planner.
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            estimated_count = get_estimated_count(self.object_list)
+            if estimated_count and estimated_count >= ESTIMATED_COUNT_THRESHOLD:
+                return estimated_count
+        return Paginator.count.func(self)
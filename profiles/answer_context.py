@@ -0,0 +1,139 @@
+"""
+Request scoped memoization of the answers of the users.
+
+The answers of a user are loaded once per scope, with a single query, and shared
+by the condition checks, the validation of the answers and the calculation of the
+result. The answers are updated in place when an answer is saved. The scope is
+opened for every request by profiles.middleware.UserAnswerContextMiddleware,
+outside of a scope every call of get_user_answer_context loads the answers.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from profiles.models import Answer
+
+UserAnswer = namedtuple(
+    "UserAnswer",
+    [
+        "id",
+        "question_id",
+        "sub_question_id",
+        "option_id",
+        "option_question_id",
+        "option_sub_question_id",
+        "other",
+    ],
+)
+
+_user_answer_contexts = ContextVar("user_answer_contexts", default=None)
+
+
+class UserAnswerContext:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._answers = None
+
+    def get_queryset(self):
+        return (
+            Answer.objects.filter(user_id=self.user_id)
+            .order_by("id")
+            .values_list(
+                "id",
+                "question_id",
+                "sub_question_id",
+                "option_id",
+                "option__question_id",
+                "option__sub_question_id",
+                "other",
+            )
+        )
+
+    @property
+    def answers(self):
+        if self._answers is None:
+            self._answers = [UserAnswer(*values) for values in self.get_queryset()]
+        return self._answers
+
+    async def aload(self):
+        """
+        Loads the answers with the async ORM. The async views must load the answers
+        before using the context, as the answers are otherwise loaded synchronously.
+        """
+        if self._answers is None:
+            self._answers = [
+                UserAnswer(*values) async for values in self.get_queryset()
+            ]
+
+    @property
+    def option_ids(self):
+        return [answer.option_id for answer in self.answers if answer.option_id]
+
+    def get_option_ids(self, question_id=None, sub_question_id=None):
+        """Returns the ids of the answered options of the question or the sub question."""
+        if sub_question_id:
+            return {
+                answer.option_id
+                for answer in self.answers
+                if answer.option_sub_question_id == sub_question_id
+            }
+        return {
+            answer.option_id
+            for answer in self.answers
+            if answer.option_question_id == question_id
+        }
+
+    def find(self, question_id, sub_question_id, other=None):
+        """
+        Returns the answer to the question and the sub question, with the given
+        other text if given, or None.
+        """
+        for answer in self.answers:
+            if (
+                answer.question_id == question_id
+                and answer.sub_question_id == sub_question_id
+                and (other is None or answer.other == other)
+            ):
+                return answer
+        return None
+
+    def update(self, answer):
+        """Updates the context with the saved Answer instance."""
+        if self._answers is None:
+            return
+        option = answer.option
+        user_answer = UserAnswer(
+            answer.id,
+            answer.question_id,
+            answer.sub_question_id,
+            answer.option_id,
+            option.question_id if option else None,
+            option.sub_question_id if option else None,
+            answer.other,
+        )
+        for i, existing in enumerate(self._answers):
+            if existing.id == answer.id:
+                self._answers[i] = user_answer
+                break
+        else:
+            self._answers.append(user_answer)
+
+
+@contextmanager
+def user_answer_scope():
+    token = _user_answer_contexts.set({})
+    try:
+        yield
+    finally:
+        _user_answer_contexts.reset(token)
+
+
+def get_user_answer_context(user):
+    """Returns the answer context of the user in the current scope."""
+    contexts = _user_answer_contexts.get()
+    if contexts is None:
+        return UserAnswerContext(user.pk)
+    if user.pk not in contexts:
+        contexts[user.pk] = UserAnswerContext(user.pk)
+    return contexts[user.pk]
@@ -0,0 +1,175 @@
+"""
+Anonymised export of the answers in wide format, i.e. one row per user
+with a column for every question or sub question.
+"""
+
+import csv
+import uuid
+from itertools import groupby
+from operator import itemgetter
+
+from profiles.models import Answer, Option, Question, SubQuestion
+
+ANSWER_EXPORT_CHUNK_SIZE = 1000
+# Separates the values when multiple options are chosen for a question.
+MULTIPLE_OPTIONS_SEPARATOR = ";"
+PROFILE_FIELDS = [
+    "year_of_birth",
+    "gender",
+    "postal_code",
+    "optional_postal_code",
+    "is_interested_in_mobility",
+    "result_can_be_used",
+]
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+EXPORT_FORMATS = [CSV_FORMAT, PARQUET_FORMAT]
+
+
+class AnswerCatalog:
+    """
+    The questionnaire, i.e. the columns of the export and the column and value
+    of every option. Loaded once with three queries.
+    """
+
+    def __init__(self):
+        self.headers = []
+        question_columns = {}
+        sub_question_columns = {}
+        sub_questions = {}
+        for sub_question in SubQuestion.objects.order_by("question", "order_number"):
+            sub_questions.setdefault(sub_question.question_id, []).append(sub_question)
+        for question in Question.objects.order_by("id"):
+            if question.id in sub_questions:
+                for sub_question in sub_questions[question.id]:
+                    sub_question_columns[sub_question.id] = len(self.headers)
+                    self.headers.append(
+                        f"{question.number}.{sub_question.order_number}"
+                    )
+            else:
+                question_columns[question.id] = len(self.headers)
+                self.headers.append(question.number)
+
+        # Maps the id of the option to the column and the value of the option
+        self.options = {}
+        options_qs = Option.objects.values_list(
+            "id", "question_id", "sub_question_id", "value"
+        )
+        for option_id, question_id, sub_question_id, value in options_qs:
+            if sub_question_id:
+                column = sub_question_columns.get(sub_question_id)
+            else:
+                column = question_columns.get(question_id)
+            if column is not None:
+                self.options[option_id] = (column, value)
+
+    @property
+    def header(self):
+        return PROFILE_FIELDS + ["result"] + self.headers
+
+    def get_answer_values(self, option_ids):
+        values = [[] for _ in self.headers]
+        for option_id in option_ids:
+            if option_id in self.options:
+                column, value = self.options[option_id]
+                values[column].append(value)
+        return [
+            MULTIPLE_OPTIONS_SEPARATOR.join(str(v) for v in value) if value else None
+            for value in values
+        ]
+
+
+def iter_wide_rows(answer_qs, catalog, chunk_size=ANSWER_EXPORT_CHUNK_SIZE):
+    """
+    Yields one row per user. The answers are streamed ordered by the user
+    (server-side cursor on PostgreSQL) and pivoted on the fly, thus only
+    the answers of a single user are held in memory.
+    """
+    profile_lookups = [f"user__profile__{field}" for field in PROFILE_FIELDS]
+    queryset = answer_qs.order_by("user_id", "id").values_list(
+        "user_id", "option_id", "user__result__value", *profile_lookups
+    )
+    for _, user_answers in groupby(
+        queryset.iterator(chunk_size=chunk_size), key=itemgetter(0)
+    ):
+        user_answers = list(user_answers)
+        profile_and_result = list(user_answers[0][3:]) + [user_answers[0][2]]
+        option_ids = [answer[1] for answer in user_answers]
+        yield profile_and_result + catalog.get_answer_values(option_ids)
+
+
+def iter_chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_csv(path, header, rows, chunk_size=ANSWER_EXPORT_CHUNK_SIZE):
+    num_rows = 0
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        for chunk in iter_chunks(rows, chunk_size):
+            writer.writerows(chunk)
+            num_rows += len(chunk)
+    return num_rows
+
+
+def write_parquet(path, header, rows, chunk_size=ANSWER_EXPORT_CHUNK_SIZE):
+    # pyarrow is an optional dependency, only required when exporting as Parquet.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    num_rows = 0
+    schema = pa.schema([(name, pa.string()) for name in header])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(rows, chunk_size):
+            columns = [
+                [None if value is None else str(value) for value in column]
+                for column in zip(*chunk)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            num_rows += len(chunk)
+    return num_rows
+
+
+WRITERS = {CSV_FORMAT: write_csv, PARQUET_FORMAT: write_parquet}
+
+
+def get_user_id_ranges(num_parts):
+    """
+    Splits the UUID space of the users into num_parts equal ranges. As the ids
+    are random (uuid4) the users are evenly distributed between the ranges.
+    """
+    max_id = 2**128 - 1
+    step = (max_id + 1) // num_parts
+    ranges = []
+    for part in range(num_parts):
+        high = max_id if part == num_parts - 1 else (part + 1) * step - 1
+        ranges.append((uuid.UUID(int=part * step), uuid.UUID(int=high)))
+    return ranges
+
+
+def export_answers(
+    path,
+    export_format=CSV_FORMAT,
+    chunk_size=ANSWER_EXPORT_CHUNK_SIZE,
+    user_id_range=None,
+):
+    """
+    Writes the answers of the users, optionally only of the users in the given
+    user id range, to the file in path. Returns the number of rows written.
+    """
+    answer_qs = Answer.objects.all()
+    if user_id_range:
+        answer_qs = answer_qs.filter(
+            user_id__gte=user_id_range[0], user_id__lte=user_id_range[1]
+        )
+    catalog = AnswerCatalog()
+    rows = iter_wide_rows(answer_qs, catalog, chunk_size=chunk_size)
+    return WRITERS[export_format](path, catalog.header, rows, chunk_size=chunk_size)
@@ -0,0 +1,310 @@
+"""
+Async versions of the high-frequency poll endpoints, served instead of the DRF
+views when ASYNC_POLL_VIEWS is enabled, see mpbackend.async_urls. The views
+return the same responses as the DRF views, but do not block the worker while
+waiting on the database or the cache. DRF does not support async views, thus
+these are plain Django views that authenticate, throttle and render as DRF.
+"""
+
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAcceptable,
+    NotAuthenticated,
+    ParseError,
+    Throttled,
+)
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from mpbackend import token_envelope
+from mpbackend.authentication import aauthenticate, TokenHeader
+from profiles.answer_context import get_user_answer_context
+from profiles.api.renderers import MessagePackRenderer, ORJSONRenderer
+from profiles.api.serializers import (
+    FIELDS_QUERY_PARAM,
+    parse_fieldset,
+    QuestionsConditionsStatesSerializer,
+    ResultSerializer,
+)
+from profiles.api.views import (
+    get_questions_conditions_states,
+    get_sub_questions_conditions_states,
+    question_condition_met,
+    sub_question_condition_met,
+)
+from profiles.models import (
+    Answer,
+    Option,
+    Question,
+    QuestionCondition,
+    SubQuestion,
+    SubQuestionCondition,
+)
+from profiles.poll import start_poll as start_poll_session
+from profiles.utils import aget_user_result
+
+from .utils import aallow_request, StartPollRateThrottle
+
+# The renderers of the DRF views, the first is used if none is acceptable
+RENDERERS = [ORJSONRenderer(), MessagePackRenderer()]
+
+
+def render(data=None, status=status.HTTP_200_OK, headers=None):
+    """Returns the response, rendered by async_api_view in the negotiated format."""
+    return Response(data, status=status, headers=headers)
+
+
+def render_exception(exc):
+    """Returns the response of the exception as APIView.handle_exception."""
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        exc.auth_header = TokenHeader().authenticate_header(None)
+    return exception_handler(exc, {})
+
+
+def finalize_response(response, renderer, media_type):
+    """Renders the response as APIView.finalize_response."""
+    response.accepted_renderer = renderer
+    response.accepted_media_type = media_type
+    response.renderer_context = {}
+    patch_vary_headers(response, ["Accept"])
+    return response.render()
+
+
+def get_data(request):
+    """Returns the body of the request as request.data of DRF, from JSON or a form."""
+    if request.content_type != "application/json":
+        return request.POST
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        raise ParseError(f"JSON parse error - {exc}")
+
+
+async def check_throttles(request, user, view, throttle_classes):
+    """Raises Throttled if a throttle rejects the request, as APIView.check_throttles."""
+    drf_request = Request(request)
+    drf_request.user = user if user is not None else AnonymousUser()
+    durations = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not await aallow_request(throttle, drf_request, view):
+            durations.append(throttle.wait())
+    if durations:
+        raise Throttled(
+            max(
+                (duration for duration in durations if duration is not None),
+                default=None,
+            )
+        )
+
+
+def async_api_view(methods, authenticated=True, throttle_classes=None):
+    """
+    Authenticates the request with the async ORM and cache and calls the view with
+    the request and the user, None if not authenticated. The request is rejected
+    if authenticated and no user, if throttled by the throttle_classes, by default
+    the DEFAULT_THROTTLE_CLASSES, or if the method is not in methods.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapped_view(request, *args, **kwargs):
+            # As the DRF views, the format is negotiated before calling the view
+            try:
+                renderer, media_type = DefaultContentNegotiation().select_renderer(
+                    Request(request), RENDERERS
+                )
+            except NotAcceptable as exc:
+                return finalize_response(
+                    render_exception(exc), RENDERERS[0], RENDERERS[0].media_type
+                )
+            try:
+                user_auth = await aauthenticate(request)
+                user = user_auth[0] if user_auth else None
+                if authenticated and not user:
+                    raise NotAuthenticated()
+                await check_throttles(
+                    request,
+                    user,
+                    view,
+                    (
+                        throttle_classes
+                        if throttle_classes is not None
+                        else api_settings.DEFAULT_THROTTLE_CLASSES
+                    ),
+                )
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+                response = await view(request, user, *args, **kwargs)
+            except APIException as exc:
+                response = render_exception(exc)
+            return finalize_response(response, renderer, media_type)
+
+        # As the DRF views, the token authentication is not vulnerable to CSRF
+        wrapped_view.csrf_exempt = True
+        return wrapped_view
+
+    return decorator
+
+
+@async_api_view(["POST"], authenticated=False, throttle_classes=[StartPollRateThrottle])
+async def start_poll(request, user):
+    # The user is created with raw SQL, which the async ORM does not support
+    user_id, key = await sync_to_async(start_poll_session)()
+    data = token_envelope.encrypt(key)
+    return render({"data": data, "id": user_id})
+
+
+@async_api_view(["GET"])
+async def get_questions_conditions_states_view(request, user):
+    await get_user_answer_context(user).aload()
+    questions = [
+        question
+        async for question in Question.objects.filter(
+            question_conditions__isnull=False
+        ).prefetch_related("question_conditions__option_conditions")
+    ]
+    states = get_questions_conditions_states(questions, user)
+    serializer = QuestionsConditionsStatesSerializer(data=states, many=True)
+    if serializer.is_valid():
+        return render(serializer.validated_data)
+    return render(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@async_api_view(["GET"])
+async def get_sub_questions_conditions_states_view(request, user):
+    await get_user_answer_context(user).aload()
+    sub_questions = [
+        sub_question
+        async for sub_question in SubQuestion.objects.filter(
+            sub_question_conditions__isnull=False
+        ).prefetch_related("sub_question_conditions")
+    ]
+    states = get_sub_questions_conditions_states(sub_questions, user)
+    serializer = QuestionsConditionsStatesSerializer(data=states, many=True)
+    if serializer.is_valid():
+        return render(serializer.validated_data)
+    return render(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@async_api_view(["POST"])
+async def create_answer(request, user):
+    data = get_data(request)
+    option_id = data.get("option", None)
+    question_id = data.get("question", None)
+    sub_question_id = data.get("sub_question", None)
+    sub_question = None
+    if not option_id:
+        return render("'option' argument not given", status.HTTP_400_BAD_REQUEST)
+    if not question_id:
+        return render("'question' argument not given", status.HTTP_400_BAD_REQUEST)
+    try:
+        question = await Question.objects.aget(id=question_id)
+    except Question.DoesNotExist:
+        return render(f"Question {question_id} not found", status.HTTP_404_NOT_FOUND)
+    # Question.num_sub_questions counts synchronously
+    if await question.sub_questions.acount() > 0:
+        try:
+            sub_question = await SubQuestion.objects.aget(
+                id=sub_question_id, question=question
+            )
+        except SubQuestion.DoesNotExist:
+            return render(
+                f"SubQuestion {sub_question_id} not found or wrong related question.",
+                status.HTTP_404_NOT_FOUND,
+            )
+
+    if sub_question:
+        try:
+            option = await Option.objects.aget(id=option_id, sub_question=sub_question)
+        except Option.DoesNotExist:
+            return render(
+                f"Option {option_id} not found or wrong related or sub_question.",
+                status.HTTP_404_NOT_FOUND,
+            )
+    else:
+        try:
+            option = await Option.objects.aget(id=option_id, question=question)
+        except Option.DoesNotExist:
+            return render(
+                f"Option {option_id} not found or wrong related question.",
+                status.HTTP_404_NOT_FOUND,
+            )
+    answer_context = get_user_answer_context(user)
+    await answer_context.aload()
+    question_conditions = [
+        question_condition
+        async for question_condition in QuestionCondition.objects.filter(
+            question=question
+        ).prefetch_related("option_conditions")
+    ]
+    if not question_condition_met(question_conditions, user):
+        return render(
+            "Question condition not met, i.e. the user has answered so that this question cannot be answered",
+            status.HTTP_405_METHOD_NOT_ALLOWED,
+        )
+    sub_question_condition = await SubQuestionCondition.objects.filter(
+        sub_question=sub_question
+    ).afirst()
+    if sub_question_condition:
+        if not sub_question_condition_met(sub_question_condition, user):
+            return render(
+                "SubQuestion condition not met, "
+                "i.e. the user has answered so that this sub question cannot be answered",
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+    filter = {"user": user, "question": question, "sub_question": sub_question}
+    if option.is_other:
+        other = data.get("other", None)
+        if not other:
+            return render(
+                "'other' not found in body, required if is_other field is true for option.",
+                status.HTTP_400_BAD_REQUEST,
+            )
+        filter["other"] = other
+    existing_answer = answer_context.find(
+        question.id,
+        getattr(sub_question, "id", None),
+        other=filter.get("other"),
+    )
+
+    def save_answer():
+        if not existing_answer:
+            filter["option"] = option
+            Answer.objects.create(**filter)
+        else:
+            # Update existing answer, the other text is kept as saved
+            filter.setdefault("other", existing_answer.other)
+            answer = Answer(id=existing_answer.id, option=option, **filter)
+            answer.save(update_fields=["option"])
+
+    # The post_save signal, that updates the result of the user, is synchronous.
+    # Thus the answer is saved in a thread, also the user of a signed token is
+    # fetched there when assigned to the answer.
+    await sync_to_async(save_answer)()
+    return render(status=status.HTTP_201_CREATED)
+
+
+@async_api_view(["GET"])
+async def get_result(request, user):
+    result = await aget_user_result(user)
+    if result:
+        fieldset = None
+        if FIELDS_QUERY_PARAM in request.GET:
+            fieldset = parse_fieldset(request.GET[FIELDS_QUERY_PARAM])
+        return render(ResultSerializer(result, fieldset=fieldset).data)
+    return render(status=status.HTTP_400_BAD_REQUEST)
@@ -1,4 +1,52 @@
+import msgpack
+import orjson
 from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+# The options of orjson for the output of the JSONRenderer of DRF, the datetimes are
+# passed to its encoder for the same format
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    Renders the same JSON as the JSONRenderer of DRF with orjson, that is several times
+    faster than the json module. The types that orjson does not support, e.g. Decimal
+    and the lazy translations, are encoded by the encoder of DRF. When an indent is
+    requested, e.g. by the browsable API, the JSON is indented by two spaces.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        option = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=option)
+        # As DRF, the line and paragraph separators are escaped for JavaScript
+        return ret.replace(LINE_SEPARATOR, b"\\u2028").replace(
+            PARAGRAPH_SEPARATOR, b"\\u2029"
+        )
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renders the data of the serializers as MessagePack, a binary format that is more
+    compact and faster to decode than JSON, for the clients that accept it. The values
+    that MessagePack does not support, e.g. the datetimes, are encoded as in JSON.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=JSONEncoder().default)
 
 
 class CustomBrowsableAPIRenderer(renderers.BrowsableAPIRenderer):
@@ -1,3 +1,4 @@
+from django.utils.functional import cached_property
 from rest_framework import serializers
 
 from profiles.models import (
@@ -16,51 +17,135 @@ from profiles.models import (
 
 from .utils import blur_count
 
-
-class ResultSerializer(serializers.ModelSerializer):
+FIELDS_QUERY_PARAM = "fields"
+
+
+def parse_fieldset(value):
+    """
+    Parses the fields query parameter, e.g. "id,number,options.value_fi", to the
+    fieldset {"id": None, "number": None, "options": {"value_fi": None}}, where None
+    selects all the fields of the field.
+    """
+    fieldset = {}
+    for path in value.split(","):
+        *parents, name = [name.strip() for name in path.split(".")]
+        node = fieldset
+        for parent in parents:
+            if parent in node and node[parent] is None:
+                break
+            node = node.setdefault(parent, {})
+        else:
+            if name:
+                node[name] = None
+    return fieldset
+
+
+class SparseFieldsetMixin:
+    """
+    Serializes only the fields selected with the fields query parameter of the
+    request, see parse_fieldset, or with the fieldset argument, by default all the
+    fields. The fields that are not selected are not built nor serialized, and the
+    nested serializers are given the fieldsets of their fields.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if fieldset is None and request and FIELDS_QUERY_PARAM in request.query_params:
+            fieldset = parse_fieldset(request.query_params[FIELDS_QUERY_PARAM])
+        self.fieldset = fieldset
+
+    def is_selected(self, field_name):
+        return self.fieldset is None or field_name in self.fieldset
+
+    def get_nested_fieldset(self, field_name):
+        return None if self.fieldset is None else self.fieldset.get(field_name)
+
+    def get_field_names(self, declared_fields, info):
+        field_names = super().get_field_names(declared_fields, info)
+        return [name for name in field_names if self.is_selected(name)]
+
+
+class ResultSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Result
         fields = "__all__"
 
 
-class OptionSerializer(serializers.ModelSerializer):
+class OptionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Option
         fields = "__all__"
 
+    @cached_property
+    def results_serializer(self):
+        # The nested serializers are created once, not for every object
+        return ResultSerializer(many=True, fieldset=self.get_nested_fieldset("results"))
+
     def to_representation(self, obj):
         representation = super().to_representation(obj)
-        representation["results"] = ResultSerializer(obj.results, many=True).data
+        if self.is_selected("results"):
+            representation["results"] = self.results_serializer.to_representation(
+                obj.results
+            )
         return representation
 
 
-class SubQuestionSerializer(serializers.ModelSerializer):
+class SubQuestionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = SubQuestion
         fields = "__all__"
 
+    @cached_property
+    def options_serializer(self):
+        return OptionSerializer(many=True, fieldset=self.get_nested_fieldset("options"))
+
+    @cached_property
+    def condition_serializer(self):
+        return SubQuestionConditionSerializer(
+            fieldset=self.get_nested_fieldset("condition")
+        )
+
     def to_representation(self, obj):
         representation = super().to_representation(obj)
-        representation["options"] = OptionSerializer(obj.options, many=True).data
-        representation["condition"] = SubQuestionConditionSerializer(
-            obj.sub_question_conditions, many=False
-        ).data
+        if self.is_selected("options"):
+            representation["options"] = self.options_serializer.to_representation(
+                obj.options
+            )
+        if self.is_selected("condition"):
+            representation["condition"] = self.condition_serializer.to_representation(
+                obj.sub_question_conditions
+            )
         return representation
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = "__all__"
 
+    @cached_property
+    def options_serializer(self):
+        return OptionSerializer(many=True, fieldset=self.get_nested_fieldset("options"))
+
+    @cached_property
+    def sub_questions_serializer(self):
+        return SubQuestionSerializer(
+            many=True, fieldset=self.get_nested_fieldset("sub_questions")
+        )
+
     def to_representation(self, obj):
         representation = super().to_representation(obj)
         if hasattr(obj, "options") and obj.options.count() > 0:
-            representation["options"] = OptionSerializer(obj.options, many=True).data
+            if self.is_selected("options"):
+                representation["options"] = self.options_serializer.to_representation(
+                    obj.options
+                )
         elif hasattr(obj, "sub_questions") and obj.sub_questions.count() > 0:
-            representation["sub_questions"] = SubQuestionSerializer(
-                obj.sub_questions, many=True
-            ).data
+            if self.is_selected("sub_questions"):
+                representation["sub_questions"] = (
+                    self.sub_questions_serializer.to_representation(obj.sub_questions)
+                )
 
         return representation
 
@@ -88,31 +173,31 @@ class InConditionResponseSerializer(serializers.Serializer):
     in_condition = serializers.BooleanField()
 
 
-class QuestionNumberIDSerializer(serializers.ModelSerializer):
+class QuestionNumberIDSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = ["id", "number"]
 
 
-class QuestionConditionSerializer(serializers.ModelSerializer):
+class QuestionConditionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = QuestionCondition
         fields = "__all__"
 
 
-class SubQuestionConditionSerializer(serializers.ModelSerializer):
+class SubQuestionConditionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = SubQuestionCondition
         fields = "__all__"
 
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Answer
         fields = "__all__"
 
 
-class PostalCodeResultSerializer(serializers.ModelSerializer):
+class PostalCodeResultSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     postal_code_string = serializers.CharField(
         source="postal_code.postal_code", read_only=True
     )
@@ -133,29 +218,30 @@ class PostalCodeResultSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        results_topics = {
-            "fi": instance.result.value_fi,
-            "sv": instance.result.value_sv,
-            "en": instance.result.value_en,
-        }
-        representation["result_topics"] = results_topics
-        representation["count"] = blur_count(instance.count)
+        if self.is_selected("result_topics"):
+            representation["result_topics"] = {
+                "fi": instance.result.value_fi,
+                "sv": instance.result.value_sv,
+                "en": instance.result.value_en,
+            }
+        if self.is_selected("count"):
+            representation["count"] = blur_count(instance.count)
         return representation
 
 
-class PostalCodeSerializer(serializers.ModelSerializer):
+class PostalCodeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = PostalCode
         fields = "__all__"
 
 
-class PostalCodeTypeSerializer(serializers.ModelSerializer):
+class PostalCodeTypeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = PostalCodeType
         fields = "__all__"
 
 
-class CumulativeResultSerializer(serializers.ModelSerializer):
+class CumulativeResultSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = CumulativeResultCount
         fields = "__all__"
@@ -163,7 +249,11 @@ class CumulativeResultSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         type_name = self.context.get("type_name")
         representation = super().to_representation(instance)
-        representation["sum_of_count"] = blur_count(
-            instance.get_sum_of_count(postal_code_type_name=type_name)
-        )
+        if not self.is_selected("sum_of_count"):
+            return representation
+        if hasattr(instance, "sum_of_count"):
+            sum_of_count = instance.sum_of_count
+        else:
+            sum_of_count = instance.get_sum_of_count(postal_code_type_name=type_name)
+        representation["sum_of_count"] = blur_count(sum_of_count)
         return representation
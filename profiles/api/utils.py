@@ -1,7 +1,18 @@
 import django_filters
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_response_headers,
+)
+from django.utils.http import http_date
 from rest_framework.exceptions import ValidationError
-from rest_framework.throttling import AnonRateThrottle
+from rest_framework.response import Response
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle
 
+from mpbackend.db_router import replica_reads
+from profiles.generations import get_generations, is_replicated, QUESTIONNAIRE
 from profiles.models import PostalCodeResult
 
 
@@ -17,6 +28,93 @@ def blur_count(count, threshold=5):
         return count
 
 
+class ReplicaReadMixin:
+    """
+    Serves the replica_actions of the viewset from a read replica, see mpbackend.db_router.
+    The models of the users are read from the primary.
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    Answers the conditional GET requests of the conditional_actions with 304 Not
+    Modified before the queryset and the serializer are evaluated. The validators
+    are the generations of the generation_groups of the data of the viewset, read
+    from the cache, see profiles.generations. The responses may be cached by the
+    clients and the proxy for the CACHE_MAX_AGES of the groups.
+    """
+
+    conditional_actions = ("list", "retrieve")
+    generation_groups = (QUESTIONNAIRE,)
+
+    def is_conditional(self, request):
+        return request.method in ("GET", "HEAD") and (
+            self.action_map.get(request.method.lower()) in self.conditional_actions
+        )
+
+    def get_validators(self):
+        """
+        Returns the weak ETag and the Last-Modified timestamp of the response, or
+        None if the read replicas may not have the data of the generations yet.
+        """
+        if not hasattr(self, "_validators"):
+            generations = get_generations(self.generation_groups)
+            self._validators = None
+            if is_replicated(max(generations)):
+                etag = "-".join(
+                    f"{group}.{generation}"
+                    for group, generation in zip(self.generation_groups, generations)
+                )
+                self._validators = f'W/"{etag}"', max(generations) // 10**9
+        return self._validators
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not self.is_conditional(request) or not self.get_validators():
+            return
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            # Not modified, the handler of the action is replaced
+            setattr(
+                self,
+                request.method.lower(),
+                lambda *args, **kwargs: Response(status=response.status_code),
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if not self.is_conditional(request) or response.status_code not in (200, 304):
+            return response
+        validators = self.get_validators()
+        if not validators:
+            # Not cached until the replicas have the data of the generations
+            patch_cache_control(response, no_cache=True, max_age=0)
+            return response
+        etag, last_modified = validators
+        max_age = min(
+            settings.CACHE_MAX_AGES[group] for group in self.generation_groups
+        )
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        # The Expires of the responses cached by cache_page is updated
+        if response.has_header("Expires"):
+            del response["Expires"]
+        patch_response_headers(response, max_age)
+        patch_cache_control(response, public=True)
+        return response
+
+
 class StartPollRateThrottle(AnonRateThrottle):
     """
     The AnonRateThrottle will only ever throttle unauthenticated users.
@@ -26,6 +124,30 @@ class StartPollRateThrottle(AnonRateThrottle):
     rate = "50/day"
 
 
+async def aallow_request(throttle, request, view):
+    """
+    allow_request of the throttle with the async cache API, for the async views.
+    The request is a DRF request with the authenticated user. Other than the
+    SimpleRateThrottles are checked in a thread.
+    """
+    if not isinstance(throttle, SimpleRateThrottle):
+        return await sync_to_async(throttle.allow_request)(request, view)
+    if throttle.rate is None:
+        return True
+    throttle.key = throttle.get_cache_key(request, view)
+    if throttle.key is None:
+        return True
+    throttle.history = await throttle.cache.aget(throttle.key, [])
+    throttle.now = throttle.timer()
+    while throttle.history and throttle.history[-1] <= throttle.now - throttle.duration:
+        throttle.history.pop()
+    if len(throttle.history) >= throttle.num_requests:
+        return throttle.throttle_failure()
+    throttle.history.insert(0, throttle.now)
+    await throttle.cache.aset(throttle.key, throttle.history, throttle.duration)
+    return True
+
+
 class CustomValidationError(ValidationError):
     # The detail field is shown also when DEBUG=False
     # Ensures the error message is displayed to the user
@@ -63,9 +185,8 @@ class PostalCodeResultFilter(django_filters.FilterSet, PostalCodeResultParamVali
     def __init__(self, *args, **kwargs):
         super(PostalCodeResultFilter, self).__init__(*args, **kwargs)
         for query_key, query_value in self.request.query_params.items():
-            validator = getattr(self, "validate_%s" % query_key, None)
-            if validator:
-                validator(query_value)
+            if query_key in self.validate_fields:
+                getattr(self, "validate_%s" % query_key)(query_value)
 
     def filter_postal_code_string(self, queryset, name, value):
         return queryset.filter(postal_code__postal_code=value)
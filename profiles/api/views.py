@@ -1,9 +1,7 @@
 import logging
-import uuid
 
 from django.conf import settings
-from django.contrib.auth.hashers import make_password
-from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
 from django.utils.decorators import method_decorator
 from django.utils.module_loading import import_string
 from django.views.decorators.cache import cache_page
@@ -15,7 +13,6 @@ from drf_spectacular.utils import (
     OpenApiResponse,
 )
 from rest_framework import status, viewsets
-from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
 from rest_framework.exceptions import ParseError
 from rest_framework.mixins import CreateModelMixin, ListModelMixin
@@ -24,7 +21,8 @@ from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
 from account.api.serializers import PublicUserSerializer
-from account.models import Profile, User
+from mpbackend import token_envelope
+from profiles.answer_context import get_user_answer_context
 from profiles.api.serializers import (
     AnswerRequestSerializer,
     AnswerSerializer,
@@ -44,6 +42,8 @@ from profiles.api.serializers import (
     SubQuestionRequestSerializer,
     SubQuestionSerializer,
 )
+from profiles.api_pagination import CursorOptInPagination
+from profiles.generations import GenerationKeyPrefix, QUESTIONNAIRE, STATISTICS
 from profiles.models import (
     Answer,
     CumulativeResultCount,
@@ -57,9 +57,15 @@ from profiles.models import (
     SubQuestion,
     SubQuestionCondition,
 )
-from profiles.utils import encrypt_text, generate_password, get_user_result
-
-from .utils import PostalCodeResultFilter, StartPollRateThrottle
+from profiles.poll import complete_poll, start_poll
+from profiles.utils import get_user_result
+
+from .utils import (
+    ConditionalGetMixin,
+    PostalCodeResultFilter,
+    ReplicaReadMixin,
+    StartPollRateThrottle,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -87,88 +93,86 @@ def get_or_create_row(model, filter):
 
 
 def sub_question_condition_met(sub_question_condition, user):
-    return Answer.objects.filter(
-        user=user, option=sub_question_condition.option
-    ).exists()
-
-
-def question_condition_met(question_condition_qs, user):
-    conditions_met = True
-    for question_condition in question_condition_qs:
-        if question_condition.sub_question_condition:
-            user_answers = Answer.objects.filter(
-                user=user,
-                option__sub_question=question_condition.sub_question_condition,
-            ).values_list("option", flat="True")
+    return sub_question_condition.option_id in get_user_answer_context(user).option_ids
+
+
+def question_condition_met(question_conditions, user):
+    """
+    The question_conditions must have the option_conditions prefetched, i.e., a
+    queryset or the prefetched question_conditions of a question.
+    """
+    answer_context = get_user_answer_context(user)
+    for question_condition in question_conditions:
+        if question_condition.sub_question_condition_id:
+            user_answers = answer_context.get_option_ids(
+                sub_question_id=question_condition.sub_question_condition_id
+            )
         else:
-            user_answers = Answer.objects.filter(
-                user=user, option__question=question_condition.question_condition
-            ).values_list("option", flat="True")
+            user_answers = answer_context.get_option_ids(
+                question_id=question_condition.question_condition_id
+            )
 
-        option_conditions = question_condition.option_conditions.all().values_list(
-            "id", flat=True
-        )
+        option_conditions = {
+            option.id for option in question_condition.option_conditions.all()
+        }
 
-        if not set(user_answers).intersection(set(option_conditions)):
+        if not user_answers.intersection(option_conditions):
             return False
-    return conditions_met
+    return True
+
+
+def get_questions_conditions_states(questions, user):
+    """
+    Returns the states of the conditions of the questions, the questions must have
+    the question_conditions and their option_conditions prefetched.
+    """
+    return [
+        {
+            "id": question.id,
+            "state": question_condition_met(question.question_conditions.all(), user),
+        }
+        for question in questions
+    ]
+
+
+def get_sub_questions_conditions_states(sub_questions, user):
+    """
+    Returns the states of the conditions of the sub questions, the sub questions
+    must have the sub_question_conditions prefetched.
+    """
+    return [
+        {
+            "id": sub_question.id,
+            "state": sub_question_condition_met(
+                sub_question.sub_question_conditions.all()[0], user
+            ),
+        }
+        for sub_question in sub_questions
+    ]
 
 
-@transaction.atomic
-def update_postal_code_result(user):
-    # Ensure that duplicate results are not saved, profiles filled for fun and profiles whos result
-    # can not be used are ignored.
-    if user.postal_code_result_saved or not user.profile.result_can_be_used:
-        return
-    if user.result:
-        result = user.result
-    else:
-        result = get_user_result(user)
-    if not result:
-        return
-    postal_code = None
-    postal_code_type = None
-    postal_code, _ = PostalCode.objects.get_or_create(
-        postal_code=user.profile.postal_code
-    )
-    postal_code_type, _ = PostalCodeType.objects.get_or_create(
-        type_name=PostalCodeType.HOME_POSTAL_CODE
-    )
-    try:
-        postal_code_result, _ = PostalCodeResult.objects.get_or_create(
-            postal_code=postal_code, postal_code_type=postal_code_type, result=result
-        )
-    except IntegrityError as e:
-        logger.error(f"IntegrityError while creating PostalCodeResult: {e}")
-        return
-    postal_code_result.count += 1
-    postal_code_result.save()
-
-    postal_code, _ = PostalCode.objects.get_or_create(
-        postal_code=user.profile.optional_postal_code
+class QuestionViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
+    queryset = Question.objects.prefetch_related(
+        "options__results", "sub_questions__options__results"
     )
-    postal_code_type, _ = PostalCodeType.objects.get_or_create(
-        type_name=PostalCodeType.OPTIONAL_POSTAL_CODE
-    )
-    try:
-        postal_code_result, _ = PostalCodeResult.objects.get_or_create(
-            postal_code=postal_code, postal_code_type=postal_code_type, result=result
-        )
-    except IntegrityError as e:
-        logger.error(f"IntegrityError while creating PostalCodeResult: {e}")
-        return
-    postal_code_result.count += 1
-    postal_code_result.save()
-    user.postal_code_result_saved = True
-    user.save()
-
-
-class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Question.objects.all()
     serializer_class = QuestionSerializer
     renderer_classes = DEFAULT_RENDERERS
+    # The actions of the poll, e.g. the conditions, read the answers of the user
+    replica_actions = (
+        "list",
+        "retrieve",
+        "get_question_numbers",
+        "get_questions_with_conditions",
+        "get_question",
+    )
 
-    @method_decorator(cache_page(60 * MINUTES_TO_CACHE_VIEW))
+    @method_decorator(
+        cache_page(
+            60 * MINUTES_TO_CACHE_VIEW, key_prefix=GenerationKeyPrefix(QUESTIONNAIRE)
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -187,16 +191,9 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         throttle_classes=[StartPollRateThrottle],
     )
     def start_poll(self, request):
-        uuid4 = uuid.uuid4()
-        username = f"anonymous_{str(uuid4)}"
-        user = User.objects.create(pk=uuid4, username=username, is_generated=True)
-        password = make_password(generate_password())
-        user.password = password
-        user.profile = Profile.objects.create(user=user)
-        user.save()
-        token, _ = Token.objects.get_or_create(user=user)
-        data = encrypt_text(token.key, settings.TOKEN_SECRET)
-        response_data = {"data": data, "id": user.id}
+        user_id, key = start_poll()
+        data = token_envelope.encrypt(key)
+        response_data = {"data": data, "id": user_id}
         return Response(response_data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -212,7 +209,9 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
     def get_question_numbers(self, request):
         queryset = Question.objects.all().order_by("id")
         page = self.paginate_queryset(queryset)
-        serializer = QuestionNumberIDSerializer(page, many=True)
+        serializer = QuestionNumberIDSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
         return self.get_paginated_response(serializer.data)
 
     @extend_schema(
@@ -226,9 +225,9 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         methods=["GET"],
     )
     def get_questions_with_conditions(self, request):
-        queryset = Question.objects.filter(question_conditions__isnull=False)
+        queryset = self.queryset.filter(question_conditions__isnull=False)
         page = self.paginate_queryset(queryset)
-        serializer = QuestionSerializer(page, many=True)
+        serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
     @extend_schema(
@@ -246,14 +245,8 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
     def get_questions_conditions_states(self, request):
         questions_with_cond_qs = Question.objects.filter(
             question_conditions__isnull=False
-        )
-        user = request.user
-        states = []
-        for question in questions_with_cond_qs:
-            question_condition_qs = QuestionCondition.objects.filter(question=question)
-            state = {"id": question.id}
-            state["state"] = question_condition_met(question_condition_qs, user)
-            states.append(state)
+        ).prefetch_related("question_conditions__option_conditions")
+        states = get_questions_conditions_states(questions_with_cond_qs, request.user)
         serializer = QuestionsConditionsStatesSerializer(data=states, many=True)
         if serializer.is_valid():
             validated_data = serializer.validated_data
@@ -276,16 +269,10 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
     def get_sub_questions_conditions_states(self, request):
         sub_questions_with_cond_qs = SubQuestion.objects.filter(
             sub_question_conditions__isnull=False
+        ).prefetch_related("sub_question_conditions")
+        states = get_sub_questions_conditions_states(
+            sub_questions_with_cond_qs, request.user
         )
-        user = request.user
-        states = []
-        for sub_question in sub_questions_with_cond_qs:
-            state = {"id": sub_question.id}
-            sub_question_condition = SubQuestionCondition.objects.filter(
-                sub_question=sub_question
-            ).first()
-            state["state"] = sub_question_condition_met(sub_question_condition, user)
-            states.append(state)
         serializer = QuestionsConditionsStatesSerializer(data=states, many=True)
         if serializer.is_valid():
             validated_data = serializer.validated_data
@@ -301,13 +288,13 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         number = request.query_params.get("number", None)
         if number:
             try:
-                question = Question.objects.get(number=number)
+                question = self.queryset.get(number=number)
             except Question.DoesNotExist:
                 return Response(
                     f"question with number {number} not found",
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            serializer = QuestionSerializer(question)
+            serializer = self.get_serializer(question)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         else:
@@ -325,9 +312,7 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
     )
     @action(detail=False, methods=["POST"], permission_classes=[IsAuthenticated])
     def end_poll(self, request):
-        user = request.user
-        update_postal_code_result(user)
-        user.auth_token.delete()
+        complete_poll(request.user, token=request.auth)
         return Response("Poll ended.", status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -361,8 +346,11 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_404_NOT_FOUND,
                 )
         # Retrive the conditions for the question, note can have multiple conditions
-        question_condition_qs = QuestionCondition.objects.filter(question=question)
-        if not question_condition_qs.exists():
+        question_condition_qs = QuestionCondition.objects.filter(
+            question=question
+        ).prefetch_related("option_conditions")
+        # Evaluates the conditions once for the check and question_condition_met
+        if not question_condition_qs:
             return Response(
                 f"QuestionCondition not found for question number {question_id}",
                 status=status.HTTP_404_NOT_FOUND,
@@ -460,11 +448,18 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
 register_view(QuestionViewSet, "question")
 
 
-class QuestionConditionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = QuestionCondition.objects.all()
+class QuestionConditionViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
+    queryset = QuestionCondition.objects.prefetch_related("option_conditions")
     serializer_class = QuestionConditionSerializer
+    pagination_class = CursorOptInPagination
 
-    @method_decorator(cache_page(60 * MINUTES_TO_CACHE_VIEW))
+    @method_decorator(
+        cache_page(
+            60 * MINUTES_TO_CACHE_VIEW, key_prefix=GenerationKeyPrefix(QUESTIONNAIRE)
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -472,11 +467,18 @@ class QuestionConditionViewSet(viewsets.ReadOnlyModelViewSet):
 register_view(QuestionConditionViewSet, "questioncondition")
 
 
-class SubQuestionConditionViewSet(viewsets.ReadOnlyModelViewSet):
+class SubQuestionConditionViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = SubQuestionCondition.objects.all()
     serializer_class = SubQuestionConditionSerializer
+    pagination_class = CursorOptInPagination
 
-    @method_decorator(cache_page(60 * MINUTES_TO_CACHE_VIEW))
+    @method_decorator(
+        cache_page(
+            60 * MINUTES_TO_CACHE_VIEW, key_prefix=GenerationKeyPrefix(QUESTIONNAIRE)
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -484,11 +486,17 @@ class SubQuestionConditionViewSet(viewsets.ReadOnlyModelViewSet):
 register_view(SubQuestionConditionViewSet, "subquestioncondition")
 
 
-class OptionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Option.objects.all()
+class OptionViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
+    queryset = Option.objects.prefetch_related("results")
     serializer_class = OptionSerializer
 
-    @method_decorator(cache_page(60 * MINUTES_TO_CACHE_VIEW))
+    @method_decorator(
+        cache_page(
+            60 * MINUTES_TO_CACHE_VIEW, key_prefix=GenerationKeyPrefix(QUESTIONNAIRE)
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -496,11 +504,17 @@ class OptionViewSet(viewsets.ReadOnlyModelViewSet):
 register_view(OptionViewSet, "option")
 
 
-class SubQuestionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = SubQuestion.objects.all()
+class SubQuestionViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
+    queryset = SubQuestion.objects.prefetch_related("options__results")
     serializer_class = SubQuestionSerializer
 
-    @method_decorator(cache_page(60 * MINUTES_TO_CACHE_VIEW))
+    @method_decorator(
+        cache_page(
+            60 * MINUTES_TO_CACHE_VIEW, key_prefix=GenerationKeyPrefix(QUESTIONNAIRE)
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -508,11 +522,17 @@ class SubQuestionViewSet(viewsets.ReadOnlyModelViewSet):
 register_view(SubQuestionViewSet, "subquestion")
 
 
-class ResultViewSet(viewsets.ReadOnlyModelViewSet):
+class ResultViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Result.objects.all()
     serializer_class = ResultSerializer
 
-    @method_decorator(cache_page(60 * MINUTES_TO_CACHE_VIEW))
+    @method_decorator(
+        cache_page(
+            60 * MINUTES_TO_CACHE_VIEW, key_prefix=GenerationKeyPrefix(QUESTIONNAIRE)
+        )
+    )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
@@ -601,13 +621,14 @@ class AnswerViewSet(CreateModelMixin, GenericViewSet):
                     f"Option {option_id} not found or wrong related question.",
                     status=status.HTTP_404_NOT_FOUND,
                 )
-        question_condition_qs = QuestionCondition.objects.filter(question=question)
-        if question_condition_qs.exists():
-            if not question_condition_met(question_condition_qs, user):
-                return Response(
-                    "Question condition not met, i.e. the user has answered so that this question cannot be answered",
-                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
-                )
+        question_condition_qs = QuestionCondition.objects.filter(
+            question=question
+        ).prefetch_related("option_conditions")
+        if not question_condition_met(question_condition_qs, user):
+            return Response(
+                "Question condition not met, i.e. the user has answered so that this question cannot be answered",
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
         sub_question_condition = SubQuestionCondition.objects.filter(
             sub_question=sub_question
         ).first()
@@ -628,15 +649,19 @@ class AnswerViewSet(CreateModelMixin, GenericViewSet):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
                 filter["other"] = other
-            queryset = Answer.objects.filter(**filter)
-            if not queryset.exists():
+            existing_answer = get_user_answer_context(user).find(
+                question.id,
+                getattr(sub_question, "id", None),
+                other=filter.get("other"),
+            )
+            if not existing_answer:
                 filter["option"] = option
                 Answer.objects.create(**filter)
             else:
-                # Update existing answer
-                answer = queryset.first()
-                answer.option = option
-                answer.save()
+                # Update existing answer, the other text is kept as saved
+                filter.setdefault("other", existing_answer.other)
+                answer = Answer(id=existing_answer.id, option=option, **filter)
+                answer.save(update_fields=["option"])
             return Response(status=status.HTTP_201_CREATED)
         else:
             return Response("Not created", status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -665,7 +690,7 @@ class AnswerViewSet(CreateModelMixin, GenericViewSet):
             )
         result = get_user_result(user)
         if result:
-            serializer = ResultSerializer(result)
+            serializer = ResultSerializer(result, context=self.get_serializer_context())
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -716,9 +741,15 @@ POSTAL_CODE_TYPE_STRING_PARAM = OpenApiParameter(
         description="Returns aggregated results per postal code and/or postal code type.",
     )
 )
-class PostalCodeResultViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = PostalCodeResult.objects.all()
+class PostalCodeResultViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
+    queryset = PostalCodeResult.objects.select_related(
+        "postal_code", "postal_code_type", "result"
+    )
     serializer_class = PostalCodeResultSerializer
+    pagination_class = CursorOptInPagination
+    generation_groups = (QUESTIONNAIRE, STATISTICS)
     filter_backends = [DjangoFilterBackend]
     filterset_class = PostalCodeResultFilter
     filterset_fields = PostalCodeResultFilter.validate_fields
@@ -726,16 +757,20 @@ class PostalCodeResultViewSet(viewsets.ReadOnlyModelViewSet):
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.queryset)
         page = self.paginate_queryset(queryset)
-        serializer = self.serializer_class(page, many=True)
+        serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
 
 register_view(PostalCodeResultViewSet, "postalcoderesult")
 
 
-class PostalCodeViewSet(viewsets.ReadOnlyModelViewSet):
+class PostalCodeViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = PostalCode.objects.all()
     serializer_class = PostalCodeSerializer
+    pagination_class = CursorOptInPagination
+    generation_groups = (STATISTICS,)
 
 
 register_view(PostalCodeViewSet, "postalcode")
@@ -749,9 +784,12 @@ register_view(PostalCodeViewSet, "postalcode")
         description="Returns cumulative result count for every result.",
     )
 )
-class CumulativeResultsViewSet(ListModelMixin, GenericViewSet):
+class CumulativeResultsViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, ListModelMixin, GenericViewSet
+):
     queryset = CumulativeResultCount.objects.all()
     serializer_class = CumulativeResultSerializer
+    generation_groups = (QUESTIONNAIRE, STATISTICS)
 
     def list(self, request, *args, **kwargs):
         queryset = self.queryset
@@ -769,9 +807,17 @@ class CumulativeResultsViewSet(ListModelMixin, GenericViewSet):
             queryset = CumulativeResultCount.objects.none()
         else:
             type_name = postal_code_type.type_name
+            queryset = queryset.annotate(
+                sum_of_count=Sum(
+                    "postal_code_results__count",
+                    filter=Q(postal_code_results__postal_code_type=postal_code_type),
+                )
+            )
         page = self.paginate_queryset(queryset)
-        serializer = self.serializer_class(
-            page, many=True, context={"type_name": type_name}
+        serializer = self.get_serializer(
+            page,
+            many=True,
+            context={**self.get_serializer_context(), "type_name": type_name},
         )
         return self.get_paginated_response(serializer.data)
 
@@ -779,9 +825,12 @@ class CumulativeResultsViewSet(ListModelMixin, GenericViewSet):
 register_view(CumulativeResultsViewSet, "cumulativeresult")
 
 
-class PostalCodeTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class PostalCodeTypeViewSet(
+    ConditionalGetMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = PostalCodeType.objects.all()
     serializer_class = PostalCodeTypeSerializer
+    generation_groups = (STATISTICS,)
 
 
 register_view(PostalCodeTypeViewSet, "postalcodetype")
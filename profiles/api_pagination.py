@@ -1,6 +1,111 @@
+from collections import OrderedDict
+
+from rest_framework import pagination
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from profiles.admin_pagination import get_estimated_count
 
 
 class Pagination(PageNumberPagination):
     page_size_query_param = "page_size"
     max_page_size = 1000
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination by the primary key, i.e. a page is queried with WHERE id > ...
+    ORDER BY id LIMIT ..., thus in the same time regardless of the depth of the page,
+    and the rows are not counted. With estimated_count=true the response has the
+    number of rows estimated by the query planner, null if not available.
+    """
+
+    ordering = "id"
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    estimated_count_query_param = "estimated_count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.estimated_count = None
+        self.include_estimated_count = request.query_params.get(
+            self.estimated_count_query_param
+        ) in ("true", "1")
+        if self.include_estimated_count:
+            self.estimated_count = get_estimated_count(queryset.order_by())
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        fields = [
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]
+        if self.include_estimated_count:
+            fields.insert(0, ("estimated_count", self.estimated_count))
+        return Response(OrderedDict(fields))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "estimated_count": {"type": "integer", "nullable": True},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.estimated_count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the number of results estimated by the database.",
+                "schema": {"type": "boolean"},
+            }
+        ]
+
+
+class CursorOptInPagination(Pagination):
+    """
+    The page number pagination, or the CursorPagination for the clients that request
+    with pagination=cursor, for the large tables where the count and the deep pages
+    are slow.
+    """
+
+    pagination_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if (
+            request.query_params.get(self.pagination_query_param) == "cursor"
+            or CursorPagination.cursor_query_param in request.query_params
+        ):
+            self.cursor_pagination = CursorPagination()
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        names = {parameter["name"] for parameter in parameters}
+        return [
+            *parameters,
+            {
+                "name": self.pagination_query_param,
+                "required": False,
+                "in": "query",
+                "description": "'cursor' for the cursor pagination, without counting "
+                "the results.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            *(
+                parameter
+                for parameter in CursorPagination().get_schema_operation_parameters(
+                    view
+                )
+                if parameter["name"] not in names
+            ),
+        ]
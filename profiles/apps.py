@@ -7,4 +7,6 @@ class ProfilesConfig(AppConfig):
 
     def ready(self):
         # register signals
+        # register the check of the TOKEN_SECRET
+        from mpbackend import token_envelope  # noqa: F401
         from profiles import signals  # noqa: F401
@@ -0,0 +1,67 @@
+"""
+Generations of the data served by the read-only endpoints. The generation of a
+group is bumped when its data changes and is kept in the shared cache, thus the
+validators of the responses, see ConditionalGetMixin, are computed without
+querying the database. A generation is the time it was bumped in nanoseconds,
+which also gives the Last-Modified of the responses.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# The questions, the options, the results and the conditions
+QUESTIONNAIRE = "questionnaire"
+# The postal codes and the counts of the postal code results
+STATISTICS = "statistics"
+GENERATION_CACHE_KEY_PREFIX = "generation"
+
+
+def get_cache_key(group):
+    return f"{GENERATION_CACHE_KEY_PREFIX}:{group}"
+
+
+def get_generations(groups):
+    """Returns the generations of the groups with a single cache lookup."""
+    keys = [get_cache_key(group) for group in groups]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Evicted or never bumped, the new generation is later than the
+            # generations of the responses given before
+            generation = time.time_ns()
+            if not cache.add(key, generation, None):
+                generation = cache.get(key, generation)
+            generations[key] = generation
+    return [generations[key] for key in keys]
+
+
+def bump_generation(group):
+    """Bumps the generation of the group when the current transaction is committed."""
+    transaction.on_commit(lambda: cache.set(get_cache_key(group), time.time_ns(), None))
+
+
+def is_replicated(generation):
+    """
+    Whether the read replicas, that lag at most DATABASE_REPLICA_MAX_LAG seconds
+    behind the primary, have the data of the generation.
+    """
+    return (
+        not settings.DATABASE_REPLICAS
+        or time.time_ns() - generation > settings.DATABASE_REPLICA_MAX_LAG * 10**9
+    )
+
+
+class GenerationKeyPrefix:
+    """
+    The key_prefix of cache_page for the views of the group, that is the current
+    generation, thus the cached responses of the earlier generations are not used.
+    """
+
+    def __init__(self, group):
+        self.group = group
+
+    def __str__(self):
+        return f"{self.group}.{get_generations([self.group])[0]}"
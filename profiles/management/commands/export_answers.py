@@ -0,0 +1,97 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django import db
+from django.core.management import BaseCommand, CommandError
+
+from profiles.answer_export import (
+    ANSWER_EXPORT_CHUNK_SIZE,
+    CSV_FORMAT,
+    export_answers,
+    EXPORT_FORMATS,
+    get_user_id_ranges,
+    PARQUET_FORMAT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_part_path(path: Path, part: int) -> Path:
+    return path.with_name(f"{path.stem}.part{part}{path.suffix}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the anonymised answers in wide format, one row per user with the "
+        "profile information, the result and a column for every question and sub question."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="answers.csv",
+            help="Path of the file to write. When using multiple workers, "
+            "every worker writes its own part file, e.g. answers.part0.csv.",
+        )
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default=CSV_FORMAT)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=ANSWER_EXPORT_CHUNK_SIZE,
+            help="Number of rows read from the database and written to the file at a time.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes, the user id range is split between the processes.",
+        )
+
+    def handle(self, *args, **options):
+        export_format = options["format"]
+        chunk_size = options["chunk_size"]
+        num_workers = options["workers"]
+        path = Path(options["output"])
+        if num_workers < 1:
+            raise CommandError("'workers' must be at least 1")
+        if export_format == PARQUET_FORMAT:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError("pyarrow is required to export as Parquet.")
+
+        if num_workers == 1:
+            num_rows = export_answers(path, export_format, chunk_size)
+            logger.info(f"Exported {num_rows} rows to {path}")
+            self.stdout.write(f"Exported {num_rows} rows to {path}")
+            return
+
+        # The forked processes must not share the database connection of the parent.
+        db.connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=num_workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            futures = {
+                get_part_path(path, part): executor.submit(
+                    export_answers,
+                    get_part_path(path, part),
+                    export_format,
+                    chunk_size,
+                    user_id_range,
+                )
+                for part, user_id_range in enumerate(get_user_id_ranges(num_workers))
+            }
+            failed_paths = []
+            for part_path, future in futures.items():
+                try:
+                    num_rows = future.result()
+                except Exception:
+                    logger.exception(f"Exporting {part_path} failed")
+                    failed_paths.append(str(part_path))
+                    continue
+                logger.info(f"Exported {num_rows} rows to {part_path}")
+                self.stdout.write(f"Exported {num_rows} rows to {part_path}")
+        if failed_paths:
+            raise CommandError(f"Exporting {', '.join(failed_paths)} failed")
@@ -6,6 +6,7 @@ from django import db
 from django.conf import settings
 from django.core.management import BaseCommand
 
+from profiles.generations import bump_generation, QUESTIONNAIRE
 from profiles.models import (
     Option,
     Question,
@@ -14,6 +15,7 @@ from profiles.models import (
     SubQuestion,
     SubQuestionCondition,
 )
+from profiles.proxy_cache import refresh_proxy_cache
 
 logger = logging.getLogger(__name__)
 FILENAME = "questions.xlsx"
@@ -327,3 +329,7 @@ class Command(BaseCommand):
         results = get_and_create_results(excel_data)
         save_questions(excel_data, results)
         update_results_num_options()
+        # The questionnaire is also updated with querysets, that send no signals
+        bump_generation(QUESTIONNAIRE)
+        num_refreshed = refresh_proxy_cache(QUESTIONNAIRE)
+        logger.info(f"Refreshed {num_refreshed} responses in the proxy cache")
@@ -0,0 +1,25 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from profiles.answer_context import user_answer_scope
+
+
+class UserAnswerContextMiddleware:
+    """Opens the scope of the answer contexts for the request, see profiles.answer_context."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with user_answer_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with user_answer_scope():
+            return await self.get_response(request)
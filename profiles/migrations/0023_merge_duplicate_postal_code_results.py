@@ -0,0 +1,37 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:05
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_postal_code_results(apps, schema_editor):
+    """Sums the counts of the duplicate rows to the oldest row and deletes the others."""
+    PostalCodeResult = apps.get_model("profiles", "PostalCodeResult")
+    duplicates = (
+        PostalCodeResult.objects.values("postal_code", "postal_code_type", "result")
+        .annotate(num_rows=Count("id"), first_id=Min("id"), total_count=Sum("count"))
+        .filter(num_rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        PostalCodeResult.objects.filter(id=duplicate["first_id"]).update(
+            count=duplicate["total_count"]
+        )
+        PostalCodeResult.objects.filter(
+            postal_code=duplicate["postal_code"],
+            postal_code_type=duplicate["postal_code_type"],
+            result=duplicate["result"],
+        ).exclude(id=duplicate["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("profiles", "0022_cumulativeresultcount"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_postal_code_results, migrations.RunPython.noop
+        ),
+    ]
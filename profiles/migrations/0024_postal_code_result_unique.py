@@ -0,0 +1,20 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("profiles", "0023_merge_duplicate_postal_code_results"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="postalcoderesult",
+            constraint=models.UniqueConstraint(
+                fields=("postal_code", "postal_code_type", "result"),
+                name="postal_code_result_must_be_unique",
+            ),
+        ),
+    ]
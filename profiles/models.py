@@ -212,7 +212,11 @@ class PostalCodeResult(models.Model):
                     & models.Q(postal_code_type__isnull=False)
                 ),
                 name="postal_code_and_postal_code_type_must_be_jointly_null",
-            )
+            ),
+            models.UniqueConstraint(
+                fields=["postal_code", "postal_code_type", "result"],
+                name="postal_code_result_must_be_unique",
+            ),
         ]
 
     def __str__(self):
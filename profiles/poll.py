@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from rest_framework.authtoken.models import Token
+
+from account.models import User
+from account.pool import claim_anonymous_user
+from mpbackend.authentication import issue_signed_token, revoke_token
+from profiles.generations import bump_generation, STATISTICS
+from profiles.models import PostalCode, PostalCodeResult, PostalCodeType
+from profiles.utils import create_anonymous_user, get_user_result
+
+
+def get_postal_code_type_ids():
+    """Returns the ids of the home and optional PostalCodeTypes, creating the missing ones."""
+    type_names = [PostalCodeType.HOME_POSTAL_CODE, PostalCodeType.OPTIONAL_POSTAL_CODE]
+    type_ids = dict(
+        PostalCodeType.objects.filter(type_name__in=type_names)
+        .order_by("-id")
+        .values_list("type_name", "id")
+    )
+    for type_name in type_names:
+        if type_name not in type_ids:
+            type_ids[type_name] = PostalCodeType.objects.create(type_name=type_name).id
+    return type_ids
+
+
+def get_postal_code_ids(postal_codes):
+    """Returns the ids of the PostalCodes by postal code, creating the missing ones."""
+    postal_codes = set(postal_codes)
+    filter = Q(postal_code__in=[code for code in postal_codes if code is not None])
+    if None in postal_codes:
+        filter |= Q(postal_code__isnull=True)
+    # The oldest row is used, if the postal code has duplicates
+    postal_code_ids = dict(
+        PostalCode.objects.filter(filter)
+        .order_by("-id")
+        .values_list("postal_code", "id")
+    )
+    for postal_code in postal_codes:
+        if postal_code not in postal_code_ids:
+            postal_code_ids[postal_code] = PostalCode.objects.create(
+                postal_code=postal_code
+            ).id
+    return postal_code_ids
+
+
+def increment_postal_code_results(rows):
+    """
+    Increments the count of the PostalCodeResults, given as (postal_code_id,
+    postal_code_type_id, result_id) tuples, creating the missing rows with a
+    single statement.
+    """
+    qn = connection.ops.quote_name
+    table = qn(PostalCodeResult._meta.db_table)
+    columns = [
+        qn(PostalCodeResult._meta.get_field(name).column)
+        for name in ("postal_code", "postal_code_type", "result")
+    ]
+    count = qn(PostalCodeResult._meta.get_field("count").column)
+    values = ", ".join(["(%s, %s, %s, 1)"] * len(rows))
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}, {count}) VALUES {values} "
+        f"ON CONFLICT ({', '.join(columns)}) "
+        f"DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def start_poll():
+    """
+    Claims an anonymous user from the pool, if ANONYMOUS_USER_POOL, or creates one.
+    Returns the id of the user and the key of the token of the user.
+    """
+    claimed = claim_anonymous_user() if settings.ANONYMOUS_USER_POOL else None
+    if claimed:
+        user_id, key = claimed
+    else:
+        user, token = create_anonymous_user(
+            create_token=not settings.SIGNED_SESSION_TOKENS
+        )
+        user_id, key = user.id, getattr(token, "key", None)
+    if settings.SIGNED_SESSION_TOKENS:
+        key = issue_signed_token(user_id)
+    elif not key:
+        # The user was added to the pool while using signed tokens
+        key = Token.objects.create(user_id=user_id).key
+    return user_id, key
+
+
+def complete_poll(user, token=None):
+    """
+    Saves the result of the user to the home and optional postal code results
+    and revokes the token, if given. The result is saved only once and not at all
+    for profiles whose result can not be used. Returns True if the result was saved.
+    """
+    with transaction.atomic():
+        # The row lock serializes concurrent completions of the same user
+        user = (
+            User.objects.select_for_update(of=("self",))
+            .select_related("profile", "result")
+            .get(pk=user.pk)
+        )
+        saved = False
+        if not user.postal_code_result_saved and user.profile.result_can_be_used:
+            result = user.result or get_user_result(user)
+            if result:
+                profile = user.profile
+                type_ids = get_postal_code_type_ids()
+                postal_code_ids = get_postal_code_ids(
+                    [profile.postal_code, profile.optional_postal_code]
+                )
+                increment_postal_code_results(
+                    [
+                        (
+                            postal_code_ids[profile.postal_code],
+                            type_ids[PostalCodeType.HOME_POSTAL_CODE],
+                            result.id,
+                        ),
+                        (
+                            postal_code_ids[profile.optional_postal_code],
+                            type_ids[PostalCodeType.OPTIONAL_POSTAL_CODE],
+                            result.id,
+                        ),
+                    ]
+                )
+                User.objects.filter(pk=user.pk).update(postal_code_result_saved=True)
+                bump_generation(STATISTICS)
+                saved = True
+        if token:
+            revoke_token(token)
+    return saved
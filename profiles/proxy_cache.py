@@ -0,0 +1,71 @@
+"""
+Refreshes the responses of the public endpoints cached by nginx, see
+deploy/docker_nginx.conf. The lists are requested through the refresh server of
+nginx at PROXY_CACHE_REFRESH_URL, which bypasses the cache and stores the fresh
+responses, in every format of the API and from every allowed origin, which are
+all the variants of a URL in the cache. The other URLs, e.g. with filters, expire
+with the short TTLs of the cache.
+"""
+
+import logging
+import urllib.request
+
+from django.conf import settings
+from django.urls import reverse
+
+from profiles.generations import QUESTIONNAIRE, STATISTICS
+
+logger = logging.getLogger(__name__)
+
+PROXY_CACHE_URL_NAMES = {
+    QUESTIONNAIRE: [
+        "profiles:question-list",
+        "profiles:option-list",
+        "profiles:subquestion-list",
+        "profiles:result-list",
+        "profiles:questioncondition-list",
+        "profiles:subquestioncondition-list",
+    ],
+    STATISTICS: [
+        "profiles:postalcoderesult-list",
+        "profiles:cumulativeresultcount-list",
+        "profiles:postalcode-list",
+        "profiles:postalcodetype-list",
+    ],
+}
+PROXY_CACHE_MEDIA_TYPES = ("application/json", "application/msgpack")
+PROXY_CACHE_REFRESH_TIMEOUT = 10
+
+
+def get_refresh_requests(group):
+    origins = [None] + list(settings.CORS_ORIGIN_WHITELIST)
+    for url_name in PROXY_CACHE_URL_NAMES[group]:
+        url = settings.PROXY_CACHE_REFRESH_URL.rstrip("/") + reverse(url_name)
+        for media_type in PROXY_CACHE_MEDIA_TYPES:
+            for origin in origins:
+                headers = {"Accept": media_type}
+                if origin:
+                    headers["Origin"] = origin
+                yield urllib.request.Request(url, headers=headers)
+
+
+def refresh_proxy_cache(group):
+    """
+    Refreshes the cached lists of the generation group, if PROXY_CACHE_REFRESH_URL.
+    Returns the number of the refreshed responses. The failures are logged, the
+    responses in the cache then expire with their TTL.
+    """
+    if not settings.PROXY_CACHE_REFRESH_URL:
+        return 0
+    num_refreshed = 0
+    for request in get_refresh_requests(group):
+        try:
+            with urllib.request.urlopen(
+                request, timeout=PROXY_CACHE_REFRESH_TIMEOUT
+            ) as response:
+                response.read()
+        except OSError as exc:
+            logger.warning(f"Could not refresh {request.full_url} in the cache: {exc}")
+            continue
+        num_refreshed += 1
+    return num_refreshed
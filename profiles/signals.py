@@ -1,7 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from profiles.models import Answer
+from profiles.answer_context import get_user_answer_context
+from profiles.generations import bump_generation, QUESTIONNAIRE, STATISTICS
+from profiles.models import (
+    Answer,
+    Option,
+    PostalCode,
+    PostalCodeResult,
+    PostalCodeType,
+    Question,
+    QuestionCondition,
+    Result,
+    SubQuestion,
+    SubQuestionCondition,
+)
 from profiles.utils import get_user_result
 
 
@@ -9,5 +22,33 @@ from profiles.utils import get_user_result
 def answer_on_save(sender, **kwargs):
     obj = kwargs["instance"]
     user = obj.user
+    get_user_answer_context(user).update(obj)
     user.result = get_user_result(user)
     user.save()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=SubQuestion)
+@receiver(post_delete, sender=SubQuestion)
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+@receiver(post_save, sender=QuestionCondition)
+@receiver(post_delete, sender=QuestionCondition)
+@receiver(m2m_changed, sender=QuestionCondition.option_conditions.through)
+@receiver(post_save, sender=SubQuestionCondition)
+@receiver(post_delete, sender=SubQuestionCondition)
+def questionnaire_on_change(sender, **kwargs):
+    bump_generation(QUESTIONNAIRE)
+
+
+@receiver(post_save, sender=PostalCode)
+@receiver(post_delete, sender=PostalCode)
+@receiver(post_save, sender=PostalCodeType)
+@receiver(post_delete, sender=PostalCodeType)
+@receiver(post_save, sender=PostalCodeResult)
+@receiver(post_delete, sender=PostalCodeResult)
+def statistics_on_change(sender, **kwargs):
+    bump_generation(STATISTICS)
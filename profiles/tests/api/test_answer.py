@@ -1,11 +1,21 @@
 import time
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.authtoken.models import Token
 from rest_framework.reverse import reverse
+from rest_framework.test import APIRequestFactory
 
 from account.models import User
-from profiles.api.views import QuestionViewSet
+from profiles.answer_context import (
+    get_user_answer_context,
+    user_answer_scope,
+    UserAnswerContext,
+)
+from profiles.api.async_views import create_answer
+from profiles.api.views import AnswerViewSet, QuestionViewSet
 from profiles.models import Answer, Option, Question, SubQuestion
 
 
@@ -94,6 +104,37 @@ def test_post_answer_with_other_option(api_client, users, answers, questions, op
     assert answers_qs.count() == 1
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("async_view", [False, True])
+def test_update_answer_with_other_text(async_view, users, questions, options):
+    user = users.get(username="no answers user")
+    token = Token.objects.create(user=user)
+    question3 = questions.get(number="3")
+    if async_view:
+        view = async_to_sync(create_answer)
+    else:
+        view = AnswerViewSet.as_view({"post": "create"})
+    with user_answer_scope():
+        for data in [
+            {"option": options.get(value="other").id, "other": "bike"},
+            {"option": options.get(value="fast").id},
+        ]:
+            request = APIRequestFactory().post(
+                reverse("profiles:answer-list"),
+                {"question": question3.id, **data},
+                format="json",
+                HTTP_AUTHORIZATION=f"Token {token.key}",
+            )
+            assert view(request).status_code == 201
+        answer = Answer.objects.get(user=user)
+        assert answer.option.value == "fast"
+        assert answer.other == "bike"
+        # The answers of the scope are the saved answers
+        assert get_user_answer_context(user).answers == list(
+            UserAnswerContext(user.pk).answers
+        )
+
+
 @pytest.mark.django_db
 def test_post_answer_answer_is_updated(
     api_client_authenticated, users, answers, questions, options
@@ -212,3 +253,47 @@ def test_post_answer_where_condition_is_met(
     )
     assert response.status_code == 201
     assert answers.count() == num_answers + 1
+
+
+@pytest.mark.django_db
+def test_post_answer_num_queries(
+    api_client_authenticated,
+    users,
+    questions,
+    sub_questions,
+    options,
+    question_conditions,
+    sub_question_conditions,
+):
+    user = users.get(username="test1")
+    answer_url = reverse("profiles:answer-list")
+    question1 = questions.get(number="1")
+    response = api_client_authenticated.post(
+        answer_url,
+        {
+            "option": options.get(question=question1, value="yes").id,
+            "question": question1.id,
+        },
+    )
+    assert response.status_code == 201
+    # A question with a question condition
+    question = questions.get(number="1b")
+    option = Option.objects.create(value="daily", question=question)
+    option.results.add(user.result)
+    with CaptureQueriesContext(connection) as context:
+        response = api_client_authenticated.post(
+            answer_url, {"option": option.id, "question": question.id}
+        )
+    assert response.status_code == 201
+    answer_queries = [
+        query["sql"]
+        for query in context.captured_queries
+        if query["sql"].startswith('SELECT "profiles_answer"')
+    ]
+    # The answers of the user are loaded once and shared by the condition check,
+    # the existence check and the calculation of the result
+    assert len(answer_queries) == 1
+    # The user, the question, the number of sub questions, the option, the question
+    # conditions with their options, the answers, the sub question condition, the insert,
+    # the options results, the results and the update of the result of the user
+    assert len(context.captured_queries) == 12
@@ -0,0 +1,273 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+
+from account.models import Profile, User
+from mpbackend import token_envelope
+from profiles.models import Answer
+
+ASYNC_URLS = override_settings(ROOT_URLCONF="mpbackend.async_urls")
+ASYNC_URL_NAMES = [
+    "profiles:question-start-poll",
+    "profiles:question-get-questions-conditions-states",
+    "profiles:question-get-sub-questions-conditions-states",
+    "profiles:answer-list",
+    "profiles:answer-get-result",
+]
+
+
+def get_requests(questions, sub_questions, options):
+    """Returns the requests of a poll, including the invalid ones."""
+    question1 = questions.get(number="1")
+    question2 = questions.get(number="2")
+    question3 = questions.get(number="3")
+    train_sub_q = sub_questions.get(description="train")
+    option_daily_train = options.get(value="daily", sub_question=train_sub_q)
+    option_other = options.get(value="other", question=question3)
+    states_url = "profiles:question-get-questions-conditions-states"
+    sub_states_url = "profiles:question-get-sub-questions-conditions-states"
+    answer_url = "profiles:answer-list"
+    return [
+        ("get", states_url, None),
+        ("get", sub_states_url, None),
+        ("get", answer_url, None),
+        ("get", "profiles:answer-get-result", None),
+        ("post", answer_url, {}),
+        ("post", answer_url, {"option": option_other.id}),
+        ("post", answer_url, {"option": option_other.id, "question": 0}),
+        (
+            "post",
+            answer_url,
+            {"option": option_daily_train.id, "question": question2.id},
+        ),
+        (
+            "post",
+            answer_url,
+            {"option": option_other.id, "question": question3.id, "other": "bike"},
+        ),
+        ("post", answer_url, {"option": option_other.id, "question": question1.id}),
+        (
+            "post",
+            answer_url,
+            {"option": options.get(value="yes").id, "question": question1.id},
+        ),
+        (
+            "post",
+            answer_url,
+            {"option": options.get(value="no").id, "question": question1.id},
+        ),
+        (
+            "post",
+            answer_url,
+            {
+                "option": option_daily_train.id,
+                "question": question2.id,
+                "sub_question": train_sub_q.id,
+            },
+        ),
+        ("post", answer_url, {"option": option_other.id, "question": question3.id}),
+        (
+            "post",
+            answer_url,
+            {"option": option_other.id, "question": question3.id, "other": "bike"},
+        ),
+        ("get", states_url, None),
+        ("get", sub_states_url, None),
+        ("get", "profiles:answer-get-result", None),
+    ]
+
+
+def get_responses(client, requests, accept="application/json"):
+    responses = []
+    for method, url_name, data in requests:
+        response = getattr(client, method)(
+            reverse(url_name), data, format="json", HTTP_ACCEPT=accept
+        )
+        responses.append(
+            (
+                method,
+                url_name,
+                response.status_code,
+                response.content,
+                response.get("Content-Type"),
+                response.get("WWW-Authenticate"),
+                response.get("Vary"),
+            )
+        )
+    return responses
+
+
+def create_client(username):
+    user = User.objects.create(username=username)
+    Profile.objects.create(user=user)
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+    return user, client
+
+
+@pytest.mark.parametrize("url_name", ASYNC_URL_NAMES)
+def test_async_views_are_routed(url_name):
+    assert not asyncio.iscoroutinefunction(resolve(reverse(url_name)).func)
+    with ASYNC_URLS:
+        assert asyncio.iscoroutinefunction(resolve(reverse(url_name)).func)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("accept", ["application/json", "application/msgpack"])
+def test_async_views_respond_as_sync_views(
+    accept,
+    questions,
+    sub_questions,
+    options,
+    question_conditions,
+    sub_question_conditions,
+):
+    requests = get_requests(questions, sub_questions, options)
+    sync_user, sync_client = create_client("sync user")
+    sync_responses = get_responses(sync_client, requests, accept)
+    async_user, async_client = create_client("async user")
+    with ASYNC_URLS:
+        async_responses = get_responses(async_client, requests, accept)
+    assert async_responses == sync_responses
+    sync_user.refresh_from_db()
+    async_user.refresh_from_db()
+    assert async_user.result == sync_user.result
+    assert list(
+        Answer.objects.filter(user=async_user)
+        .order_by("id")
+        .values_list("question", "sub_question", "option", "other")
+    ) == list(
+        Answer.objects.filter(user=sync_user)
+        .order_by("id")
+        .values_list("question", "sub_question", "option", "other")
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "credentials", [None, "Token invalid", "Token", "Token a:b", "Token a b"]
+)
+def test_async_views_unauthenticated(credentials):
+    requests = [
+        ("get", "profiles:question-get-questions-conditions-states", None),
+        ("post", "profiles:answer-list", {}),
+        ("get", "profiles:answer-get-result", None),
+    ]
+    client = APIClient()
+    if credentials:
+        client.credentials(HTTP_AUTHORIZATION=credentials)
+    sync_responses = get_responses(client, requests)
+    assert all(response[2] == 401 for response in sync_responses)
+    with ASYNC_URLS:
+        assert get_responses(client, requests) == sync_responses
+
+
+@pytest.mark.django_db
+def test_async_views_not_acceptable():
+    client = APIClient()
+    url = reverse("profiles:question-get-questions-conditions-states")
+    sync_response = client.get(url, HTTP_ACCEPT="text/csv")
+    with ASYNC_URLS:
+        response = client.get(url, HTTP_ACCEPT="text/csv")
+    assert response.status_code == sync_response.status_code == 406
+    assert response.json() == sync_response.json()
+
+
+@pytest.mark.django_db
+def test_async_answer_invalid_json(questions):
+    _, client = create_client("test user")
+    url = reverse("profiles:answer-list")
+    sync_response = client.post(url, "{", content_type="application/json")
+    with ASYNC_URLS:
+        response = client.post(url, "{", content_type="application/json")
+    assert response.status_code == sync_response.status_code == 400
+    assert response.json() == sync_response.json()
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="mpbackend.async_urls")
+@pytest.mark.parametrize("signed_session_tokens", [False, True])
+def test_async_start_poll(signed_session_tokens, questions, options):
+    client = APIClient(REMOTE_ADDR="28.18.23.112")
+    with override_settings(SIGNED_SESSION_TOKENS=signed_session_tokens):
+        response = client.post(reverse("profiles:question-start-poll"))
+        assert response.status_code == 200
+        data = response.json()
+        user = User.objects.get(id=data["id"])
+        assert Token.objects.filter(user=user).exists() != signed_session_tokens
+        key = token_envelope.decrypt(*data["data"])
+        client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+        question = questions.get(number="1")
+        response = client.post(
+            reverse("profiles:answer-list"),
+            {"option": options.get(value="yes").id, "question": question.id},
+        )
+        assert response.status_code == 201
+        response = client.get(reverse("profiles:answer-get-result"))
+        assert response.status_code == 200
+        assert response.json()["topic"] == "positive"
+        user.refresh_from_db()
+        assert user.result.topic == "positive"
+
+
+@pytest.mark.django_db
+@override_settings(ROOT_URLCONF="mpbackend.async_urls")
+def test_async_start_poll_throttling():
+    client = APIClient(REMOTE_ADDR="240.231.131.15")
+    url = reverse("profiles:question-start-poll")
+    for _ in range(50):
+        assert client.post(url).status_code == 200
+    response = client.post(url)
+    assert response.status_code == 429
+    assert int(response["Retry-After"]) > 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "method,url_name",
+    [
+        ("get", "profiles:question-get-questions-conditions-states"),
+        ("get", "profiles:question-get-sub-questions-conditions-states"),
+        ("post", "profiles:answer-list"),
+        ("get", "profiles:answer-get-result"),
+    ],
+)
+def test_async_views_throttling(monkeypatch, method, url_name):
+    # The rates are read by the throttles when the module is imported
+    monkeypatch.setattr(
+        SimpleRateThrottle, "THROTTLE_RATES", {"anon": "3/day", "user": "3/day"}
+    )
+    requests = [(method, url_name, {})] * 4
+    sync_responses = get_responses(create_client("sync user")[1], requests)
+    with ASYNC_URLS:
+        responses = get_responses(create_client("async user")[1], requests)
+    assert [response[2] for response in responses] == [
+        response[2] for response in sync_responses
+    ]
+    assert responses[-1][2] == 429
+    assert all(response[2] != 429 for response in responses[:-1])
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(ROOT_URLCONF="mpbackend.async_urls")
+def test_async_views_served_by_asgi_handler(users, answers):
+    token = Token.objects.create(user=users.get(username="car user"))
+    client = AsyncClient()
+
+    async def get_result():
+        return await client.get(
+            reverse("profiles:answer-get-result"),
+            headers={"Authorization": f"Token {token.key}"},
+        )
+
+    response = async_to_sync(get_result)()
+    assert response.status_code == 200
+    assert response.json()["topic"] == "positive"
@@ -0,0 +1,141 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.reverse import reverse
+
+from mpbackend.db_router import replica_states
+from profiles.generations import (
+    bump_generation,
+    get_generations,
+    QUESTIONNAIRE,
+    STATISTICS,
+)
+from profiles.models import PostalCodeResult, Question
+
+QUESTION_URL = reverse("profiles:question-list")
+POSTAL_CODE_RESULT_URL = reverse("profiles:postalcoderesult-list")
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # The generations and the lists cached by cache_page are kept in the cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def bump(group, django_capture_on_commit_callbacks):
+    # The generations are bumped on commit and by the time in nanoseconds
+    time.sleep(0.001)
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_generation(group)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url_name",
+    [
+        "question-list",
+        "questioncondition-list",
+        "subquestioncondition-list",
+        "option-list",
+        "subquestion-list",
+        "result-list",
+        "postalcode-list",
+        "postalcodetype-list",
+        "postalcoderesult-list",
+        "cumulativeresultcount-list",
+    ],
+)
+def test_not_modified(
+    api_client, postal_code_results, django_assert_num_queries, url_name
+):
+    url = reverse(f"profiles:{url_name}")
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert response["ETag"].startswith('W/"')
+    assert "public" in response["Cache-Control"]
+    # The revalidations do not query the database
+    with django_assert_num_queries(0):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert response.status_code == 304
+        assert not response.content
+        assert response["ETag"]
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_modified_after_bump(api_client, questions, django_capture_on_commit_callbacks):
+    response = api_client.get(QUESTION_URL)
+    etag = response["ETag"]
+    with django_capture_on_commit_callbacks(execute=True):
+        Question.objects.create(question="New question", number="5")
+    response = api_client.get(QUESTION_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+    # The list cached by cache_page before the bump is not returned
+    assert response.json()["count"] == questions.count()
+
+
+@pytest.mark.django_db
+def test_statistics_generation(
+    api_client, postal_code_results, django_capture_on_commit_callbacks
+):
+    questionnaire_etag = api_client.get(QUESTION_URL)["ETag"]
+    statistics_etag = api_client.get(POSTAL_CODE_RESULT_URL)["ETag"]
+    with django_capture_on_commit_callbacks(execute=True):
+        PostalCodeResult.objects.filter(id=postal_code_results.first().id).update(
+            count=10
+        )
+        bump_generation(STATISTICS)
+    response = api_client.get(QUESTION_URL, HTTP_IF_NONE_MATCH=questionnaire_etag)
+    assert response.status_code == 304
+    response = api_client.get(
+        POSTAL_CODE_RESULT_URL, HTTP_IF_NONE_MATCH=statistics_etag
+    )
+    assert response.status_code == 200
+    assert 10 in [result["count"] for result in response.json()["results"]]
+
+
+@pytest.fixture
+def replicas():
+    replica_states.clear()
+    with override_settings(DATABASE_REPLICAS=["replica_1"]):
+        yield
+    replica_states.clear()
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica_1"])
+def test_not_replicated(
+    api_client, questions, django_capture_on_commit_callbacks, replicas
+):
+    bump(QUESTIONNAIRE, django_capture_on_commit_callbacks)
+    response = api_client.get(QUESTION_URL)
+    assert response.status_code == 200
+    # The replicas may not have the questionnaire of the generation yet
+    assert "ETag" not in response
+    assert "max-age=0" in response["Cache-Control"]
+    with override_settings(DATABASE_REPLICA_MAX_LAG=0):
+        assert "ETag" in api_client.get(QUESTION_URL)
+
+
+@pytest.mark.django_db
+def test_not_conditional_actions(api_client_authenticated, questions):
+    response = api_client_authenticated.get(
+        reverse("profiles:question-get-question-numbers")
+    )
+    assert response.status_code == 200
+    assert "ETag" not in response
+
+
+@pytest.mark.django_db
+def test_generations_started(django_capture_on_commit_callbacks):
+    generations = get_generations([QUESTIONNAIRE, STATISTICS])
+    assert get_generations([QUESTIONNAIRE, STATISTICS]) == generations
+    bump(STATISTICS, django_capture_on_commit_callbacks)
+    questionnaire, statistics = get_generations([QUESTIONNAIRE, STATISTICS])
+    assert questionnaire == generations[0]
+    assert statistics > generations[1]
@@ -0,0 +1,88 @@
+import pytest
+from rest_framework.reverse import reverse
+
+from profiles.api.serializers import parse_fieldset, QuestionSerializer
+
+
+@pytest.mark.parametrize(
+    "value,fieldset",
+    [
+        ("id", {"id": None}),
+        (
+            "id,number,options.value_fi",
+            {"id": None, "number": None, "options": {"value_fi": None}},
+        ),
+        ("options.results.topic", {"options": {"results": {"topic": None}}}),
+        ("options,options.value_fi", {"options": None}),
+        ("options.value_fi,options", {"options": None}),
+        (" id , ,options. ", {"id": None, "options": {}}),
+    ],
+)
+def test_parse_fieldset(value, fieldset):
+    assert parse_fieldset(value) == fieldset
+
+
+@pytest.mark.django_db
+def test_question_fields(api_client, questions, sub_questions, options, results):
+    url = reverse("profiles:question-list")
+    all_fields = api_client.get(url).json()["results"]
+    response = api_client.get(
+        url, {"fields": "id,number,options.value_fi,sub_questions.options.id"}
+    )
+    assert response.status_code == 200
+    questions = response.json()["results"]
+    assert len(questions) == len(all_fields)
+    for question, all_question_fields in zip(questions, all_fields):
+        assert question["id"] == all_question_fields["id"]
+        assert question["number"] == all_question_fields["number"]
+        if "options" in all_question_fields:
+            assert question["options"] == [
+                {"value_fi": option["value_fi"]}
+                for option in all_question_fields["options"]
+            ]
+        elif "sub_questions" in all_question_fields:
+            assert question["sub_questions"] == [
+                {
+                    "options": [
+                        {"id": option["id"]} for option in sub_question["options"]
+                    ]
+                }
+                for sub_question in all_question_fields["sub_questions"]
+            ]
+        assert set(question) <= {"id", "number", "options", "sub_questions"}
+
+
+@pytest.mark.django_db
+def test_fields_not_built(questions, options):
+    serializer = QuestionSerializer(
+        questions, many=True, fieldset=parse_fieldset("id,options.value_fi")
+    )
+    data = serializer.data
+    assert list(serializer.child.fields) == ["id"]
+    assert list(serializer.child.options_serializer.child.fields) == ["value_fi"]
+    assert all(set(question) <= {"id", "options"} for question in data)
+
+
+@pytest.mark.django_db
+def test_statistics_fields(api_client, postal_code_results):
+    response = api_client.get(
+        reverse("profiles:postalcoderesult-list"),
+        {"fields": "id,count,result_topics"},
+    )
+    assert response.status_code == 200
+    for result in response.json()["results"]:
+        assert set(result) == {"id", "count", "result_topics"}
+    response = api_client.get(
+        reverse("profiles:cumulativeresultcount-list"), {"fields": "id"}
+    )
+    assert response.status_code == 200
+    assert all(set(result) == {"id"} for result in response.json()["results"])
+
+
+@pytest.mark.django_db
+def test_result_fields(api_client_authenticated, answers):
+    response = api_client_authenticated.get(
+        reverse("profiles:answer-get-result"), {"fields": "topic"}
+    )
+    assert response.status_code == 200
+    assert list(response.json()) == ["topic"]
@@ -0,0 +1,361 @@
+"""
+Query count regression tests for every API endpoint.
+
+Every route of the profiles and account routers is requested against a dataset of
+increasing size and the number of SQL queries must be the same for every size,
+i.e. no endpoint may make queries per row. On failure the fingerprints of the
+captured SQL of the smallest and the failing dataset are shown as a diff.
+
+A new endpoint must be added to ENDPOINTS, test_all_endpoints_are_tested fails
+otherwise.
+"""
+
+import difflib
+import itertools
+import math
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+from rest_framework.routers import SimpleRouter
+from rest_framework.test import APIClient
+
+import account.api.urls
+import profiles.api.urls
+from account.models import MailingList, MailingListEmail, Profile, User
+from mpbackend.query_metrics import get_sql_fingerprint
+from profiles.models import (
+    Answer,
+    Option,
+    PostalCode,
+    PostalCodeResult,
+    PostalCodeType,
+    Question,
+    QuestionCondition,
+    Result,
+    SubQuestion,
+    SubQuestionCondition,
+)
+
+# (number of questions, number of postal code results)
+DATASET_SIZES = [(1, 10), (10, 1000), (100, 10000)]
+NUM_RESULTS = 4
+
+
+class Dataset:
+    """
+    The dataset has a root question with options and the given number of
+    questions with sub questions, which are conditioned on the root question,
+    thus every endpoint takes the same code path with every size.
+    """
+
+    def __init__(self):
+        self.results = [
+            Result.objects.create(topic=f"topic {i}", value=f"value {i}")
+            for i in range(NUM_RESULTS)
+        ]
+        for result in self.results:
+            MailingList.objects.create(result=result)
+        self.postal_code_types = [
+            PostalCodeType.objects.create(type_name=PostalCodeType.HOME_POSTAL_CODE),
+            PostalCodeType.objects.create(
+                type_name=PostalCodeType.OPTIONAL_POSTAL_CODE
+            ),
+        ]
+        self.root_question = Question.objects.create(number="0", question="root")
+        self.root_options = [
+            self.create_option(i, result, question=self.root_question)
+            for i, result in enumerate(self.results)
+        ]
+        self.questions = []
+        self.sub_questions = []
+        self.postal_codes = []
+        self.num_postal_code_results = 0
+        self.num_users = 0
+
+    def create_option(self, order_number, result, **kwargs):
+        option = Option.objects.create(
+            value=f"option {order_number}", order_number=order_number, **kwargs
+        )
+        option.results.add(result)
+        return option
+
+    def add_question(self):
+        number = len(self.questions) + 1
+        question = Question.objects.create(number=str(number), question=f"q{number}")
+        question_condition = QuestionCondition.objects.create(
+            question=question, question_condition=self.root_question
+        )
+        question_condition.option_conditions.add(self.root_options[0])
+        sub_questions = []
+        for order_number in range(2):
+            sub_question = SubQuestion.objects.create(
+                question=question,
+                description=f"q{number} sub question {order_number}",
+                order_number=order_number,
+            )
+            for i, result in enumerate(self.results[:2]):
+                self.create_option(i, result, sub_question=sub_question)
+            sub_questions.append(sub_question)
+        # The second sub question is asked only if the first one is answered first
+        SubQuestionCondition.objects.create(
+            sub_question=sub_questions[1], option=sub_questions[0].options.first()
+        )
+        self.questions.append(question)
+        self.sub_questions.append(sub_questions)
+
+    def add_postal_code_results(self, num_postal_code_results):
+        rows_per_postal_code = len(self.postal_code_types) * NUM_RESULTS
+        num_postal_codes = math.ceil(num_postal_code_results / rows_per_postal_code)
+        self.postal_codes += PostalCode.objects.bulk_create(
+            PostalCode(postal_code=str(20000 + i))
+            for i in range(len(self.postal_codes), num_postal_codes)
+        )
+        rows = itertools.product(
+            self.postal_codes, self.postal_code_types, self.results
+        )
+        PostalCodeResult.objects.bulk_create(
+            PostalCodeResult(
+                postal_code=postal_code,
+                postal_code_type=postal_code_type,
+                result=result,
+                count=i,
+            )
+            for i, (postal_code, postal_code_type, result) in enumerate(
+                itertools.islice(
+                    rows, self.num_postal_code_results, num_postal_code_results
+                ),
+                self.num_postal_code_results,
+            )
+        )
+        self.num_postal_code_results = num_postal_code_results
+
+    def grow(self, num_questions, num_postal_code_results):
+        while len(self.questions) < num_questions:
+            self.add_question()
+        for result in self.results:
+            result.num_options = result.options.count()
+            result.save()
+        self.add_postal_code_results(num_postal_code_results)
+
+    def create_user(self):
+        """Returns a user that has answered all the questions and its client."""
+        self.num_users += 1
+        user = User.objects.create(
+            username=f"user {self.num_users}", result=self.results[0]
+        )
+        Profile.objects.create(
+            user=user,
+            postal_code=self.postal_codes[0].postal_code,
+            optional_postal_code=self.postal_codes[0].postal_code,
+        )
+        answers = [
+            Answer(user=user, question=self.root_question, option=self.root_options[0])
+        ]
+        for question, sub_questions in zip(self.questions, self.sub_questions):
+            for sub_question in sub_questions:
+                answers.append(
+                    Answer(
+                        user=user,
+                        question=question,
+                        sub_question=sub_question,
+                        option=sub_question.options.first(),
+                    )
+                )
+        Answer.objects.bulk_create(answers)
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        return user, client
+
+
+def get_answer_data(dataset, user):
+    sub_question = dataset.sub_questions[0][1]
+    return {
+        "question": dataset.questions[0].id,
+        "sub_question": sub_question.id,
+        "option": sub_question.options.last().id,
+    }
+
+
+def get_unsubscribe_data(dataset, user):
+    email = f"{user.id}@test.com"
+    MailingListEmail.objects.create(
+        mailing_list=MailingList.objects.first(), email=email
+    )
+    return {"email": email}
+
+
+def detail(basename, model):
+    def get_url(dataset, user):
+        return reverse(basename, args=[model.objects.first().id])
+
+    return ("get", get_url, None)
+
+
+# (router basename, action): (method, url or a function that returns the url,
+# a function that returns the data)
+ENDPOINTS = {
+    ("question", "list"): ("get", "profiles:question-list", None),
+    ("question", "retrieve"): detail("profiles:question-detail", Question),
+    ("question", "start_poll"): ("post", "profiles:question-start-poll", None),
+    ("question", "get_question_numbers"): (
+        "get",
+        "profiles:question-get-question-numbers",
+        None,
+    ),
+    ("question", "get_questions_with_conditions"): (
+        "get",
+        "profiles:question-get-questions-with-conditions",
+        None,
+    ),
+    ("question", "get_questions_conditions_states"): (
+        "get",
+        "profiles:question-get-questions-conditions-states",
+        None,
+    ),
+    ("question", "get_sub_questions_conditions_states"): (
+        "get",
+        "profiles:question-get-sub-questions-conditions-states",
+        None,
+    ),
+    ("question", "get_question"): (
+        "get",
+        lambda dataset, user: reverse("profiles:question-get-question")
+        + f"?number={dataset.questions[0].number}",
+        None,
+    ),
+    ("question", "end_poll"): ("post", "profiles:question-end-poll", None),
+    ("question", "check_if_question_condition_met"): (
+        "post",
+        "profiles:question-check-if-question-condition-met",
+        lambda dataset, user: {"question": dataset.questions[0].id},
+    ),
+    ("question", "check_if_sub_question_condition_met"): (
+        "post",
+        "profiles:question-check-if-sub-question-condition-met",
+        lambda dataset, user: {"sub_question": dataset.sub_questions[0][1].id},
+    ),
+    ("question", "in_condition"): (
+        "post",
+        "profiles:question-in-condition",
+        lambda dataset, user: {"question": dataset.root_question.id},
+    ),
+    ("questioncondition", "list"): ("get", "profiles:questioncondition-list", None),
+    ("questioncondition", "retrieve"): detail(
+        "profiles:questioncondition-detail", QuestionCondition
+    ),
+    ("subquestioncondition", "list"): (
+        "get",
+        "profiles:subquestioncondition-list",
+        None,
+    ),
+    ("subquestioncondition", "retrieve"): detail(
+        "profiles:subquestioncondition-detail", SubQuestionCondition
+    ),
+    ("option", "list"): ("get", "profiles:option-list", None),
+    ("option", "retrieve"): detail("profiles:option-detail", Option),
+    ("subquestion", "list"): ("get", "profiles:subquestion-list", None),
+    ("subquestion", "retrieve"): detail("profiles:subquestion-detail", SubQuestion),
+    ("result", "list"): ("get", "profiles:result-list", None),
+    ("result", "retrieve"): detail("profiles:result-detail", Result),
+    ("answer", "create"): ("post", "profiles:answer-list", get_answer_data),
+    ("answer", "get_result"): ("get", "profiles:answer-get-result", None),
+    ("postalcoderesult", "list"): ("get", "profiles:postalcoderesult-list", None),
+    ("postalcoderesult", "retrieve"): detail(
+        "profiles:postalcoderesult-detail", PostalCodeResult
+    ),
+    ("postalcode", "list"): ("get", "profiles:postalcode-list", None),
+    ("postalcode", "retrieve"): detail("profiles:postalcode-detail", PostalCode),
+    ("cumulativeresultcount", "list"): (
+        "get",
+        "profiles:cumulativeresultcount-list",
+        None,
+    ),
+    ("postalcodetype", "list"): ("get", "profiles:postalcodetype-list", None),
+    ("postalcodetype", "retrieve"): detail(
+        "profiles:postalcodetype-detail", PostalCodeType
+    ),
+    ("profiles", "update"): (
+        "put",
+        lambda dataset, user: reverse("account:profiles-detail", args=[user.id]),
+        lambda dataset, user: {"postal_code": user.profile.postal_code},
+    ),
+    ("profiles", "partial_update"): (
+        "patch",
+        lambda dataset, user: reverse("account:profiles-detail", args=[user.id]),
+        lambda dataset, user: {"year_of_birth": 1980},
+    ),
+    ("profiles", "subscribe"): (
+        "post",
+        "account:profiles-subscribe",
+        lambda dataset, user: {"email": f"{user.id}@test.com", "user": user.id},
+    ),
+    ("profiles", "unsubscribe"): (
+        "post",
+        "account:profiles-unsubscribe",
+        get_unsubscribe_data,
+    ),
+}
+
+
+def get_routed_endpoints():
+    """Returns the (basename, action) of every route of the API routers."""
+    endpoints = set()
+    for router in (profiles.api.urls.router, account.api.urls.router):
+        for _, viewset, basename in router.registry:
+            for route in SimpleRouter.get_routes(router, viewset):
+                mapping = router.get_method_map(viewset, route.mapping)
+                endpoints |= {(basename, action) for action in mapping.values()}
+    return endpoints
+
+
+def request_endpoint(endpoint, dataset):
+    """Returns the response and the fingerprints of the SQL of the request."""
+    method, url, get_data = ENDPOINTS[endpoint]
+    user, client = dataset.create_user()
+    url = url(dataset, user) if callable(url) else reverse(url)
+    data = get_data(dataset, user) if get_data else None
+    # The cached views and the throttles must not affect the queries
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data, format="json")
+    return response, [get_sql_fingerprint(query["sql"]) for query in context]
+
+
+def test_all_endpoints_are_tested():
+    assert get_routed_endpoints() == set(ENDPOINTS)
+
+
+@pytest.mark.django_db
+def test_num_queries_do_not_depend_on_data_size():
+    # The dataset is built once, thus every endpoint is requested for every size
+    dataset = Dataset()
+    expected_queries = {}
+    failures = {}
+    for size in DATASET_SIZES:
+        dataset.grow(*size)
+        for endpoint in ENDPOINTS:
+            response, queries = request_endpoint(endpoint, dataset)
+            assert response.status_code < 300, (endpoint, response.content)
+            expected = expected_queries.setdefault(endpoint, queries)
+            if endpoint in failures or len(queries) == len(expected):
+                continue
+            diff = "\n".join(
+                difflib.unified_diff(
+                    expected,
+                    queries,
+                    f"{DATASET_SIZES[0]} (questions, postal code results)",
+                    f"{size}",
+                    lineterm="",
+                )
+            )
+            failures[endpoint] = (
+                f"{endpoint} made {len(expected)} queries with the dataset of size "
+                f"{DATASET_SIZES[0]} and {len(queries)} with the size {size}:\n{diff}"
+            )
+    if failures:
+        pytest.fail("\n\n".join(failures.values()))
@@ -0,0 +1,77 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+
+from profiles.models import PostalCode, PostalCodeResult
+
+POSTAL_CODE_URL = reverse("profiles:postalcode-list")
+
+
+def get_pages(api_client, url):
+    """Returns the pages following the next links and the SQL of every page."""
+    pages = []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url)
+        assert response.status_code == 200
+        pages.append((response.json(), [query["sql"] for query in context]))
+        url = pages[-1][0]["next"]
+    return pages
+
+
+@pytest.mark.django_db
+def test_cursor_pagination(api_client):
+    PostalCode.objects.bulk_create(
+        [PostalCode(postal_code=str(20000 + i)) for i in range(25)]
+    )
+    pages = get_pages(api_client, f"{POSTAL_CODE_URL}?pagination=cursor&page_size=10")
+    assert [len(page["results"]) for page, _ in pages] == [10, 10, 5]
+    ids = [result["id"] for page, _ in pages for result in page["results"]]
+    assert ids == list(PostalCode.objects.order_by("id").values_list("id", flat=True))
+    for page, queries in pages:
+        assert "count" not in page
+        # The page is queried by the key, without counting or skipping the rows
+        assert len(queries) == 1
+        assert "COUNT" not in queries[0]
+        assert "OFFSET" not in queries[0]
+    # The previous page is queried by the key as well
+    page, queries = get_pages(api_client, pages[-1][0]["previous"])[0]
+    assert [result["id"] for result in page["results"]] == ids[10:20]
+    assert "OFFSET" not in queries[0]
+
+
+@pytest.mark.django_db
+def test_cursor_pagination_estimated_count(api_client, postal_code_results):
+    url = reverse("profiles:postalcoderesult-list")
+    response = api_client.get(
+        url, {"pagination": "cursor", "postal_code_type": postal_code_results[0].id}
+    )
+    assert response.status_code == 200
+    assert "estimated_count" not in response.json()
+    response = api_client.get(url, {"pagination": "cursor", "estimated_count": "true"})
+    assert response.status_code == 200
+    json_data = response.json()
+    # The estimate is available only on PostgreSQL
+    if connection.vendor == "postgresql":
+        assert json_data["estimated_count"] >= 0
+    else:
+        assert json_data["estimated_count"] is None
+    assert [result["id"] for result in json_data["results"]] == list(
+        PostalCodeResult.objects.order_by("id").values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_page_number_pagination_by_default(api_client, postal_codes):
+    response = api_client.get(POSTAL_CODE_URL, {"page_size": 1, "page": 2})
+    assert response.status_code == 200
+    json_data = response.json()
+    assert json_data["count"] == 2
+    assert json_data["results"][0]["id"] == postal_codes.last().id
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(api_client, postal_codes):
+    response = api_client.get(POSTAL_CODE_URL, {"cursor": "invalid"})
+    assert response.status_code == 404
@@ -5,6 +5,7 @@ from rest_framework.reverse import reverse
 
 from account.models import Profile, User
 from profiles.models import Answer, PostalCode, PostalCodeResult, PostalCodeType
+from profiles.poll import complete_poll
 from profiles.tests.conftest import NEG, POS
 
 ANSWER_URL = reverse("profiles:answer-list")
@@ -319,3 +320,48 @@ def test_cumulative_results(
     assert json_data["results"][0]["sum_of_count"] == 6
     # Test that count is blurred
     assert json_data["results"][1]["sum_of_count"] == 0
+
+
+@pytest.mark.django_db
+def test_complete_poll_is_idempotent(
+    users, questions, options, results, django_assert_num_queries
+):
+    user = users.get(username="no answers user")
+    Profile.objects.filter(user=user).update(
+        postal_code="20210", optional_postal_code="20220"
+    )
+    question1 = questions.get(number="1")
+    Answer.objects.create(
+        user=user,
+        question=question1,
+        option=options.get(question=question1, value="no"),
+    )
+    token = Token.objects.create(user=user)
+    for type_name in (
+        PostalCodeType.HOME_POSTAL_CODE,
+        PostalCodeType.OPTIONAL_POSTAL_CODE,
+    ):
+        PostalCodeType.objects.create(type_name=type_name)
+    PostalCode.objects.bulk_create(
+        [PostalCode(postal_code="20210"), PostalCode(postal_code="20220")]
+    )
+    # The savepoint, locking the user, the postal code types, the postal codes, the
+    # upsert of both counters, the flag, the deletion of the token and the release
+    with django_assert_num_queries(8):
+        assert complete_poll(user, token=token) is True
+    assert not Token.objects.filter(user=user).exists()
+    assert complete_poll(user) is False
+    assert PostalCodeResult.objects.aggregate(Sum("count"))["count__sum"] == 2
+    user.refresh_from_db()
+    assert user.postal_code_result_saved is True
+
+    # The counters are incremented by other users with the same result
+    other_user = users.get(username="test1")
+    Profile.objects.filter(user=other_user).update(
+        postal_code="20210", optional_postal_code="20220"
+    )
+    other_user.result = user.result
+    other_user.save()
+    assert complete_poll(other_user) is True
+    assert PostalCodeResult.objects.count() == 2
+    assert set(PostalCodeResult.objects.values_list("count", flat=True)) == {2}
@@ -0,0 +1,104 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+import msgpack
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+
+from profiles.api.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        None,
+        [],
+        {"results": [{"id": 1, "value_fi": "Kyllä", "value_sv": None}]},
+        {1: "non-str key", "nested": {"list": [1.5, True, False]}},
+        {"decimal": Decimal("1.25"), "uuid": uuid.UUID(int=1)},
+        {
+            "datetime": datetime.datetime(2024, 1, 2, 3, 4, 5, 678901),
+            "aware": timezone.make_aware(datetime.datetime(2024, 1, 2, 3, 4, 5)),
+            "date": datetime.date(2024, 1, 2),
+            "time": datetime.time(3, 4, 5),
+        },
+        {"lazy": gettext_lazy("Invalid cursor"), "separators": "a b c"},
+    ],
+)
+def test_orjson_renderer_renders_as_json_renderer(data):
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_orjson_renderer_indent():
+    data = {"results": [{"id": 1}]}
+    rendered = ORJSONRenderer().render(data, "application/json; indent=4")
+    assert rendered == b'{\n  "results": [\n    {\n      "id": 1\n    }\n  ]\n}'
+
+
+@pytest.mark.django_db
+def test_browsable_api_disabled(api_client, questions):
+    # DEBUG is not set in the tests
+    url = reverse("profiles:question-list")
+    assert api_client.get(url, {"format": "api"}).status_code == 404
+    response = api_client.get(url, HTTP_ACCEPT="text/html")
+    assert response["Content-Type"] == "application/json"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"results": [{"id": 1, "value_fi": "Kyllä", "value_sv": None}]},
+        {"nested": {"list": [1.5, True, False, 2**40], "tuple": (1, 2)}},
+        {"decimal": Decimal("1.25"), "uuid": uuid.UUID(int=1)},
+        {
+            "aware": timezone.make_aware(datetime.datetime(2024, 1, 2, 3, 4, 5)),
+            "date": datetime.date(2024, 1, 2),
+        },
+        {"lazy": gettext_lazy("Invalid cursor")},
+    ],
+)
+def test_msgpack_renderer_renders_as_json_renderer(data):
+    rendered = MessagePackRenderer().render(data)
+    assert msgpack.unpackb(rendered) == json.loads(JSONRenderer().render(data))
+
+
+def test_msgpack_renderer_empty():
+    assert MessagePackRenderer().render(None) == b""
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params,headers",
+    [({}, {"HTTP_ACCEPT": "application/msgpack"}), ({"format": "msgpack"}, {})],
+)
+def test_msgpack_negotiation(
+    api_client, questions, sub_questions, options, params, headers
+):
+    url = reverse("profiles:question-list")
+    response = api_client.get(url, {"page_size": 100, **params}, **headers)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/msgpack"
+    assert "Accept" in response["Vary"]
+    json_response = api_client.get(url, {"page_size": 100})
+    assert json_response["Content-Type"] == "application/json"
+    assert msgpack.unpackb(response.content) == json_response.json()
+    assert len(response.content) < len(json_response.content)
+
+
+@pytest.mark.django_db
+def test_cached_view_varies_on_accept(api_client, questions):
+    cache.clear()
+    url = reverse("profiles:question-list")
+    response = api_client.get(url, HTTP_ACCEPT="application/msgpack")
+    assert response["Content-Type"] == "application/msgpack"
+    # The cached MessagePack is not returned to the JSON clients
+    response = api_client.get(url, HTTP_ACCEPT="application/json")
+    assert response["Content-Type"] == "application/json"
+    assert response.json()["count"] == questions.count()
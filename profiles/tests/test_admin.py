@@ -0,0 +1,326 @@
+import csv
+import io
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from account.models import User
+from profiles.models import (
+    Answer,
+    Option,
+    PostalCode,
+    PostalCodeResult,
+    PostalCodeType,
+    Question,
+    QuestionCondition,
+    Result,
+    SubQuestion,
+    SubQuestionCondition,
+)
+
+ANSWER_OTHER_CHANGELIST_URL = reverse("admin:profiles_answerother_changelist")
+CHANGELIST_SIZES = [10, 10000]
+
+
+def get_changelist_num_queries(admin_client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+def assert_changelist_num_queries_constant(admin_client, url, create_rows):
+    """
+    Asserts that the changelist is rendered with the same number of queries
+    for every size in CHANGELIST_SIZES.
+    """
+    num_queries = []
+    num_rows = 0
+    for size in CHANGELIST_SIZES:
+        create_rows(num_rows, size - num_rows)
+        num_rows = size
+        num_queries.append(get_changelist_num_queries(admin_client, url))
+    assert len(set(num_queries)) == 1, dict(zip(CHANGELIST_SIZES, num_queries))
+
+
+def create_other_answers(num_answers):
+    user, _ = User.objects.get_or_create(username="other answer user")
+    question = Question.objects.create(number="3", question="Why?")
+    option = Option.objects.create(question=question, value="other", is_other=True)
+    sub_q_question = Question.objects.create(number="4", question="How?")
+    sub_question = SubQuestion.objects.create(
+        question=sub_q_question, description="sub question"
+    )
+    sub_option = Option.objects.create(
+        sub_question=sub_question, value="other", is_other=True
+    )
+    answers = []
+    for i in range(num_answers):
+        if i % 2:
+            answers.append(
+                Answer(user=user, question=question, option=option, other=f"o{i}")
+            )
+        else:
+            answers.append(
+                Answer(
+                    user=user,
+                    sub_question=sub_question,
+                    option=sub_option,
+                    other=f"s\n{i}",
+                )
+            )
+    Answer.objects.bulk_create(answers)
+    return Answer.objects.filter(option__is_other=True)
+
+
+def export_answer_other_csv(admin_client, queryset):
+    with CaptureQueriesContext(connection) as context:
+        response = admin_client.post(
+            ANSWER_OTHER_CHANGELIST_URL,
+            {
+                "action": "export_as_csv",
+                "_selected_action": list(queryset.values_list("id", flat=True)),
+            },
+        )
+        content = b"".join(response.streaming_content).decode()
+    return response, content, len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_answer_other_export_as_csv(admin_client):
+    queryset = create_other_answers(4)
+    response, content, _ = export_answer_other_csv(admin_client, queryset)
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "text/csv"
+    rows = list(csv.reader(io.StringIO(content)))
+    assert rows[0] == ["id", "created", "question", "sub_question", "option", "other"]
+    assert len(rows) == 5
+    # Answers to sub questions are exported with the question of the sub question
+    assert "4: How?" in [row[2] for row in rows[1:]]
+    assert "s 0" in [row[5] for row in rows[1:]]
+
+
+@pytest.mark.django_db
+def test_answer_other_export_as_csv_num_queries(admin_client):
+    _, _, num_queries_small = export_answer_other_csv(
+        admin_client, create_other_answers(2)
+    )
+    Answer.objects.all().delete()
+    _, _, num_queries_large = export_answer_other_csv(
+        admin_client, create_other_answers(40)
+    )
+    assert num_queries_small == num_queries_large
+
+
+@pytest.mark.django_db
+def test_answer_other_changelist_num_queries(admin_client):
+    create_other_answers(2)
+    with CaptureQueriesContext(connection) as small_context:
+        response = admin_client.get(ANSWER_OTHER_CHANGELIST_URL)
+    assert response.status_code == 200
+    Answer.objects.all().delete()
+    create_other_answers(40)
+    with CaptureQueriesContext(connection) as large_context:
+        response = admin_client.get(ANSWER_OTHER_CHANGELIST_URL)
+    assert response.status_code == 200
+    assert len(small_context.captured_queries) == len(large_context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_cumulative_result_count_changelist(admin_client, postal_code_results):
+    url = reverse("admin:profiles_cumulativeresultcount_changelist")
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    model_admin = response.context["cl"].model_admin
+    result_list = {obj.topic: obj for obj in response.context["cl"].result_list}
+    # The home postal code type is selected by default
+    assert result_list["negative"].selected_postal_code_type == "Home"
+    assert result_list["negative"].sum_of_count == 6
+    assert result_list["negative"].home_sum_of_count == 6
+    assert result_list["negative"].optional_sum_of_count == 0
+    assert result_list["negative"].total_count == 6
+    assert result_list["positive"].sum_of_count == 0
+    assert model_admin.share_of_total(result_list["negative"]) == 100.0
+    assert model_admin.blurred_sum_of_count(result_list["negative"]) == 6
+
+    response = admin_client.get(url, {"postal_code_type": "Optional"})
+    assert response.status_code == 200
+    result_list = {obj.topic: obj for obj in response.context["cl"].result_list}
+    assert result_list["negative"].selected_postal_code_type == "Optional"
+    assert result_list["negative"].sum_of_count == 0
+    assert result_list["negative"].home_sum_of_count == 6
+
+
+@pytest.mark.django_db
+def test_cumulative_result_count_changelist_num_queries(
+    admin_client, postal_code_results, results
+):
+    url = reverse("admin:profiles_cumulativeresultcount_changelist")
+    with CaptureQueriesContext(connection) as small_context:
+        admin_client.get(url)
+    for i in range(20):
+        result = Result.objects.create(topic=f"result {i}", num_options=1)
+        PostalCodeResult.objects.create(
+            postal_code=postal_code_results[0].postal_code,
+            postal_code_type=postal_code_results[0].postal_code_type,
+            result=result,
+            count=i,
+        )
+    with CaptureQueriesContext(connection) as large_context:
+        admin_client.get(url)
+    assert len(small_context.captured_queries) == len(large_context.captured_queries)
+
+
+def create_questions(start, num_rows):
+    Question.objects.bulk_create(
+        [
+            Question(number=str(i), question=f"q{i}")
+            for i in range(start, start + num_rows)
+        ]
+    )
+
+
+def create_sub_questions(start, num_rows):
+    question, _ = Question.objects.get_or_create(number="1")
+    SubQuestion.objects.bulk_create(
+        [
+            SubQuestion(question=question, description=f"s{i}", order_number=i)
+            for i in range(start, start + num_rows)
+        ]
+    )
+
+
+def create_options(start, num_rows):
+    question, _ = Question.objects.get_or_create(number="1")
+    Option.objects.bulk_create(
+        [
+            Option(question=question, value=f"o{i}", order_number=i)
+            for i in range(start, start + num_rows)
+        ]
+    )
+
+
+def create_results(start, num_rows):
+    Result.objects.bulk_create(
+        [Result(topic=f"r{i}", value=f"v{i}") for i in range(start, start + num_rows)]
+    )
+
+
+def create_question_conditions(start, num_rows):
+    question, _ = Question.objects.get_or_create(number="1")
+    QuestionCondition.objects.bulk_create(
+        [
+            QuestionCondition(question=question, question_condition=question)
+            for _ in range(num_rows)
+        ]
+    )
+
+
+def create_sub_question_conditions(start, num_rows):
+    create_options(start, 1)
+    option = Option.objects.last()
+    sub_question = SubQuestion.objects.create(question=option.question)
+    SubQuestionCondition.objects.bulk_create(
+        [
+            SubQuestionCondition(sub_question=sub_question, option=option)
+            for _ in range(num_rows)
+        ]
+    )
+
+
+def create_answers(start, num_rows, is_other=False):
+    user, _ = User.objects.get_or_create(username="answer user")
+    question = Question.objects.create(number="1")
+    sub_question = SubQuestion.objects.create(question=question)
+    option = Option.objects.create(sub_question=sub_question, is_other=is_other)
+    Answer.objects.bulk_create(
+        [
+            Answer(
+                user=user,
+                question=question,
+                sub_question=sub_question,
+                option=option,
+                other=f"other {i}",
+            )
+            for i in range(start, start + num_rows)
+        ]
+    )
+
+
+def create_other_answers_rows(start, num_rows):
+    create_answers(start, num_rows, is_other=True)
+
+
+def create_postal_codes(start, num_rows):
+    PostalCode.objects.bulk_create(
+        [PostalCode(postal_code=str(i)) for i in range(start, start + num_rows)]
+    )
+
+
+def create_postal_code_types(start, num_rows):
+    PostalCodeType.objects.bulk_create([PostalCodeType() for _ in range(num_rows)])
+
+
+def create_postal_code_results(start, num_rows):
+    create_results(start, 1)
+    result = Result.objects.last()
+    postal_code_type, _ = PostalCodeType.objects.get_or_create(
+        type_name=PostalCodeType.HOME_POSTAL_CODE
+    )
+    create_postal_codes(start, num_rows)
+    PostalCodeResult.objects.bulk_create(
+        [
+            PostalCodeResult(
+                postal_code=postal_code,
+                postal_code_type=postal_code_type,
+                result=result,
+                count=1,
+            )
+            for postal_code in PostalCode.objects.all()[start:]
+        ]
+    )
+
+
+def create_cumulative_result_counts(start, num_rows):
+    postal_code_type, _ = PostalCodeType.objects.get_or_create(
+        type_name=PostalCodeType.HOME_POSTAL_CODE
+    )
+    postal_code, _ = PostalCode.objects.get_or_create(postal_code="20100")
+    create_results(start, num_rows)
+    PostalCodeResult.objects.bulk_create(
+        [
+            PostalCodeResult(
+                postal_code=postal_code,
+                postal_code_type=postal_code_type,
+                result=result,
+                count=10,
+            )
+            for result in Result.objects.all()[start:]
+        ]
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "model_name,create_rows",
+    [
+        ("question", create_questions),
+        ("subquestion", create_sub_questions),
+        ("option", create_options),
+        ("result", create_results),
+        ("questioncondition", create_question_conditions),
+        ("subquestioncondition", create_sub_question_conditions),
+        ("answer", create_answers),
+        ("answerother", create_other_answers_rows),
+        ("postalcode", create_postal_codes),
+        ("postalcodetype", create_postal_code_types),
+        ("postalcoderesult", create_postal_code_results),
+        ("cumulativeresultcount", create_cumulative_result_counts),
+    ],
+)
+def test_changelist_num_queries(admin_client, model_name, create_rows):
+    url = reverse(f"admin:profiles_{model_name}_changelist")
+    assert_changelist_num_queries_constant(admin_client, url, create_rows)
@@ -1,5 +1,43 @@
+import base64
+import random
+import re
+import string
+
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+from mpbackend.token_envelope import (
+    check_token_secret,
+    decrypt,
+    decrypt_cbc,
+    encrypt,
+    encrypt_cbc,
+    ENVELOPE_V1,
+    ENVELOPE_V2,
+    ENVELOPE_V2_PREFIX,
+    get_key,
+    seal,
+    unseal,
+    urlsafe_b64decode,
+    urlsafe_b64encode,
+)
 from profiles.utils import decrypt_text, encrypt_text
 
+KEY = "1234567890123456"
+
+
+def legacy_encrypt_text(text, key):
+    # encrypt_text before the token envelope
+    text = pad(text.encode(), 16)
+    iv = random.randbytes(16)
+    cipher = AES.new(key.encode("utf-8"), AES.MODE_CBC, iv)
+    return base64.b64encode(cipher.encrypt(text)), base64.b64encode(cipher.iv).decode(
+        "utf-8"
+    )
+
 
 def test_encrypt_and_decrypt():
     in_text = "Hello World"
@@ -7,3 +45,57 @@ def test_encrypt_and_decrypt():
     ret_vals = encrypt_text(in_text, key)
     dec_text = decrypt_text(ret_vals[0], key, ret_vals[1])
     assert dec_text == in_text
+
+
+def random_texts(seed, num_texts=200):
+    rng = random.Random(seed)
+    alphabet = string.printable + "åäöÅÄÖ€😀"
+    yield ""
+    for _ in range(num_texts):
+        yield "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 100)))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_envelope_round_trip(seed):
+    for text in random_texts(seed):
+        envelope = seal(text, KEY)
+        assert envelope.startswith(ENVELOPE_V2_PREFIX)
+        assert re.fullmatch(r"v2\.[A-Za-z0-9_-]+", envelope)
+        assert unseal(envelope, KEY) == text
+        enc, iv = encrypt_cbc(text, KEY)
+        assert isinstance(enc, str) and isinstance(iv, str)
+        assert decrypt_cbc(enc, iv, KEY) == text
+        # Payloads encrypted by the former encrypt_text
+        assert decrypt_cbc(*legacy_encrypt_text(text, KEY), KEY) == text
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_envelope_tampering_is_detected(seed):
+    rng = random.Random(seed)
+    for text in random_texts(seed, num_texts=50):
+        envelope = seal(text, KEY)
+        data = bytearray(urlsafe_b64decode(envelope[len(ENVELOPE_V2_PREFIX) :]))
+        data[rng.randrange(len(data))] ^= 1 << rng.randrange(8)
+        with pytest.raises(ValueError):
+            unseal(ENVELOPE_V2_PREFIX + urlsafe_b64encode(bytes(data)), KEY)
+    with pytest.raises(ValueError):
+        unseal(seal("text", KEY), "6543210987654321")
+    for envelope in ("", "v1.abc", "v2.", "v2.abc", "v2.%%%"):
+        with pytest.raises(ValueError):
+            unseal(envelope, KEY)
+
+
+def test_envelope_key_is_validated():
+    with pytest.raises(ImproperlyConfigured):
+        get_key("too short")
+    with override_settings(TOKEN_SECRET="too short"):
+        assert [error.id for error in check_token_secret(None)] == ["mpbackend.E001"]
+    assert check_token_secret(None) == []
+
+
+@override_settings(TOKEN_ENVELOPE_VERSION=ENVELOPE_V2)
+def test_encrypt_with_envelope_version():
+    envelope = encrypt("text")
+    assert envelope.startswith(ENVELOPE_V2_PREFIX)
+    assert decrypt(envelope) == "text"
+    assert decrypt(*encrypt("text", version=ENVELOPE_V1)) == "text"
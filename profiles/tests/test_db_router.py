@@ -0,0 +1,105 @@
+import pytest
+from django.db import connections, router
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from account.models import User
+from mpbackend import db_router
+from mpbackend.db_router import replica_reads, replica_states
+from profiles.models import Answer, PostalCodeResult, Question
+
+REPLICA = "replica_1"
+# The replica is a connection of its own to the test database, thus the rows are
+# committed to be read from the replica
+REPLICA_DB = pytest.mark.django_db(transaction=True, databases=["default", REPLICA])
+
+
+@pytest.fixture(autouse=True)
+def replicas():
+    replica_states.clear()
+    with override_settings(DATABASE_REPLICAS=[REPLICA]):
+        yield
+    replica_states.clear()
+
+
+def get_num_queries(client, url, alias):
+    with CaptureQueriesContext(connections[alias]) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+def test_reads_routed_to_replica_within_replica_reads():
+    assert Question.objects.all().db == "default"
+    with replica_reads():
+        assert Question.objects.all().db == REPLICA
+        assert PostalCodeResult.objects.all().db == REPLICA
+        assert Answer.objects.all().db == "default"
+        assert User.objects.all().db == "default"
+        assert Token.objects.all().db == "default"
+    with replica_reads(primary_models=()):
+        assert User.objects.all().db == REPLICA
+        assert Token.objects.all().db == "default"
+
+
+def test_reads_after_write_routed_to_primary():
+    with replica_reads():
+        assert Question.objects.all().db == REPLICA
+        assert router.db_for_write(Question) == "default"
+        assert Question.objects.all().db == "default"
+
+
+@pytest.mark.parametrize("lag", [10, None])
+def test_lagging_replica_not_used(monkeypatch, lag):
+    monkeypatch.setattr(db_router, "get_replication_lag", lambda alias: lag)
+    with replica_reads():
+        assert Question.objects.all().db == "default"
+
+
+@override_settings(DATABASE_REPLICA_CHECK_INTERVAL=0)
+def test_replica_used_again_when_caught_up(monkeypatch):
+    lags = {REPLICA: 10}
+    monkeypatch.setattr(db_router, "get_replication_lag", lags.get)
+    with replica_reads():
+        assert Question.objects.all().db == "default"
+    lags[REPLICA] = 1
+    with replica_reads():
+        assert Question.objects.all().db == REPLICA
+
+
+@override_settings(DATABASE_REPLICAS=[])
+def test_no_replicas():
+    with replica_reads():
+        assert Question.objects.all().db == "default"
+
+
+@REPLICA_DB
+def test_read_only_viewsets_read_from_replica(api_client, postal_code_results):
+    url = reverse("profiles:postalcoderesult-list")
+    assert get_num_queries(api_client, url, REPLICA) > 0
+    assert get_num_queries(api_client, url, "default") == 0
+    url = reverse("profiles:question-get-question-numbers")
+    assert get_num_queries(api_client, url, "default") == 0
+
+
+@REPLICA_DB
+def test_poll_reads_from_primary(api_client_authenticated, questions, answers):
+    url = reverse("profiles:answer-get-result")
+    assert get_num_queries(api_client_authenticated, url, REPLICA) == 0
+    url = reverse("profiles:question-get-questions-conditions-states")
+    assert get_num_queries(api_client_authenticated, url, REPLICA) == 0
+
+
+@REPLICA_DB
+def test_admin_changelist_reads_from_replica(admin_client):
+    user = User.objects.create(username="test user")
+    url = reverse("admin:account_user_changelist")
+    assert get_num_queries(admin_client, url, REPLICA) > 0
+    response = admin_client.post(
+        reverse("admin:account_user_delete", args=[user.id]), {"post": "yes"}
+    )
+    assert response.status_code == 302
+    # The admin reads its write from the primary
+    assert get_num_queries(admin_client, url, REPLICA) == 0
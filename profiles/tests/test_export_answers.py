@@ -0,0 +1,94 @@
+import csv
+import io
+import sys
+from io import StringIO
+
+import pytest
+from django.core.management import call_command, CommandError
+from django.urls import reverse
+
+from account.models import Profile
+from profiles.answer_export import get_user_id_ranges, PROFILE_FIELDS
+
+HEADER = PROFILE_FIELDS + ["result", "1", "1b", "2.0", "2.1", "3", "4.0"]
+
+
+def export_command(*args, **kwargs):
+    out = StringIO()
+    call_command(
+        "export_answers",
+        *args,
+        stdout=out,
+        stderr=StringIO(),
+        **kwargs,
+    )
+    return out.getvalue()
+
+
+def read_csv(path):
+    with open(path, newline="") as csv_file:
+        return list(csv.reader(csv_file))
+
+
+@pytest.mark.django_db
+def test_export_answers(tmp_path, answers):
+    path = tmp_path / "answers.csv"
+    out = export_command(output=str(path), chunk_size=2)
+    assert "Exported 6 rows" in out
+    rows = read_csv(path)
+    assert rows[0] == HEADER
+    assert len(rows) == 7
+    answer_columns = [row[len(PROFILE_FIELDS) + 1 :] for row in rows[1:]]
+    assert ["yes", "", "daily", "", "", ""] in answer_columns
+    assert ["", "", "never", "", "", ""] in answer_columns
+    assert answer_columns.count(["no", "", "", "", "", ""]) == 2
+
+
+@pytest.mark.django_db
+def test_export_answers_multiple_options(tmp_path, users, questions, options):
+    user = users.get(username="test1")
+    question = questions.get(number="3")
+    for option in options.filter(question=question, is_other=False):
+        user.answers.create(question=question, option=option)
+    path = tmp_path / "answers.csv"
+    export_command(output=str(path))
+    rows = read_csv(path)
+    assert len(rows) == 2
+    assert rows[1][HEADER.index("3")] == "fast;easy"
+
+
+def test_export_answers_parquet_without_pyarrow(tmp_path, monkeypatch):
+    # None in sys.modules makes the import fail
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(CommandError, match="pyarrow"):
+        export_command(output=str(tmp_path / "answers.parquet"), format="parquet")
+
+
+def test_get_user_id_ranges():
+    ranges = get_user_id_ranges(3)
+    assert len(ranges) == 3
+    assert ranges[0][0].int == 0
+    assert ranges[-1][1].int == 2**128 - 1
+    for (_, high), (low, _) in zip(ranges, ranges[1:]):
+        assert high.int + 1 == low.int
+
+
+@pytest.mark.django_db
+def test_profile_admin_export_answers_as_csv(admin_client, answers):
+    url = reverse("admin:account_profile_changelist")
+    response = admin_client.post(
+        url,
+        {
+            "action": "export_answers_as_csv",
+            "_selected_action": list(
+                Profile.objects.filter(
+                    user__username__in=["car user", "non car user"]
+                ).values_list("id", flat=True)
+            ),
+        },
+    )
+    assert response.status_code == 200
+    content = b"".join(response.streaming_content).decode()
+    rows = list(csv.reader(io.StringIO(content)))
+    assert rows[0] == HEADER
+    assert len(rows) == 3
@@ -0,0 +1,58 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.test import override_settings
+from django.urls import reverse
+
+from profiles.generations import QUESTIONNAIRE
+from profiles.proxy_cache import PROXY_CACHE_URL_NAMES, refresh_proxy_cache
+
+CORS_ORIGIN_WHITELIST = ["https://liikkumistesti.turku.fi"]
+
+
+@pytest.fixture
+def refresh_server():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, self.headers["Accept"], self.headers["Origin"]))
+            self.send_response(500 if "option" in self.path else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with override_settings(
+        PROXY_CACHE_REFRESH_URL=f"http://127.0.0.1:{server.server_port}/",
+        CORS_ORIGIN_WHITELIST=CORS_ORIGIN_WHITELIST,
+    ):
+        yield requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_refresh_proxy_cache(refresh_server, caplog):
+    num_refreshed = refresh_proxy_cache(QUESTIONNAIRE)
+    url_names = PROXY_CACHE_URL_NAMES[QUESTIONNAIRE]
+    # Every format from every origin and without one
+    assert len(refresh_server) == len(url_names) * 2 * 2
+    assert set(refresh_server) == {
+        (reverse(url_name), media_type, origin)
+        for url_name in url_names
+        for media_type in ["application/json", "application/msgpack"]
+        for origin in [None, CORS_ORIGIN_WHITELIST[0]]
+    }
+    # The failed refreshes are logged and the others are done
+    assert num_refreshed == (len(url_names) - 1) * 2 * 2
+    assert "Could not refresh" in caplog.text
+
+
+@override_settings(PROXY_CACHE_REFRESH_URL="")
+def test_refresh_proxy_cache_not_configured():
+    assert refresh_proxy_cache(QUESTIONNAIRE) == 0
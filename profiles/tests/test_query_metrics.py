@@ -0,0 +1,135 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import AsyncClient, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from mpbackend.query_metrics import (
+    get_pooler_metrics,
+    get_sql_fingerprint,
+    QueryMetricsMiddleware,
+    registry,
+    RequestMetrics,
+)
+
+
+@pytest.fixture
+def metrics_client():
+    registry.clear()
+    with override_settings(QUERY_METRICS=True, QUERY_METRICS_QUERY_BUDGET=2):
+        # The middleware is loaded on the first request of the client
+        yield APIClient()
+    registry.clear()
+
+
+def test_query_metrics_middleware_not_used_when_disabled():
+    with pytest.raises(MiddlewareNotUsed):
+        QueryMetricsMiddleware(lambda request: None)
+
+
+def test_get_sql_fingerprint():
+    assert (
+        get_sql_fingerprint(
+            'SELECT "id" FROM "t" WHERE "a" = 12 AND "b" IN (%s, %s,%s) AND c = \'x\''
+        )
+        == 'SELECT "id" FROM "t" WHERE "a" = ? AND "b" IN (...) AND c = ?'
+    )
+
+
+@pytest.mark.django_db
+def test_query_metrics(metrics_client, questions, options, caplog):
+    with caplog.at_level(logging.WARNING, logger="mpbackend.query_metrics"):
+        response = metrics_client.get(reverse("profiles:question-list"))
+    assert response.status_code == 200
+    metrics = registry.get(("QuestionViewSet", "list"))
+    assert metrics["requests_total"] == 1
+    assert metrics["db_queries_total"] > 2
+    assert metrics["db_seconds_total"] > 0
+    assert metrics["serializer_seconds_total"] > 0
+    assert metrics["duration_seconds_total"] >= metrics["db_seconds_total"]
+    assert metrics["response_bytes_total"] == len(response.content)
+    assert metrics["over_query_budget_total"] == 1
+    assert "QuestionViewSet.list" in caplog.text
+    assert "SELECT" in caplog.text
+
+    response = metrics_client.get(reverse("metrics"))
+    assert response.status_code == 200
+    text = response.content.decode()
+    assert "# TYPE mpbackend_db_queries_total counter" in text
+    assert 'mpbackend_requests_total{view="QuestionViewSet",action="list"' in text
+    assert "mpbackend_anonymous_user_pool_depth" in text
+    assert "# TYPE mpbackend_process_db_connections_in_use gauge" in text
+    assert registry.get_connection_metrics()["db_connections_in_use"] == 0
+
+    response = metrics_client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(ROOT_URLCONF="mpbackend.async_urls")
+def test_query_metrics_async(metrics_client, users, answers):
+    async def get_response(request):
+        pass
+
+    # The async views are not adapted to the sync middleware chain
+    assert iscoroutinefunction(QueryMetricsMiddleware(get_response))
+    token = Token.objects.create(user=users.get(username="car user"))
+
+    async def get_result():
+        return await AsyncClient().get(
+            reverse("profiles:answer-get-result"),
+            headers={"Authorization": f"Token {token.key}"},
+        )
+
+    response = async_to_sync(get_result)()
+    assert response.status_code == 200
+    metrics = registry.get(("profiles.api.async_views.get_result", ""))
+    assert metrics["requests_total"] == 1
+    # The queries are made in the threads of the request
+    assert metrics["db_queries_total"] > 0
+    assert metrics["response_bytes_total"] == len(response.content)
+
+
+@pytest.mark.django_db
+def test_query_metrics_connections(metrics_client, tmp_path):
+    QueryMetricsMiddleware(lambda request: None)
+    database_wrapper = DatabaseWrapper(
+        {**connection.settings_dict, "NAME": str(tmp_path / "metrics.sqlite3")},
+        alias="metrics",
+    )
+    database_wrapper.connect()
+    metrics = registry.get_connection_metrics()
+    assert metrics["db_connections_opened_total"] == 1
+    assert metrics["db_connections_open"] == 1
+    assert metrics["db_connect_seconds_total"] > 0
+    database_wrapper.close()
+    assert registry.get_connection_metrics()["db_connections_open"] == 0
+
+    # A connection is in use by the request from its first query
+    request_metrics = RequestMetrics()
+    for _ in range(2):
+        request_metrics(
+            lambda *args: None, "SELECT 1", None, False, {"connection": connection}
+        )
+    assert registry.get_connection_metrics()["db_connections_in_use"] == 1
+    QueryMetricsMiddleware.release_connections(request_metrics)
+    assert registry.get_connection_metrics()["db_connections_in_use"] == 0
+    # The connections are not pooled by PgBouncer
+    assert get_pooler_metrics() == {}
+
+
+def test_get_pooler_metrics_unavailable(caplog):
+    with override_settings(DATABASE_POOLER_HOST="pgbouncer"):
+        assert get_pooler_metrics() == {}
+    assert "Could not connect to PgBouncer" in caplog.text
+
+
+@pytest.mark.django_db
+def test_metrics_view_disabled(api_client):
+    assert api_client.get(reverse("metrics")).status_code == 404
@@ -1,54 +1,86 @@
-import base64
-import os
 import secrets
 import string
+import uuid
+from collections import Counter
 
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models.sql import InsertQuery
+from rest_framework.authtoken.models import Token
 
-from account.models import User
-from profiles.models import Answer, Result
+from account.models import Profile, User
+from mpbackend.token_envelope import decrypt_cbc, encrypt_cbc
+from profiles.answer_context import get_user_answer_context
+from profiles.models import Option, Result
 
 
 def encrypt_text(text, key):
-    text = pad(text.encode(), 16)
-    iv = os.urandom(16)
-    cipher = AES.new(key.encode("utf-8"), AES.MODE_CBC, iv)
-    return base64.b64encode(cipher.encrypt(text)), base64.b64encode(cipher.iv).decode(
-        "utf-8"
-    )
+    return encrypt_cbc(text, key)
 
 
 def decrypt_text(enc, key, iv):
-    iv = base64.b64decode(iv)
-    enc = base64.b64decode(enc)
-    cipher = AES.new(key.encode("utf-8"), AES.MODE_CBC, iv)
-    return unpad(cipher.decrypt(enc), 16).decode()
+    return decrypt_cbc(enc, iv, key)
 
 
 def get_user_result(user: User) -> Result:
-    answer_qs = Answer.objects.filter(user=user)
-    if answer_qs.count() == 0:
+    option_ids = get_user_answer_context(user).option_ids
+    if not option_ids:
+        return None
+    cum_results = get_cumulative_results(
+        option_ids,
+        Option.results.through.objects.filter(
+            option_id__in=set(option_ids)
+        ).values_list("option_id", "result_id"),
+    )
+    # If all cumulative values are 0, return None
+    if not cum_results:
         return None
+    return get_highest_result(cum_results, Result.objects.all())
 
-    # calculate the cumulative values of options for every result
-    cum_results = {r: 0 for r in Result.objects.all()}
-    for answer in answer_qs:
-        for result in answer.option.results.all():
-            cum_results[result] += 1
 
-    # If all cumulative values are 0, return None
-    if all(value == 0 for value in cum_results.values()):
+async def aget_user_result(user: User) -> Result:
+    """get_user_result with the async ORM, for the async views."""
+    answer_context = get_user_answer_context(user)
+    await answer_context.aload()
+    option_ids = answer_context.option_ids
+    if not option_ids:
         return None
-    # calculate the relative result for every result (animal)
-    results = {}
+    cum_results = get_cumulative_results(
+        option_ids,
+        [
+            option_result
+            async for option_result in Option.results.through.objects.filter(
+                option_id__in=set(option_ids)
+            ).values_list("option_id", "result_id")
+        ],
+    )
+    if not cum_results:
+        return None
+    return get_highest_result(
+        cum_results, [result async for result in Result.objects.all()]
+    )
 
-    for result in Result.objects.all():
-        results[result] = cum_results[result] / result.num_options
+
+def get_cumulative_results(option_ids, option_results):
+    """
+    Returns the cumulative values of the answered options for every result, the
+    option_results are the (option_id, result_id) pairs of the answered options.
+    """
+    num_answers = Counter(option_ids)
+    cum_results = Counter()
+    for option_id, result_id in option_results:
+        cum_results[result_id] += num_answers[option_id]
+    return cum_results
+
+
+def get_highest_result(cum_results, results):
+    # calculate the relative result for every result (animal)
+    relative_results = {}
+    for result in results:
+        relative_results[result] = cum_results[result.id] / result.num_options
 
     # The result is the highest relative result
-    result = max(results, key=results.get)
-    return result
+    return max(relative_results, key=relative_results.get)
 
 
 def generate_password() -> str:
@@ -67,3 +99,57 @@ def generate_password() -> str:
         ):
             break
     return password
+
+
+def get_insert_sql(obj):
+    """Returns the INSERT statement and the params of the object, compiled by the ORM."""
+    fields = [f for f in obj._meta.local_concrete_fields if not f.db_returning]
+    query = InsertQuery(obj.__class__)
+    query.insert_values(fields, [obj])
+    [(sql, params)] = query.get_compiler(connection=connection).as_sql()
+    return sql, list(params)
+
+
+def create_anonymous_user(create_token=True):
+    """
+    Creates an anonymous user with a profile and, if create_token, a token.
+    Returns the user and the token. The password of the user is unusable, thus
+    no password is hashed. On PostgreSQL the rows are inserted with a single
+    statement, otherwise in a single transaction. Note, the save signals are not sent.
+    """
+    user_id = uuid.uuid4()
+    user = User(
+        id=user_id,
+        username=f"anonymous_{user_id}",
+        is_generated=True,
+        password=make_password(None),
+    )
+    profile = Profile(user=user)
+    token = Token(user=user, key=Token.generate_key()) if create_token else None
+    objs = [obj for obj in (user, token) if obj]
+
+    if connection.vendor == "postgresql":
+        # Data modifying statements in WITH are executed within the same statement,
+        # the foreign key constraints are checked at the end of the transaction.
+        ctes, params = [], []
+        for i, obj in enumerate(objs):
+            sql, obj_params = get_insert_sql(obj)
+            ctes.append(f"insert_{i} AS ({sql})")
+            params += obj_params
+        sql, obj_params = get_insert_sql(profile)
+        pk_column = connection.ops.quote_name(Profile._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH {', '.join(ctes)} {sql} RETURNING {pk_column}",
+                params + obj_params,
+            )
+            profile.pk = cursor.fetchone()[0]
+        for obj in objs + [profile]:
+            obj._state.adding = False
+            obj._state.db = connection.alias
+    else:
+        with transaction.atomic():
+            for obj in objs + [profile]:
+                obj.save(force_insert=True)
+    user.profile = profile
+    return user, token